@@ -2,7 +2,10 @@
 P&ID tag type registries and compiled regex patterns.
 
 Covers ISA 5.1 instrument codes and common valve/actuator codes.
-Used by extract.py to identify and classify tagged items on a drawing.
+Used by extract.py to identify and classify tagged items on a drawing,
+and by the backend's RAG lexical index (backend/utils/lexical.py).
+
+Copied to backend/utils/tags.py by ingestion/sync_backend.py.
 """
 
 import re
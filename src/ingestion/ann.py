@@ -0,0 +1,141 @@
+"""
+ann.py — inverted-file (IVF-flat) approximate nearest-neighbour index for the
+RAG embedding matrix.
+
+Rows are clustered with spherical k-means into `nlist` lists around unit
+centroids. A query is compared with the centroids, the `nprobe` closest lists
+are opened, and only their rows are scored exactly against the stored matrix
+(float16/int8 rows are converted on the fly), so a top-k touches
+nprobe × n / nlist rows instead of n. Rows outside a P&ID are dropped from
+the candidate lists with a boolean mask before scoring.
+
+The index is three arrays in ann.npz next to the matrix: centroids
+(nlist × dim float32), order (row numbers grouped by list) and offsets
+(nlist + 1, list boundaries in order). ingestion/rag.py builds it for large
+indexes; backend/utils/rag_retriever.py uses it when a P&ID has enough rows
+for an exact scan to cost more than the probe.
+
+Copied to backend/utils/ann.py by sync_backend.py.
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+ANN_FILE     = "ann.npz"
+TRAIN_SAMPLE = 32768   # rows k-means is trained on (at least 8 per list)
+TRAIN_ITERS  = 8
+ASSIGN_BLOCK = 4096    # rows assigned to centroids per matrix product
+
+
+def default_nlist(n: int) -> int:
+    """About 4·√n lists: ~250 rows per list at 1M rows."""
+    return max(1, min(16384, round(4 * math.sqrt(n))))
+
+
+def _as_float32(matrix: np.ndarray, start: int, stop: int, scales: np.ndarray | None) -> np.ndarray:
+    block = np.asarray(matrix[start:stop], dtype=np.float32)
+    return block * scales[start:stop, None] if scales is not None else block
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray, scales: np.ndarray | None = None,
+            sums: np.ndarray | None = None) -> np.ndarray:
+    """
+    Closest centroid (largest dot product) of every row, ASSIGN_BLOCK rows at
+    a time. With `sums`, each row is also added to its centroid's row there.
+    """
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), ASSIGN_BLOCK):
+        stop = min(start + ASSIGN_BLOCK, len(matrix))
+        block = _as_float32(matrix, start, stop, scales)
+        assign = out[start:stop] = np.argmax(block @ centroids.T, axis=1)
+        if sums is not None:
+            by_list = np.argsort(assign, kind="stable")
+            lists, starts = np.unique(assign[by_list], return_index=True)
+            sums[lists] += np.add.reduceat(block[by_list], starts, axis=0)
+    return out
+
+
+def _unit(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return np.divide(rows, norms, out=rows, where=norms > 0)
+
+
+class IVFIndex:
+    """Centroids plus row lists; build with `train`, persist with `save`/`load`."""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: int | None = None,
+              scales: np.ndarray | None = None, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means on a sample of the (unit-row) matrix, then assign every row."""
+        n = len(matrix)
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=min(n, max(TRAIN_SAMPLE, 8 * nlist)), replace=False))
+        sample = matrix[sample_rows]
+        sample_scales = scales[sample_rows] if scales is not None else None
+        seeds = np.sort(rng.choice(len(sample), size=nlist, replace=False))
+        centroids = _unit(np.asarray(sample[seeds], dtype=np.float32) *
+                          (sample_scales[seeds, None] if sample_scales is not None else 1))
+        for _ in range(TRAIN_ITERS):
+            sums = np.zeros_like(centroids)
+            assign = _assign(sample, centroids, sample_scales, sums)
+            # Empty lists restart from random sample rows
+            empty = np.flatnonzero(np.bincount(assign, minlength=nlist) == 0)
+            if len(empty):
+                rows = np.sort(rng.choice(len(sample), size=len(empty), replace=False))
+                sums[empty] = _as_float32(sample[rows], 0, len(rows),
+                                          sample_scales[rows] if sample_scales is not None else None)
+            centroids = _unit(sums)
+        assign = _assign(matrix, centroids, scales)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    def save(self, file) -> None:
+        """Write the index (a path or binary file object; ANN_FILE in the index dir)."""
+        np.savez(file, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, directory: Path) -> "IVFIndex":
+        with np.load(directory / ANN_FILE) as data:
+            return cls(data["centroids"], data["order"], data["offsets"])
+
+    def candidates(self, query: np.ndarray, nprobe: int, allowed: np.ndarray | None = None) -> np.ndarray:
+        """Sorted row numbers in the nprobe lists closest to query, restricted to `allowed` rows."""
+        nprobe = min(nprobe, self.nlist)
+        near = self.centroids @ query
+        probe = np.argpartition(near, self.nlist - nprobe)[self.nlist - nprobe:]
+        rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        rows.sort()
+        return rows
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, nprobe: int,
+               allowed: np.ndarray | None = None,
+               scales: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the approximate top-k, best first; fewer than k if the probe is short."""
+        rows = self.candidates(query, nprobe, allowed)
+        scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        if scales is not None:
+            scores *= scales[rows]
+        k = min(k, len(rows))
+        if not k:
+            return rows[:0], scores[:0]
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
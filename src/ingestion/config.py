@@ -5,6 +5,8 @@ All paths are resolved relative to the repo root.
 
 import json
 import os
+import re
+import hashlib
 from pathlib import Path
 import base64
 import fitz  # PyMuPDF
@@ -45,7 +47,11 @@ GRAPHS_DIR        = REPO_ROOT / "src" / "talking-pnids-py" / "data" / "graphs"
 # v0.1.1 — adaptive sub-tiling: dense tiles (parse_error after retry) are split
 #           into left/right halves and extracted separately, results merged.
 #           tile.py now measures dark-pixel density per tile and flags dense tiles.
-STRATEGY_VERSION = "v0.1.1"
+# v0.1.2 — extraction prompts request a per-component bbox (0-1000 tile space);
+#           stitch maps it to page pixels and merges overlap-zone duplicates spatially.
+# v0.1.3 — schema conversion is rule-based (schema.py); Sonnet only classifies the
+#           residue of components whose type cannot be mapped deterministically.
+STRATEGY_VERSION = "v0.1.3"
 
 # ── Models ───────────────────────────────────────────────────────────────────
 MODEL_VISION   = "claude-opus-4-6"      # tile extraction passes 1+2 (vision quality critical)
@@ -53,6 +59,12 @@ MODEL_VERIFY   = "claude-sonnet-4-6"    # tile extraction pass 3 (review/reasoni
 MODEL_SCHEMA   = "claude-sonnet-4-6"    # schema conversion + self-verify + supergraph
 MAX_TOKENS_EXTRACT = 8192
 MAX_TOKENS_SCHEMA  = 32768   # Sonnet 4.6 supports up to 64K; 32K covers 200+ node graphs
+MAX_TOKENS_RESIDUE = 4096    # schema residue classification (type/subtype/layer per component)
+SCHEMA_MODE = "rules"        # "rules" = local converter + LLM residue | "llm" = full Sonnet conversion
+SCHEMA_SHARD_MAX_CHARS = 40_000   # llm mode: region shards are split until their payload fits
+SCHEMA_SHARD_WORKERS   = 6        # llm mode: concurrent shard conversions
+SCHEMA_MAX_CONTINUATIONS = 2      # llm mode: resume a cut-off shard this often before splitting it
+SCHEMA_CHECKPOINT_EVERY  = 10     # llm mode: checkpoint a streaming shard every N elements
 
 # ── Pricing (USD per million tokens) ─────────────────────────────────────────
 # Source: anthropic.com/pricing — update when rates change
@@ -72,6 +84,10 @@ TILE_COLS    = 3
 TILE_OVERLAP = 0.15   # 15% overlap on each shared edge
 TILE_DPI     = 200    # render resolution for Claude vision
 
+# ── Supergraph ───────────────────────────────────────────────────────────────
+SUPERGRAPH_LOAD_WORKERS = 8   # graphs loaded in parallel when (re)indexing the supergraph
+REF_MATCH_THRESHOLD     = 0.85  # ref_match.match_score needed to wire two different off-page labels
+
 # ── POC P&IDs ────────────────────────────────────────────────────────────────
 POC_PIDS = {
     "pid-006": "100478CP-N-PG-PP01-PR-PID-0006-001-C02.pdf",
@@ -85,6 +101,7 @@ LEGEND_FILE_2 = "100478CP-N-PG-PP01-PR-PID-0001-002-C01 (2).pdf"   # piping symb
 
 # ── Ground truth reference data ───────────────────────────────────────────────
 PID_DATA_XLSX     = DATASET_DIR / "reference" / "PID Data.xlsx"   # structured ground truth for PID-008
+VALIDATE_EXCEL    = False   # Excel ground-truth checks in validate.py (not yet validated as correct)
 NARRATIVES_DIR    = DATASET_DIR / "narratives"
 
 
@@ -117,6 +134,13 @@ def graphs_dir() -> Path:
     return GRAPHS_DIR
 
 
+def reference_cache_dir() -> Path:
+    """Cached snapshots of reference data (e.g. the PID Data.xlsx ground truth)."""
+    d = INGESTION_OUT_DIR / "_reference"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
 def _pdf_page_to_b64_images(pdf_path: Path, page_index: int = 0, dpi: int = TILE_DPI) -> list[str]:
     """Render every page of a PDF at dpi, return list of base64 PNG strings."""
     doc = fitz.open(str(pdf_path))
@@ -158,28 +182,113 @@ def load_legend_context() -> dict:
 _LEGEND_CACHE: dict = {}
 
 
+# ── OCR tag index ─────────────────────────────────────────────────────────────
+# One JSON file under reference_cache_dir() holds the parsed tags (with
+# occurrence coordinates) of every OCR output, keyed by file name, stamped with
+# its mtime/size and resolved to the pid_id it belongs to. Only new or changed
+# files are re-parsed. In memory the entries are keyed by pid_id; the OCR
+# directory is re-stat'ed on each lookup so added or changed files are seen.
+
+OCR_INDEX_VERSION = 2
+_OCR_INDEX: dict = {}   # {"stats": {file name: (mtime_ns, size)}, "pids": {pid_id: entries}}
+_OCR_PID_RE = re.compile(r"PID[\s\-_]*0*(\d{1,4})(?![A-Za-z0-9])", re.IGNORECASE)
+
+
+def _ocr_pid_id(fname: str) -> str | None:
+    """pid_id an OCR file belongs to, from the drawing number in its name ('...PID-0008-001...' → 'pid-008')."""
+    m = _OCR_PID_RE.search(fname)
+    if not m:
+        return None
+    number = int(m.group(1))
+    for pid_id in POC_PIDS:
+        if int(pid_id.rsplit("-", 1)[-1]) == number:
+            return pid_id
+    return f"pid-{number:03d}"
+
+
+def _parse_ocr_file(path: Path) -> list[dict] | None:
+    """
+    Tag entries of one OCR JSON: [{"tag", "occurrences": [{"page", "coordinates", ...}]}].
+    Accepts a plain list or a dict with a tags/text/labels/items list; None if neither.
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    items = data if isinstance(data, list) else None
+    if isinstance(data, dict):
+        items = next((data[k] for k in ("tags", "text", "labels", "items")
+                      if isinstance(data.get(k), list)), None)
+    if items is None:
+        return None
+    entries = []
+    for t in items:
+        if isinstance(t, dict) and "tag" in t:
+            occ = t.get("occurrences")
+            if occ is None and t.get("coordinates"):
+                occ = [{"coordinates": t["coordinates"]}]
+            entries.append({"tag": t["tag"], "occurrences": occ or []})
+        else:
+            entries.append({"tag": str(t), "occurrences": []})
+    return entries
+
+
+def _ocr_stats() -> dict[str, tuple[int, int]]:
+    """(mtime_ns, size) of every JSON in OCR_DIR, by file name."""
+    stats = {}
+    for fname in sorted(os.listdir(OCR_DIR)) if OCR_DIR.exists() else []:
+        if fname.endswith(".json"):
+            st = (OCR_DIR / fname).stat()
+            stats[fname] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+
+def load_ocr_index(refresh: bool = False) -> dict[str, list[dict]]:
+    """
+    {pid_id: OCR tag entries} from every JSON in OCR_DIR, re-parsing only files
+    added or changed since the index was written. Each pid_id takes the first
+    file (by name) that resolves to it and parses.
+    """
+    stats = _ocr_stats()
+    if _OCR_INDEX.get("stats") == stats and not refresh:
+        return _OCR_INDEX["pids"]
+    path = reference_cache_dir() / "ocr_index.json"
+    index = load_json(path) if path.exists() else {}
+    if index.get("version") != OCR_INDEX_VERSION:
+        index = {"version": OCR_INDEX_VERSION, "files": {}}
+    old = index["files"]
+
+    files, changed = {}, 0
+    for fname, (mtime_ns, size) in stats.items():
+        rec = old.get(fname)
+        if not rec or (rec["mtime_ns"], rec["size"]) != (mtime_ns, size):
+            rec = {"mtime_ns": mtime_ns, "size": size, "pid_id": _ocr_pid_id(fname),
+                   "entries": _parse_ocr_file(OCR_DIR / fname)}
+            changed += 1
+        files[fname] = rec
+    if changed or files.keys() != old.keys():
+        index["files"] = files
+        save_json(path, index)
+
+    pids: dict[str, list[dict]] = {}
+    for rec in files.values():
+        if rec["pid_id"] and rec["entries"] is not None:
+            pids.setdefault(rec["pid_id"], rec["entries"])
+    _OCR_INDEX.update(stats=stats, pids=pids)
+    return pids
+
+
+def load_ocr_entries(pid_id: str) -> list[dict]:
+    """OCR tag entries with coordinates for a P&ID ([] if no OCR file resolves to it)."""
+    return load_ocr_index().get(pid_id, [])
+
+
 def load_ocr_tags(pid_id: str) -> list[str]:
     """
     Load OCR tag list for a P&ID. Returns list of tag strings like ['HV-0092', ...].
     The OCR JSON format: {"tags": [{"tag": "HV-0092", ...}, ...], ...}
     """
-    for fname in os.listdir(OCR_DIR) if OCR_DIR.exists() else []:
-        if pid_id.replace("-", "").replace("pid", "PID") in fname or \
-           pid_id[-3:] in fname:
-            path = OCR_DIR / fname
-            if path.suffix == ".json":
-                data = json.loads(path.read_text())
-                if isinstance(data, list):
-                    # Plain list — extract .tag if dict, else str
-                    return [t["tag"] if isinstance(t, dict) and "tag" in t else str(t)
-                            for t in data]
-                if isinstance(data, dict):
-                    for key in ("tags", "text", "labels", "items"):
-                        if key in data and isinstance(data[key], list):
-                            items = data[key]
-                            return [t["tag"] if isinstance(t, dict) and "tag" in t else str(t)
-                                    for t in items]
-    return []
+    return [e["tag"] for e in load_ocr_entries(pid_id)]
 
 
 def save_json(path: Path, data: dict | list) -> None:
@@ -189,3 +298,9 @@ def save_json(path: Path, data: dict | list) -> None:
 
 def load_json(path: Path) -> dict | list:
     return json.loads(path.read_text())
+
+
+def content_hash(data) -> str:
+    """Stable short hash of any JSON-serialisable value (key order independent)."""
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
@@ -53,6 +53,7 @@ Return a JSON object with this structure:
       "subtype": "<e.g. valve.ball, valve.gate, valve.control, instrument.pressure_transmitter, equipment.vessel>",
       "tag": "<engineering tag if visible>",
       "label": "<any visible label text>",
+      "bbox": [<x0>, <y0>, <x1>, <y1>],
       "props": {
         "size": "<pipe size if visible>",
         "normal_position": "<LO|LC|NO|NC|FO|FC|FL if visible>",
@@ -94,7 +95,10 @@ Return a JSON object with this structure:
 }
 
 Be exhaustive. Every visible valve, instrument, nozzle, junction, and equipment item must appear.
-EDGE references mark connections that continue onto an adjacent tile."""
+EDGE references mark connections that continue onto an adjacent tile.
+"bbox" is the symbol's bounding box in THIS tile image, scaled 0-1000 on each axis
+(0,0 = top-left corner, 1000,1000 = bottom-right corner). Always include it — it is used to
+merge the same symbol seen on two overlapping tiles."""
 
 PASS2_PROMPT = """This is a TARGETED extraction pass. You have already extracted the main components.
 Now carefully re-examine the same tile image for items that are commonly missed:
@@ -141,7 +145,8 @@ Return JSON:
 # Produces ~40% fewer tokens by using short IDs and a flat, minimal schema.
 PASS1_COMPACT_PROMPT = """Extract ALL components from this P&ID sub-tile. Be as CONCISE as possible.
 
-Use short 2-4 char IDs (e.g. V1, I2, J3). Omit any null/empty fields entirely.
+Use short 2-4 char IDs (e.g. V1, I2, J3). Omit any null/empty fields entirely, except "bb":
+the symbol bounding box [x0,y0,x1,y1] scaled 0-1000 within THIS image (0,0 = top-left).
 Abbreviate subtypes: VG=valve.gate, VB=valve.ball, VBU=valve.butterfly, VCK=valve.check,
 VCT=valve.control, VS=valve.spectacle, EQ=equipment, IP=instrument.pressure,
 IT=instrument.temperature, IF=instrument.flow, IL=instrument.level, IC=instrument.controller,
@@ -152,9 +157,9 @@ Return ONLY valid JSON, no markdown:
   "tile": "<tile_name>",
   "pass": 1,
   "components": [
-    {"id":"V1","type":"valve","subtype":"VB","tag":"HV0001","pos":"LO"},
-    {"id":"I1","type":"instrument","subtype":"IP","tag":"PT001","loop":"100"},
-    {"id":"E1","type":"equipment","subtype":"EQ","tag":"362-V001","label":"KO DRUM","dp":"14 barg","dt":"-20~100C","op":"9-10.4 barg","ot":"30-60C"}
+    {"id":"V1","type":"valve","subtype":"VB","tag":"HV0001","pos":"LO","bb":[120,340,160,380]},
+    {"id":"I1","type":"instrument","subtype":"IP","tag":"PT001","loop":"100","bb":[200,90,260,150]},
+    {"id":"E1","type":"equipment","subtype":"EQ","tag":"362-V001","label":"KO DRUM","dp":"14 barg","dt":"-20~100C","op":"9-10.4 barg","ot":"30-60C","bb":[400,100,700,900]}
   ],
   "connections": [
     {"id":"e1","from":"V1","to":"I1","line":"3\"-B01M8-362-001","spec":"B01M8","dia":"3"}
@@ -329,9 +334,13 @@ def _call_claude(
     raise last_exc  # unreachable but satisfies type checkers
 
 
-def _split_tile(tile_path: Path, raw_dir: Path, label: str, mode: str = "halves") -> list[Path]:
+def _split_tile(
+    tile_path: Path, raw_dir: Path, label: str, mode: str = "halves",
+) -> list[tuple[Path, tuple[int, int, int, int]]]:
     """Split a tile PNG into halves (left/right) or quarters (tl/tr/bl/br).
     All pieces get 10% overlap on shared edges.
+    Returns (piece_path, crop_box) pairs; crop_box is in tile pixels and is
+    needed to map sub-tile bounding boxes back into tile space.
     """
     img = Image.open(tile_path)
     W, H = img.size
@@ -356,13 +365,38 @@ def _split_tile(tile_path: Path, raw_dir: Path, label: str, mode: str = "halves"
     for name, box in pieces.items():
         p = raw_dir / f"{label}_sub_{name}.png"
         img.crop(box).save(str(p), "PNG")
-        paths.append(p)
+        paths.append((p, box))
     return paths
 
 
-def _merge_sub_tile_results(results: list[dict], tile_name: str) -> dict:
+def _sub_bbox_to_tile(bb, box: tuple, tile_size: tuple) -> list[float] | None:
+    """Rescale a 0-1000 sub-tile bbox into the parent tile's 0-1000 space."""
+    if not (isinstance(bb, (list, tuple)) and len(bb) == 4):
+        return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in bb)
+    except (TypeError, ValueError):
+        return None
+    bx0, by0, bx1, by1 = box
+    W, H = tile_size
+    sx = (bx1 - bx0) / 1000.0
+    sy = (by1 - by0) / 1000.0
+    return [
+        round((bx0 + x0 * sx) / W * 1000, 1), round((by0 + y0 * sy) / H * 1000, 1),
+        round((bx0 + x1 * sx) / W * 1000, 1), round((by0 + y1 * sy) / H * 1000, 1),
+    ]
+
+
+def _merge_sub_tile_results(
+    results: list[dict],
+    tile_name: str,
+    boxes: list[tuple] | None = None,
+    tile_size: tuple[int, int] | None = None,
+) -> dict:
     """Merge pass1 results from two sub-tiles into one combined pass1 dict.
     De-duplicates components by normalized tag (fuzzy match on stripped tag).
+    When the sub-tile crop boxes are given, component bboxes ("bb" / "bbox")
+    are rescaled into the parent tile's 0-1000 space.
     """
     import re
 
@@ -387,6 +421,11 @@ def _merge_sub_tile_results(results: list[dict], tile_name: str) -> dict:
             if tag_norm:
                 seen_tags.add(tag_norm)
             new_c = {**c, "id": prefix + c.get("id", f"c{len(merged_components)}")}
+            bb = new_c.pop("bb", None) or new_c.get("bbox")
+            if boxes and tile_size and i < len(boxes):
+                bb = _sub_bbox_to_tile(bb, boxes[i], tile_size)
+            if bb:
+                new_c["bbox"] = bb
             merged_components.append(new_c)
         for conn in r.get("connections", []):
             merged_connections.append({**conn, "id": prefix + conn.get("id", f"e{len(merged_connections)}")})
@@ -493,10 +532,10 @@ def extract_tile(
             # Try halves first, fall back to quarters if halves also overflow
             for split_mode in ("halves", "quarters"):
                 print(f"[extract]   Pass 1 sub-tiling {tile_name} ({split_mode}) ...")
-                sub_paths = _split_tile(tile_path, raw_dir, tile_name, mode=split_mode)
+                sub_pieces = _split_tile(tile_path, raw_dir, tile_name, mode=split_mode)
                 sub_results = []
                 all_ok = True
-                for sub_path in sub_paths:
+                for sub_path, _ in sub_pieces:
                     sub_block = _tile_image_block(sub_path)
                     sub_content = legend_blocks + [sub_block]
                     # Use compact prompt for sub-tiles to reduce output tokens ~40%
@@ -511,11 +550,16 @@ def extract_tile(
                               f"({len(sub_p1.get('components',[]))} components)")
                     sub_results.append(sub_p1)
                 if all_ok or split_mode == "quarters":
-                    p1 = _merge_sub_tile_results(sub_results, tile_name)
+                    with Image.open(tile_path) as tile_img:
+                        tile_size = tile_img.size
+                    p1 = _merge_sub_tile_results(
+                        sub_results, tile_name,
+                        boxes=[box for _, box in sub_pieces], tile_size=tile_size,
+                    )
                     save_json(sub_merged_path, p1)
                     save_json(p1_path, p1)
                     print(f"[extract]   Pass 1 sub-tiled {tile_name} ({split_mode}): "
-                          f"{len(p1.get('components',[]))} components from {len(sub_paths)} pieces")
+                          f"{len(p1.get('components',[]))} components from {len(sub_pieces)} pieces")
                     break
 
     # Pass 2
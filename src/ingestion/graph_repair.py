@@ -0,0 +1,228 @@
+"""
+graph_repair.py — local repair pass for pid.graph.v0.1.1 documents.
+
+Not imported directly: graph_validator.py splices this source into every
+generated validator module (ingestion and backend/utils/pid_graph_validator.py)
+and fills _K with the enums and key sets of SCHEMA_DEF, so both sides run
+the same repair code against the same schema.
+
+Fixes, in place:
+  - missing / wrong schema_version, unknown root keys (moved into metadata),
+    null metadata fields
+  - duplicate node ids (folded into the first), missing node ids
+  - unknown node type / layer / status values (synonyms, else a safe default)
+  - keys outside the schema (moved into props), non-string scalar fields
+  - dangling edge endpoints that name a node by tag (or a near-identical id)
+  - unknown edge kind / flow_dir, missing or duplicate edge ids
+Edges whose endpoints resolve to no node are dropped.
+"""
+
+import re
+
+_K: dict = {}   # schema constants — filled in by graph_validator.generate_source()
+
+LAYER_SYNONYMS = {
+    "piping": "process", "pipe": "process", "main": "process", "flow": "process",
+    "instrumentation": "instrument", "instruments": "instrument", "control": "instrument",
+    "signal": "instrument", "electric": "electrical", "power": "electrical",
+    "utilities": "utility", "text": "annotation", "note": "annotation", "notes": "annotation",
+    "label": "annotation", "mech": "mechanical",
+}
+NODE_TYPE_SYNONYMS = {
+    "off_page": "terminator", "off_page_connector": "terminator", "connector": "terminator",
+    "boundary": "terminator", "tee": "junction", "reducer": "junction", "fitting": "junction",
+    "spec_break": "junction", "vessel": "equipment", "pump": "equipment", "tank": "equipment",
+    "text": "annotation", "note": "annotation", "label": "annotation",
+}
+EDGE_KIND_SYNONYMS = {
+    "pipe": "process", "piping": "process", "line": "process", "flow": "process",
+    "electrical": "signal", "data": "signal", "software": "signal", "pneumatic": "signal",
+    "instrument": "signal", "capillary": "impulse", "mechanical": "association",
+    "contains": "containment", "part_of": "containment",
+}
+FLOW_DIR_SYNONYMS = {
+    "forward": "uni", "one_way": "uni", "unidirectional": "uni", "uni_directional": "uni",
+    "both": "bi", "bidirectional": "bi", "bi_directional": "bi", "two_way": "bi",
+}
+
+
+def _word(value) -> str:
+    return str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def _norm_ref(value) -> str:
+    return re.sub(r"[\s\-_:]", "", str(value or "").upper())
+
+
+def _props(item: dict) -> dict:
+    """item["props"] as a dict (a stray non-dict value is wrapped, not lost)."""
+    props = item.get("props")
+    if not isinstance(props, dict):
+        item["props"] = props = {} if props is None else {"value": props}
+    return props
+
+
+def _fold_extra_keys(item: dict, kind: str, label: str, fixes: list) -> None:
+    """Keys outside the schema go into props; string fields are coerced to str."""
+    props = _props(item)
+    for k in [k for k in item if k not in _K[f"{kind}_keys"]]:
+        props.setdefault(k, item.pop(k))
+        fixes.append(f"{label}: moved '{k}' into props")
+    for k in _K[f"{kind}_string_keys"]:
+        v = item.get(k)
+        if v is None and k in item:
+            del item[k]
+        elif v is not None and not isinstance(v, str):
+            if isinstance(v, (int, float, bool)):
+                item[k] = str(v)
+            else:
+                props.setdefault(k, item.pop(k))
+                fixes.append(f"{label}: moved non-string '{k}' into props")
+    if not props:
+        del item["props"]
+
+
+def reference_errors(graph: dict) -> list[str]:
+    """Checks JSON Schema cannot express: duplicate ids and dangling edge endpoints."""
+    errors = []
+    ids = set()
+    for n in graph.get("nodes", []):
+        nid = n.get("id") if isinstance(n, dict) else None
+        if nid in ids:
+            errors.append(f"$.nodes: duplicate node id {nid!r}")
+        ids.add(nid)
+    edge_ids = set()
+    for e in graph.get("edges", []):
+        if not isinstance(e, dict):
+            continue
+        if e.get("id") in edge_ids:
+            errors.append(f"$.edges: duplicate edge id {e.get('id')!r}")
+        edge_ids.add(e.get("id"))
+        for end in ("from", "to"):
+            if e.get(end) not in ids:
+                errors.append(f"$.edges[{e.get('id')!r}].{end}: dangling endpoint {e.get(end)!r}")
+    return errors
+
+
+def repair_graph(graph: dict) -> tuple[dict, list[str]]:
+    """Repair common schema violations in place. Returns (graph, list of fixes applied)."""
+    fixes: list[str] = []
+    if not isinstance(graph, dict):
+        return graph, fixes
+
+    if graph.get("schema_version") != _K["schema_version"]:
+        fixes.append(f"schema_version {graph.get('schema_version')!r} → {_K['schema_version']!r}")
+        graph["schema_version"] = _K["schema_version"]
+    if not isinstance(graph.get("metadata"), dict):
+        graph["metadata"] = {}
+    for k in [k for k in graph if k not in _K["root_keys"] and not k.startswith("_")]:
+        graph["metadata"].setdefault(k, graph.pop(k))
+        fixes.append(f"moved root key '{k}' into metadata")
+    for k in [k for k, v in graph["metadata"].items() if v is None]:
+        del graph["metadata"][k]
+        fixes.append(f"dropped null metadata.{k}")
+
+    # ── Nodes ────────────────────────────────────────────────────────────────
+    nodes: dict[str, dict] = {}
+    for i, node in enumerate(graph.get("nodes") or []):
+        if not isinstance(node, dict):
+            fixes.append(f"dropped non-object node #{i}")
+            continue
+        if not isinstance(node.get("id"), str) or not node["id"]:
+            base = re.sub(r"\s+", "", str(node.get("tag") or "")) or f"node_{i:03d}"
+            node["id"] = base if base not in nodes else f"{base}_{i}"
+            fixes.append(f"node #{i}: missing id → {node['id']!r}")
+        label = f"node {node['id']!r}"
+
+        ntype = node.get("type")
+        if ntype not in _K["node_types"]:
+            w = _word(ntype)
+            new = NODE_TYPE_SYNONYMS.get(w) or NODE_TYPE_SYNONYMS.get(w.split(".", 1)[0]) \
+                or (w.split(".", 1)[0] if w.split(".", 1)[0] in _K["node_types"] else "annotation")
+            node["type"] = new
+            if new == "annotation" and ntype:
+                _props(node).setdefault("original_type", ntype)
+            fixes.append(f"{label}: type {ntype!r} → {new!r}")
+        layer = node.get("layer")
+        if layer is not None and layer not in _K["node_layers"]:
+            node["layer"] = LAYER_SYNONYMS.get(_word(layer), "other")
+            fixes.append(f"{label}: layer {layer!r} → {node['layer']!r}")
+        status = node.get("status")
+        if status is not None and status not in _K["node_status"]:
+            w = _word(status)
+            if w in _K["node_status"]:
+                node["status"] = w
+            else:
+                _props(node).setdefault("status", node.pop("status"))
+            fixes.append(f"{label}: status {status!r} not in schema enum")
+        _fold_extra_keys(node, "node", label, fixes)
+
+        if node["id"] in nodes:
+            keep = nodes[node["id"]]
+            for k, v in node.items():
+                if k == "props":
+                    for pk, pv in v.items():
+                        _props(keep).setdefault(pk, pv)
+                elif keep.get(k) in (None, ""):
+                    keep[k] = v
+            fixes.append(f"{label}: duplicate id merged")
+        else:
+            nodes[node["id"]] = node
+    graph["nodes"] = list(nodes.values())
+
+    # ── Edges ────────────────────────────────────────────────────────────────
+    by_ref: dict[str, str] = {}
+    for nid, node in nodes.items():
+        by_ref.setdefault(_norm_ref(nid), nid)
+    for nid, node in nodes.items():
+        if node.get("tag"):
+            by_ref.setdefault(_norm_ref(node["tag"]), nid)
+
+    edges: list[dict] = []
+    edge_ids: set = set()
+    for i, edge in enumerate(graph.get("edges") or []):
+        if not isinstance(edge, dict):
+            fixes.append(f"dropped non-object edge #{i}")
+            continue
+        label = f"edge {edge.get('id', i)!r}"
+        dangling = False
+        for end in ("from", "to"):
+            ref = edge.get(end)
+            if ref in nodes:
+                continue
+            target = by_ref.get(_norm_ref(ref))
+            if target:
+                edge[end] = target
+                fixes.append(f"{label}: {end} {ref!r} → node {target!r}")
+            else:
+                dangling = True
+        if dangling:
+            fixes.append(f"{label}: dropped, endpoint not found ({edge.get('from')!r} → {edge.get('to')!r})")
+            continue
+
+        kind = edge.get("kind")
+        if kind not in _K["edge_kinds"]:
+            edge["kind"] = EDGE_KIND_SYNONYMS.get(_word(kind), "process")
+            fixes.append(f"{label}: kind {kind!r} → {edge['kind']!r}")
+        flow = edge.get("flow_dir")
+        if flow is not None and flow not in _K["flow_dirs"]:
+            new = FLOW_DIR_SYNONYMS.get(_word(flow))
+            if new:
+                edge["flow_dir"] = new
+            else:
+                _props(edge).setdefault("flow_dir", edge.pop("flow_dir"))
+            fixes.append(f"{label}: flow_dir {flow!r} not in schema enum")
+        _fold_extra_keys(edge, "edge", label, fixes)
+
+        eid = edge.get("id")
+        if not isinstance(eid, str) or not eid or eid in edge_ids:
+            base = eid if isinstance(eid, str) and eid else f"e_{edge['from']}_{edge['to']}"
+            new_id, n = base, 2
+            while new_id in edge_ids:
+                new_id, n = f"{base}_{n}", n + 1
+            edge["id"] = new_id
+            fixes.append(f"edge #{i}: id {eid!r} → {new_id!r}")
+        edge_ids.add(edge["id"])
+        edges.append(edge)
+    graph["edges"] = edges
+    return graph, fixes
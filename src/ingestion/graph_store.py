@@ -0,0 +1,384 @@
+"""
+graph_store.py — binary, memory-mappable companion of a pid.graph JSON file.
+
+Ingestion writes <pid>.graph.bin next to every <pid>.graph.json, and
+supergraph.bin (the merged supergraph the backend tools query) next to
+supergraph.json. The backend maps the file read-only and reads only the pages
+a query touches; nothing is parsed up front and no dict-of-dicts is built
+unless to_graph() is asked for.
+
+Layout (little endian, every section 8-byte aligned):
+  b"PIDGRAPH" · u64 header length · JSON header · sections
+  strings.blob / strings.offsets     interned UTF-8 string table
+  node.<column> / edge.<column>      int32 string ids (-1 = null)
+  node.records / edge.records        compact JSON array + per-item offsets
+  edge.src / edge.dst / edge.kind    int32 node indices and kind index
+  csr.<kind>.<out|in>.{indptr,nbr,edge}   CSR adjacency per edge kind
+  hash.id / hash.tag                 open-addressing tables → node index
+
+The header keeps the root keys other than nodes/edges, the edge kinds, and a
+fingerprint (size, mtime, sha256) of the JSON files the store was built from.
+
+Copied to backend/utils/graph_store.py by sync_backend.py.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"PIDGRAPH"
+FORMAT_VERSION = 1
+NODE_COLUMNS = ("id", "tag", "tag_norm", "type", "subtype", "layer", "status", "service")
+EDGE_COLUMNS = ("id", "line_tag")
+_ALIGN = 8
+
+
+def norm_tag(tag: str) -> str:
+    """Tag key of hash.tag: uppercase, spaces and hyphens removed."""
+    return re.sub(r"[\s\-]", "", tag.upper()) if tag else ""
+
+
+def store_path(json_path: Path) -> Path:
+    """pid-006.graph.json → pid-006.graph.bin, supergraph.json → supergraph.bin."""
+    return json_path.with_suffix(".bin")
+
+
+def fingerprint(path: Path) -> dict:
+    st = path.stat()
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": hashlib.sha256(path.read_bytes()).hexdigest()[:16],
+    }
+
+
+def _matches(path: Path, fp: dict) -> bool:
+    """Same file as fingerprinted: equal size, and equal mtime or (after a copy) equal content."""
+    if not path.exists():
+        return False
+    st = path.stat()
+    if st.st_size != fp["size"]:
+        return False
+    return st.st_mtime_ns == fp["mtime_ns"] or \
+        hashlib.sha256(path.read_bytes()).hexdigest()[:16] == fp["sha256"]
+
+
+# ── Writer ────────────────────────────────────────────────────────────────────
+
+def _hash_table(keys: list) -> np.ndarray:
+    """Linear-probing table of the first index per distinct key; -1 marks a free slot."""
+    size = 1 << max(3, (2 * len(keys) - 1).bit_length())
+    mask = size - 1
+    table = [-1] * size
+    seen = set()
+    for i, key in enumerate(keys):
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        h = zlib.crc32(key.encode()) & mask
+        while table[h] != -1:
+            h = (h + 1) & mask
+        table[h] = i
+    return np.array(table, dtype=np.int32)
+
+
+def _records(items: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Compact JSON array of items and the start offset of each (plus the end)."""
+    parts = [json.dumps(it, separators=(",", ":"), ensure_ascii=False).encode() for it in items]
+    offsets = np.empty(len(parts) + 1, dtype=np.int64)
+    pos = 1
+    for i, p in enumerate(parts):
+        offsets[i] = pos
+        pos += len(p) + 1
+    offsets[-1] = pos
+    blob = b"[" + b",".join(parts) + b"]"
+    return np.frombuffer(blob, dtype=np.uint8), offsets
+
+
+def _csr(n: int, a: np.ndarray, b: np.ndarray, sel: np.ndarray) -> tuple[np.ndarray, ...]:
+    order = sel[np.argsort(a[sel], kind="stable")]
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(a[order], minlength=n), out=indptr[1:])
+    return indptr, b[order].astype(np.int32), order.astype(np.int32)
+
+
+def write_store(graph: dict, path: Path, sources: list[Path] = ()) -> Path:
+    """Write `graph` as a binary store at `path` (atomically). `sources` are fingerprinted."""
+    nodes, edges = graph.get("nodes", []), graph.get("edges", [])
+    strings: dict[str, int] = {}
+
+    def intern(value) -> int:
+        if value is None or value == "":
+            return -1
+        return strings.setdefault(str(value), len(strings))
+
+    sections: dict[str, np.ndarray] = {}
+    ids = [n.get("id") for n in nodes]
+    tags = [norm_tag(n.get("tag") or "") for n in nodes]
+    for col in NODE_COLUMNS:
+        values = tags if col == "tag_norm" else [n.get(col) for n in nodes]
+        sections[f"node.{col}"] = np.array([intern(v) for v in values], dtype=np.int32)
+    for col in EDGE_COLUMNS:
+        sections[f"edge.{col}"] = np.array([intern(e.get(col)) for e in edges], dtype=np.int32)
+
+    index_of = {}
+    for i, nid in enumerate(ids):
+        index_of.setdefault(nid, i)
+    kinds = sorted({e.get("kind") or "process" for e in edges})
+    kind_index = {k: i for i, k in enumerate(kinds)}
+    src = np.array([index_of.get(e.get("from"), -1) for e in edges], dtype=np.int32)
+    dst = np.array([index_of.get(e.get("to"), -1) for e in edges], dtype=np.int32)
+    kind = np.array([kind_index[e.get("kind") or "process"] for e in edges], dtype=np.int32)
+    sections.update({"edge.src": src, "edge.dst": dst, "edge.kind": kind})
+
+    n = len(nodes)
+    for k, name in enumerate(kinds):
+        sel = np.nonzero((kind == k) & (src >= 0) & (dst >= 0))[0]
+        for direction, a, b in (("out", src, dst), ("in", dst, src)):
+            indptr, nbr, edge = _csr(n, a, b, sel)
+            sections[f"csr.{name}.{direction}.indptr"] = indptr
+            sections[f"csr.{name}.{direction}.nbr"] = nbr
+            sections[f"csr.{name}.{direction}.edge"] = edge
+
+    sections["hash.id"] = _hash_table(ids)
+    sections["hash.tag"] = _hash_table(tags)
+    sections["node.records"], sections["node.records.offsets"] = _records(nodes)
+    sections["edge.records"], sections["edge.records.offsets"] = _records(edges)
+
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    sections["strings.blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    sections["strings.offsets"] = offsets
+
+    layout, pos = {}, 0
+    for name, arr in sections.items():
+        layout[name] = {"offset": pos, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        pos += -(-arr.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "meta": {k: v for k, v in graph.items() if k not in ("nodes", "edges")},
+        "counts": {"nodes": n, "edges": len(edges), "strings": len(encoded)},
+        "kinds": kinds,
+        "sources": {p.name: fingerprint(p) for p in sources},
+        "sections": layout,
+    }, ensure_ascii=False).encode()
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\0" * (-f.tell() % _ALIGN))
+        for arr in sections.values():
+            f.write(arr.tobytes())
+            f.write(b"\0" * (-arr.nbytes % _ALIGN))
+    os.replace(tmp, path)
+    return path
+
+
+# ── Reader ────────────────────────────────────────────────────────────────────
+
+class GraphStore:
+    """Read-only view of a graph store. Arrays are zero-copy views into the mapping."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path.name}: not a graph store")
+        (size,) = struct.unpack_from("<Q", self._buf, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._buf[start:start + size])
+        if self.header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{self.path.name}: store format {self.header.get('format')}")
+        self._base = -(-(start + size) // _ALIGN) * _ALIGN
+        self._arrays: dict[str, np.ndarray] = {}
+        self.meta: dict = self.header["meta"]
+        self.kinds: list[str] = self.header["kinds"]
+        self.n_nodes: int = self.header["counts"]["nodes"]
+        self.n_edges: int = self.header["counts"]["edges"]
+
+    def is_current(self, source_dir: Path | None = None) -> bool:
+        """True while every source JSON (in source_dir, default the store's own) is unchanged."""
+        source_dir = source_dir or self.path.parent
+        return all(_matches(source_dir / name, fp) for name, fp in self.header["sources"].items())
+
+    def array(self, name: str) -> np.ndarray:
+        arr = self._arrays.get(name)
+        if arr is None:
+            spec = self.header["sections"][name]
+            count = int(np.prod(spec["shape"]))
+            arr = np.frombuffer(self._buf, dtype=spec["dtype"], count=count,
+                                offset=self._base + spec["offset"]).reshape(spec["shape"])
+            self._arrays[name] = arr
+        return arr
+
+    def _bytes(self, section: str, a: int, b: int) -> bytes:
+        base = self._base + self.header["sections"][section]["offset"]
+        return self._buf[base + a:base + b]
+
+    # ── Strings and records ──────────────────────────────────────────────────
+
+    def string(self, sid: int) -> str | None:
+        if sid < 0:
+            return None
+        offsets = self.array("strings.offsets")
+        return self._bytes("strings.blob", int(offsets[sid]), int(offsets[sid + 1])).decode()
+
+    def node_value(self, i: int, column: str) -> str | None:
+        return self.string(int(self.array(f"node.{column}")[i]))
+
+    def edge_value(self, i: int, column: str) -> str | None:
+        return self.string(int(self.array(f"edge.{column}")[i]))
+
+    def _record(self, kind: str, i: int) -> dict:
+        offsets = self.array(f"{kind}.records.offsets")
+        return json.loads(self._bytes(f"{kind}.records", int(offsets[i]), int(offsets[i + 1]) - 1))
+
+    def node(self, i: int) -> dict:
+        return self._record("node", i)
+
+    def edge(self, i: int) -> dict:
+        return self._record("edge", i)
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def _probe(self, table: str, column: str, key: str) -> int:
+        if not key:
+            return -1
+        slots, values = self.array(table), self.array(f"node.{column}")
+        mask = len(slots) - 1
+        h = zlib.crc32(key.encode()) & mask
+        while (i := int(slots[h])) != -1:
+            if self.string(int(values[i])) == key:
+                return i
+            h = (h + 1) & mask
+        return -1
+
+    def find_id(self, node_id: str) -> int:
+        """Index of the node with this id, or -1."""
+        return self._probe("hash.id", "id", node_id or "")
+
+    def find_tag(self, tag: str) -> int:
+        """Index of the first node whose normalised tag equals tag's, or -1."""
+        return self._probe("hash.tag", "tag_norm", norm_tag(tag or ""))
+
+    def neighbors(self, i: int, kind: str, direction: str = "out") -> tuple[np.ndarray, np.ndarray]:
+        """(neighbour node indices, edge indices) of node i over `kind` edges."""
+        if kind not in self.kinds:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty
+        prefix = f"csr.{kind}.{direction}"
+        indptr = self.array(f"{prefix}.indptr")
+        a, b = int(indptr[i]), int(indptr[i + 1])
+        return self.array(f"{prefix}.nbr")[a:b], self.array(f"{prefix}.edge")[a:b]
+
+    def to_graph(self) -> dict:
+        """The graph as the dict it was written from."""
+        return {
+            **self.meta,
+            "nodes": json.loads(self.array("node.records").tobytes()),
+            "edges": json.loads(self.array("edge.records").tobytes()),
+        }
+
+
+def open_store(path: Path, source_dir: Path | None = None) -> GraphStore | None:
+    """The store at `path` if it exists, is readable and matches its sources; else None."""
+    if not path.exists():
+        return None
+    try:
+        store = GraphStore(path)
+    except (ValueError, OSError, KeyError):
+        return None
+    return store if store.is_current(source_dir) else None
+
+
+# ── Supergraph ────────────────────────────────────────────────────────────────
+
+def merge_supergraph(sg: dict, read_graph) -> dict:
+    """
+    Flatten the P&ID graphs listed in a supergraph.json into one nodes+edges
+    graph. `read_graph(pid_id)` returns a graph dict or None. Node/edge ids
+    are prefixed with "pid_id:"; hubs become terminator nodes "hub::<ref>",
+    and inter_pid_edges (between "pid-007::node_id" and a hub, in either
+    direction, or two pid ends in older supergraphs) become edges marked
+    _inter_pid.
+    """
+    pids_list = list(sg.get("pid_graphs", {}).keys())
+
+    merged_nodes: list[dict] = []
+    merged_edges: list[dict] = []
+    # Maps original node id → prefixed id, per pid
+    id_maps: dict[str, dict[str, str]] = {}
+
+    for pid in pids_list:
+        subgraph = read_graph(pid)
+        if subgraph is None:
+            continue
+        prefix = pid + ":"
+        id_map: dict[str, str] = {}
+        for n in subgraph.get("nodes", []):
+            new_id = prefix + n["id"]
+            id_map[n["id"]] = new_id
+            merged_nodes.append({**n, "id": new_id, "_pid": pid})
+        id_maps[pid] = id_map
+        for e in subgraph.get("edges", []):
+            merged_edges.append({
+                **e,
+                "from": id_map.get(e.get("from", ""), prefix + e.get("from", "")),
+                "to":   id_map.get(e.get("to",   ""), prefix + e.get("to",   "")),
+                "_pid": pid,
+            })
+
+    # Hub nodes: one per off-page reference shared by several P&IDs
+    hub_ids: set[str] = set()
+    for h in sg.get("hubs", []):
+        hub_ids.add(h["id"])
+        merged_nodes.append({
+            "id":           h["id"],
+            "type":         "terminator",
+            "subtype":      "off_page_hub",
+            "off_page_ref": h.get("off_page_ref"),
+            "props":        {"pids": h.get("pids", []), "match": h.get("match")},
+            "_hub":         True,
+        })
+
+    def _resolve(ref: str) -> str | None:
+        if ref in hub_ids:
+            return ref
+        if "::" in ref:
+            pid, orig_id = ref.split("::", 1)
+            return id_maps.get(pid, {}).get(orig_id)
+        return None
+
+    for ie in sg.get("inter_pid_edges", []):
+        src_id = _resolve(ie.get("from", ""))
+        dst_id = _resolve(ie.get("to",   ""))
+        if src_id and dst_id:
+            merged_edges.append({
+                "from":     src_id,
+                "to":       dst_id,
+                "kind":     ie.get("kind", "process"),
+                "line_tag": ie.get("props", {}).get("line_tag"),
+                "_inter_pid": True,
+            })
+
+    return {
+        "schema_version": "pid.graph.v0.1.1",
+        "metadata": {
+            "pid_id":      "supergraph",
+            "description": f"Merged supergraph: {', '.join(pids_list)}",
+        },
+        "nodes": merged_nodes,
+        "edges": merged_edges,
+        "_supergraph": True,
+        "_pids": pids_list,
+        "_stats": {"nodes": len(merged_nodes), "edges": len(merged_edges)},
+    }
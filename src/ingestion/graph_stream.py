@@ -0,0 +1,225 @@
+"""
+graph_stream.py — incremental parser for a streamed pid.graph JSON response.
+
+Fed the text deltas of a streaming Claude call, it emits every node and edge
+the moment its closing brace arrives, checked against the SCHEMA_DEF item
+schema. Structural errors — an element that is not an object, misses a
+required key or is not valid JSON, or an unknown root key — raise
+GraphStreamError straight away so the call can be aborted instead of being
+found broken at the end. Softer schema issues (enum values, extra keys) are
+collected in `issues` and the element is kept.
+
+Only the element currently being received is buffered; the parser state is
+enough to checkpoint a partial graph and resume it with a continuation call.
+"""
+
+import json
+import re
+
+_JSON_TYPES = {"string": str, "array": list, "object": dict}
+_WS = " \t\r\n"
+
+
+class GraphStreamError(ValueError):
+    """Structural error in a streamed graph — the generation should be aborted."""
+
+
+def element_issues(obj, item_schema: dict) -> tuple[list[str], list[str]]:
+    """(structural errors, schema issues) for one node/edge against its item schema."""
+    if not isinstance(obj, dict):
+        return [f"element is {type(obj).__name__}, not an object"], []
+    required = item_schema.get("required", [])
+    errors = [f"missing required '{k}'" for k in required if k not in obj]
+    issues = []
+    props = item_schema.get("properties", {})
+    for k, v in obj.items():
+        spec = props.get(k)
+        if spec is None:
+            if item_schema.get("additionalProperties") is False:
+                issues.append(f"unexpected key '{k}'")
+            continue
+        expected = _JSON_TYPES.get(spec.get("type"))
+        if expected and not isinstance(v, expected):
+            (errors if k in required else issues).append(
+                f"'{k}' is {type(v).__name__}, expected {spec['type']}")
+        elif "enum" in spec and v not in spec["enum"]:
+            issues.append(f"'{k}'={v!r} not in enum")
+    return errors, issues
+
+
+def element_key(kind: str, obj: dict) -> str:
+    """Identity used to skip elements repeated by a continuation call."""
+    if kind == "nodes":
+        return str(obj.get("id"))
+    return str(obj.get("id") or (obj.get("from"), obj.get("to"), obj.get("kind")))
+
+
+class GraphStreamParser:
+    """
+    Character-level state machine over the streamed text. Tracks the container
+    stack and root-level keys; captures `metadata` and each element of the
+    root `nodes` / `edges` arrays, parsing them as soon as they close.
+    Text before the root object (e.g. a ```json fence) and after it is ignored.
+    """
+
+    ARRAYS = ("nodes", "edges")
+
+    def __init__(self, schema: dict, nodes: list | None = None, edges: list | None = None,
+                 on_element=None):
+        self.root_keys = set(schema.get("properties", {}))
+        self.item_schemas = {k: schema["properties"][k]["items"] for k in self.ARRAYS}
+        self.elements = {"nodes": list(nodes or []), "edges": list(edges or [])}
+        self.seen = {k: {element_key(k, e) for e in self.elements[k]} for k in self.ARRAYS}
+        self.header: dict = {}
+        self.issues: list[str] = []
+        self.on_element = on_element
+        self.complete = False
+        self.chars = 0
+
+        self._stack: list[tuple[str, str | None]] = []
+        self._in_str = False
+        self._esc = False
+        self._str_chars: list[str] | None = None
+        self._expect_key = False
+        self._root_key: str | None = None
+        self._capture: list[str] | None = None
+        self._capture_kind: str | None = None
+        self._capture_depth = 0
+
+    # ── Feeding ──────────────────────────────────────────────────────────────
+
+    def feed(self, text: str) -> None:
+        if self.complete:
+            return
+        cap_from = 0 if self._capture is not None else None
+        for i, ch in enumerate(text):
+            if self.complete:
+                break
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    self._end_string()
+                    continue
+                if self._str_chars is not None:
+                    self._str_chars.append(ch)
+                continue
+
+            depth = len(self._stack)
+            if depth == 0:
+                if ch == "{":
+                    self._stack.append(("{", None))
+                    self._expect_key = True
+                continue
+
+            if ch == '"':
+                self._in_str = True
+                self._str_chars = [] if depth == 1 else None
+                self._check_scalar_element(ch)
+            elif ch in "{[":
+                if self._open(ch, depth):
+                    cap_from = i
+            elif ch in "}]":
+                top, _ = self._stack.pop()
+                if self._capture is not None and len(self._stack) == self._capture_depth:
+                    self._capture.append(text[cap_from:i + 1])
+                    cap_from = None
+                    self._end_capture()
+                if not self._stack:
+                    self.complete = True
+                self._expect_key = False
+            elif ch == ",":
+                self._expect_key = self._stack[-1][0] == "{"
+            elif ch == ":":
+                self._expect_key = False
+            elif ch not in _WS:
+                self._check_scalar_element(ch)
+        if self._capture is not None and cap_from is not None:
+            self._capture.append(text[cap_from:])
+        self.chars += len(text)
+
+    def _open(self, ch: str, depth: int) -> bool:
+        """Push a container; returns True when it starts a captured value."""
+        parent, parent_key = self._stack[-1]
+        key = self._root_key if depth == 1 else None
+        if depth == 1 and key not in self.root_keys:
+            raise GraphStreamError(f"unknown root key '{key}'")
+        starts = False
+        if self._capture is None:
+            if depth == 1 and key == "metadata" and ch == "{":
+                starts, kind = True, "metadata"
+            elif depth == 2 and parent == "[" and parent_key in self.ARRAYS:
+                if ch != "{":
+                    raise GraphStreamError(f"{parent_key[:-1]} element is an array, not an object")
+                starts, kind = True, parent_key
+            if starts:
+                self._capture, self._capture_kind, self._capture_depth = [], kind, depth
+        self._stack.append((ch, key))
+        self._expect_key = ch == "{"
+        return starts
+
+    def _check_scalar_element(self, ch: str) -> None:
+        top, key = self._stack[-1]
+        if len(self._stack) == 2 and top == "[" and key in self.ARRAYS:
+            raise GraphStreamError(f"{key[:-1]} element is a scalar ({ch!r}…), not an object")
+
+    def _end_string(self) -> None:
+        if self._str_chars is None:
+            return
+        value = "".join(self._str_chars)
+        self._str_chars = None
+        if self._expect_key:
+            if value not in self.root_keys:
+                raise GraphStreamError(f"unknown root key '{value}'")
+            self._root_key = value
+        elif self._root_key == "schema_version":
+            self.header["schema_version"] = value
+
+    def _end_capture(self) -> None:
+        raw = "".join(self._capture)
+        kind = self._capture_kind
+        self._capture, self._capture_kind = None, None
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                obj = json.loads(re.sub(r",\s*([}\]])", r"\1", raw))
+            except json.JSONDecodeError as exc:
+                raise GraphStreamError(f"malformed {kind} JSON: {exc}") from None
+        if kind == "metadata":
+            self.header["metadata"] = obj
+            return
+
+        errors, issues = element_issues(obj, self.item_schemas[kind])
+        if errors:
+            raise GraphStreamError(
+                f"{kind[:-1]} {obj.get('id', len(self.elements[kind]))!r}: {'; '.join(errors)}")
+        key = element_key(kind, obj)
+        if key in self.seen[kind]:
+            return
+        self.seen[kind].add(key)
+        self.elements[kind].append(obj)
+        self.issues.extend(f"{kind[:-1]} {obj.get('id')!r}: {i}" for i in issues)
+        if self.on_element:
+            self.on_element(kind, obj)
+
+    # ── Results ──────────────────────────────────────────────────────────────
+
+    @property
+    def nodes(self) -> list[dict]:
+        return self.elements["nodes"]
+
+    @property
+    def edges(self) -> list[dict]:
+        return self.elements["edges"]
+
+    def graph(self) -> dict:
+        return {
+            "schema_version": self.header.get("schema_version"),
+            "metadata": self.header.get("metadata", {}),
+            "nodes": self.nodes,
+            "edges": self.edges,
+        }
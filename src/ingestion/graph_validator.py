@@ -0,0 +1,224 @@
+"""
+graph_validator.py — compiles SCHEMA_DEF into a standalone validator + repair module.
+
+The JSON Schema is turned into straight-line Python once (isinstance checks,
+frozenset lookups for enums and allowed keys, one loop per array) instead of
+being interpreted node by node at run time; a 1,000-element graph validates
+in well under 10 ms. The generated module also carries the repair pass from
+graph_repair.py with the schema's enums and key sets baked in.
+
+Two consumers:
+  build(SCHEMA)  — compiled in memory, used by schema.py after every conversion
+  --emit         — written to backend/utils/pid_graph_validator.py, which the
+                   backend applies to every graph it loads (no ingestion deps)
+
+Usage:
+  python graph_validator.py --emit     # regenerate the backend copy
+  python graph_validator.py --check    # exit 1 if the backend copy is stale
+"""
+
+import ast
+import hashlib
+import json
+import sys
+import types
+from pathlib import Path
+
+from config import REPO_ROOT
+
+BACKEND_MODULE = REPO_ROOT / "src" / "talking-pnids-py" / "backend" / "utils" / "pid_graph_validator.py"
+REPAIR_SOURCE  = Path(__file__).with_name("graph_repair.py")
+
+_PY_TYPES = {
+    "string": "str", "object": "dict", "array": "list", "boolean": "bool",
+    "integer": "int", "number": "(int, float)", "null": "type(None)",
+}
+
+
+def schema_hash(schema: dict) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# ── Code generation ───────────────────────────────────────────────────────────
+
+class _Codegen:
+    """Emits validator source for one schema. Paths in messages are JSONPath-like."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.consts: dict[str, str] = {}
+        self._n = 0
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def var(self, prefix: str) -> str:
+        self._n += 1
+        return f"{prefix}{self._n}"
+
+    def const(self, hint: str, suffix: str, values) -> str:
+        name = f"_{hint}_{suffix}".upper()
+        self.consts[name] = f"frozenset({sorted(values)!r})"
+        return name
+
+    def node(self, schema: dict, var: str, path: str, hint: str, indent: int) -> None:
+        """Checks for `var` against `schema`; nested checks only run once the type matched."""
+        t = schema.get("type")
+        err = f"errors.append(f\"{path}: "
+        if t:
+            self.emit(indent, f"if not isinstance({var}, {_PY_TYPES[t]}):")
+            self.emit(indent + 1, err + f"expected {t}, got {{type({var}).__name__}}\")")
+        if "const" in schema:
+            self.emit(indent, f"{'elif' if t else 'if'} {var} != {schema['const']!r}:")
+            self.emit(indent + 1, err + f"{{{var}!r}} != {schema['const']!r}\")")
+        elif "enum" in schema:
+            name = self.const(hint, "enum", schema["enum"])
+            self.emit(indent, f"{'elif' if t else 'if'} {var} not in {name}:")
+            self.emit(indent + 1, err + f"{{{var}!r}} not in enum\")")
+
+        body = self._object_body if t == "object" else self._array_body if t == "array" else None
+        if body is None:
+            return
+        probe = len(self.lines)
+        self.emit(indent, "else:")
+        body(schema, var, path, hint, indent + 1)
+        if len(self.lines) == probe + 1:
+            self.lines.pop()        # nothing below the type check
+
+    def _object_body(self, schema: dict, var: str, path: str, hint: str, indent: int) -> None:
+        props = schema.get("properties", {})
+        for key in schema.get("required", []):
+            self.emit(indent, f"if {key!r} not in {var}:")
+            msg = f"{path}: missing required '{key}'"
+            self.emit(indent + 1, f"errors.append({'f' if '{' in path else ''}{msg!r})")
+        if schema.get("additionalProperties") is False:
+            name = self.const(hint, "keys", props)
+            self.emit(indent, f"if not {var}.keys() <= {name}:")
+            self.emit(indent + 1, f"for k in sorted({var}.keys() - {name}):")
+            self.emit(indent + 2, f"errors.append(f\"{path}: unexpected key {{k!r}}\")")
+        for key, sub in props.items():
+            if not sub:
+                continue
+            v = self.var("v")
+            self.emit(indent, f"{v} = {var}.get({key!r}, _MISSING)")
+            self.emit(indent, f"if {v} is not _MISSING:")
+            self.node(sub, v, f"{path}.{key}", key if hint == "root" else f"{hint}_{key}", indent + 1)
+
+    def _array_body(self, schema: dict, var: str, path: str, hint: str, indent: int) -> None:
+        items = schema.get("items")
+        if not items:
+            return
+        i, v = self.var("i"), self.var("v")
+        self.emit(indent, f"for {i}, {v} in enumerate({var}):")
+        self.node(items, v, f"{path}[{{{i}}}]", hint, indent + 1)
+
+
+def _repair_constants(schema: dict) -> dict:
+    """The values graph_repair.py reads from _K."""
+    props = schema["properties"]
+    node, edge = props["nodes"]["items"]["properties"], props["edges"]["items"]["properties"]
+
+    def string_keys(fields: dict) -> list[str]:
+        return sorted(k for k, s in fields.items() if s.get("type") == "string" and "enum" not in s)
+
+    return {
+        "schema_version": props["schema_version"]["const"],
+        "root_keys":   frozenset(props),
+        "node_keys":   frozenset(node),
+        "edge_keys":   frozenset(edge),
+        "node_types":  frozenset(node["type"]["enum"]),
+        "node_layers": frozenset(node["layer"]["enum"]),
+        "node_status": frozenset(node["status"]["enum"]),
+        "edge_kinds":  frozenset(edge["kind"]["enum"]),
+        "flow_dirs":   frozenset(edge["flow_dir"]["enum"]),
+        "node_string_keys": tuple(string_keys(node)),
+        "edge_string_keys": tuple(string_keys(edge)),
+    }
+
+
+def _literal(value) -> str:
+    if isinstance(value, frozenset):
+        return f"frozenset({sorted(value)!r})"
+    return repr(value)
+
+
+def generate_source(schema: dict) -> str:
+    """Full source of the validator module for `schema`."""
+    gen = _Codegen()
+    gen.emit(0, "def validate_graph(doc) -> list[str]:")
+    gen.emit(1, '"""Schema errors for one pid.graph document (empty list = valid)."""')
+    gen.emit(1, "errors: list[str] = []")
+    gen.node(schema, "doc", "$", "root", 1)
+    gen.emit(1, "return errors")
+
+    repair = REPAIR_SOURCE.read_text()
+    doc_end = ast.parse(repair).body[0].end_lineno
+    repair = "\n".join(repair.splitlines()[doc_end:]).strip("\n")
+
+    constants = "\n".join(
+        f"    {k!r}: {_literal(v)}," for k, v in _repair_constants(schema).items())
+    return "\n".join([
+        '"""',
+        f"pid_graph_validator.py — compiled validator + repair pass for {schema.get('title', 'pid.graph')}.",
+        "",
+        "GENERATED by src/ingestion/graph_validator.py from SCHEMA_DEF in schema.py —",
+        "do not edit; regenerate with `python src/ingestion/graph_validator.py --emit`.",
+        "",
+        "  validate_graph(doc)    — schema errors (list of strings, empty = valid)",
+        "  reference_errors(doc)  — duplicate ids and dangling edge endpoints",
+        "  repair_graph(doc)      — fix what can be fixed in place → (doc, fixes)",
+        '"""',
+        "",
+        "# ── Repair (graph_repair.py) " + "─" * 49,
+        "",
+        repair,
+        "",
+        "",
+        "# ── Schema constants " + "─" * 57,
+        "",
+        f"SCHEMA_HASH = {schema_hash(schema)!r}",
+        "_MISSING = object()",
+        "_K.update({",
+        constants,
+        "})",
+        *(f"{name} = {value}" for name, value in gen.consts.items()),
+        "",
+        "",
+        "# ── Validator " + "─" * 64,
+        "",
+        *gen.lines,
+        "",
+    ])
+
+
+# ── Build / emit ──────────────────────────────────────────────────────────────
+
+def build(schema: dict) -> types.ModuleType:
+    """Compile the validator module in memory."""
+    module = types.ModuleType("pid_graph_validator")
+    exec(compile(generate_source(schema), "<pid_graph_validator>", "exec"), module.__dict__)
+    return module
+
+
+def emit(schema: dict, path: Path = BACKEND_MODULE) -> Path:
+    path.write_text(generate_source(schema))
+    print(f"[validator] Wrote {path} (schema {schema_hash(schema)})")
+    return path
+
+
+def is_current(schema: dict, path: Path = BACKEND_MODULE) -> bool:
+    return path.exists() and path.read_text() == generate_source(schema)
+
+
+if __name__ == "__main__":
+    from schema import SCHEMA
+
+    if "--emit" in sys.argv:
+        emit(SCHEMA)
+    elif "--check" in sys.argv:
+        if not is_current(SCHEMA):
+            print(f"[validator] {BACKEND_MODULE.name} is stale — run: python graph_validator.py --emit")
+            sys.exit(1)
+        print(f"[validator] {BACKEND_MODULE.name} is current")
+    else:
+        print(__doc__)
@@ -5,14 +5,14 @@ Usage:
   python ingest.py --pdf ../../data/datasets/rumaila-pp01/pdfs/100478CP-N-PG-PP01-PR-PID-0008-001-C02.pdf
   python ingest.py --all
   python ingest.py --pdf ... --step extract
-  python ingest.py --supergraph
+  python ingest.py --supergraph [--enrich]
   python ingest.py --pdf ... --force   # re-run all steps even if outputs exist
 
 Steps (all resume by default):
   tile      → PDF → 3×2 PNG tiles + embedded text
   extract   → tiles → Claude Opus 4.6 vision (3 passes × 6 tiles = 18 API calls)
-  stitch    → 6 tile JSONs → unified_extraction.json
-  schema    → unified_extraction → pid.graph.v0.1.1 JSON
+  stitch    → 6 tile JSONs → unified_extraction.json (incremental, per-tile hashes)
+  schema    → unified_extraction → pid.graph.v0.1.1 JSON (re-run if the extraction or converter changed)
   validate  → graph vs Excel + OCR + completeness rules → confidence report
 """
 
@@ -42,7 +42,7 @@ _step_estimates = {
     "tile":     "~5s",
     "extract":  "~15-25 min (18 Claude Opus calls)",
     "stitch":   "~5s",
-    "schema":   "~1-2 min (1 Claude Sonnet call)",
+    "schema":   "<1s (rule-based; Sonnet only for unmapped component types)",
     "validate": "~5s",
 }
 
@@ -364,6 +364,7 @@ Examples:
     parser.add_argument("--pdf",        type=Path, help="Path to a P&ID PDF")
     parser.add_argument("--all",        action="store_true", help="Run all 3 POC P&IDs")
     parser.add_argument("--supergraph", action="store_true", help="Build super graph from existing P&ID graphs")
+    parser.add_argument("--enrich",     action="store_true", help="With --supergraph: add the LLM connectivity summary")
     parser.add_argument("--check",      action="store_true", help="Check integrity of all pipeline outputs (read-only)")
     parser.add_argument("--step",       choices=PIPELINE_STEPS, help="Run only this step")
     parser.add_argument("--force",      action="store_true", help="Re-run even if outputs exist")
@@ -374,14 +375,14 @@ Examples:
         ok = check_integrity()
         sys.exit(0 if ok else 1)
 
-    if not os.environ.get("ANTHROPIC_API_KEY"):
+    if not os.environ.get("ANTHROPIC_API_KEY") and not (args.supergraph and not args.enrich):
         print("[ingest] ERROR: ANTHROPIC_API_KEY not set and apikey-claude-talking-pnid not found")
         sys.exit(1)
 
     if args.supergraph:
         _banner("Building Super Graph")
         t = time.time()
-        build_supergraph(force=args.force)
+        build_supergraph(force=args.force, enrich=args.enrich)
         print(f"\n  Done in {time.time()-t:.1f}s → {graphs_dir() / 'supergraph.json'}")
         return
 
@@ -1,28 +1,56 @@
 """
 rag.py — Build RAG index from narrative DOCX files.
 
-Chunks narrative documents, embeds with text-embedding-3-small,
-saves chunks.json + embeddings.npy to data/rag/.
+Chunks narrative documents, embeds them with the provider selected by
+EMBED_PROVIDER / --embedder (embedding.py: "openai" = text-embedding-3-small,
+"local" = hashed TF-IDF on CPU), saves chunks.json + embeddings.npy to data/rag/.
+
+Incremental: manifest.json records a fingerprint per document and the text
+hash of each of its chunks. Unchanged documents are not re-read, and a chunk
+is embedded only if no chunk with the same text hash is in the index yet, so
+editing one procedure re-embeds only the chunks that actually changed.
+
+Changed documents are read by streaming word/document.xml out of the zip
+(no python-docx object model) and chunked in a process pool; remote
+embedding batches go out EMBED_CONCURRENCY at a time under RPM/TPM limits.
 
 Usage:
-  python rag.py          # index all docs (skips if index exists)
+  python rag.py          # index new / changed docs (no-op if nothing changed)
   python rag.py --force  # re-index everything
+  python rag.py --embedder local   # offline index, no API key needed
+  python rag.py --ann    # also build the IVF ANN index (automatic from ANN_MIN_CHUNKS)
 
 Output:
-  src/talking-pnids-py/data/rag/chunks.json   — chunk text + metadata
-  src/talking-pnids-py/data/rag/embeddings.npy — numpy float32 array (N x 1536)
+  src/talking-pnids-py/data/rag/chunks.json    — chunk text + metadata + hash
+  src/talking-pnids-py/data/rag/embeddings.npy — L2-normalised vectors (N x dim), EMBED_STORAGE dtype
+  src/talking-pnids-py/data/rag/embedding_scales.npy — per-row scales (int8 storage only)
+  src/talking-pnids-py/data/rag/manifest.json  — embedder, per-document fingerprints, sha256
+                                                 of the other files (written last: the commit marker)
+  src/talking-pnids-py/data/rag/embedder.npz   — fitted local model (local provider only)
+  src/talking-pnids-py/data/rag/ann.npz        — IVF-flat ANN index (ann.py; large indexes only)
 """
 
+import hashlib
 import json
 import os
 import sys
+import threading
 import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from xml.etree import ElementTree
 
 import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent))
+from ann import ANN_FILE, IVFIndex, default_nlist
 from config import REPO_ROOT, _load_key
+from embedding import (
+    LOCAL_FILE, LOCAL_MODEL, PROVIDERS, HashedTfidfEmbedder, OpenAIEmbedder, legacy_info,
+    dequantize, normalize_rows, partition_rows, quantize,
+)
 
 # ── Paths ─────────────────────────────────────────────────────────────────────
 
@@ -44,32 +72,81 @@ DOC_TAG_MAP = {
 
 CHUNK_SIZE    = 1500   # characters (~375 tokens)
 CHUNK_OVERLAP = 200    # characters
-EMBED_MODEL   = "text-embedding-3-small"
-EMBED_DIM     = 1536
+EMBED_PROVIDER = os.environ.get("RAG_EMBEDDER", "openai")   # "openai" | "local"
+PARSE_WORKERS     = os.cpu_count() or 1   # documents read + chunked in parallel processes
+EMBED_BATCH       = 100      # texts per embedding request
+EMBED_CONCURRENCY = 4        # openai: embedding requests in flight
+EMBED_RPM         = 3_000    # openai: requests per minute (text-embedding-3-small, tier 1)
+EMBED_TPM         = 1_000_000  # openai: tokens per minute (≈ chars / 4)
+EMBED_RETRIES     = 4
+EMBED_STORAGE     = "float16"  # "float16" | "int8" (per-row scale) | "float32" — rows stored normalised
+ANN_MIN_CHUNKS    = 20_000     # indexes this large also get an IVF ANN index (--ann forces it)
+MANIFEST_VERSION = 1
 
 # ── DOCX reading ──────────────────────────────────────────────────────────────
 
-def _read_docx(path: Path) -> str:
-    """Extract plain text from a DOCX file."""
-    try:
-        from docx import Document
-    except ImportError:
-        print("[rag] ERROR: python-docx not installed. Run: pip install python-docx")
-        sys.exit(1)
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_blocks(path: Path):
+    """
+    Stream word/document.xml straight out of the zip: yields ("p", text) for
+    each body paragraph and ("row", [cell text, ...]) for each row of a
+    top-level table, in document order. Finished elements are cleared as the
+    parse goes, so memory stays flat however long the document is.
+    """
+    tables = 0               # table nesting depth
+    paragraphs: list = []    # text parts of the paragraphs being read (textboxes nest)
+    cell: list[str] = []
+    row: list[str] = []
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        for event, el in ElementTree.iterparse(xml, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                if tag == _W + "p":
+                    paragraphs.append([])
+                elif tag == _W + "tbl":
+                    tables += 1
+                continue
+            if not paragraphs and tag in (_W + "t", _W + "tab", _W + "br", _W + "cr"):
+                continue
+            if tag == _W + "t":
+                paragraphs[-1].append(el.text or "")
+            elif tag == _W + "tab":
+                paragraphs[-1].append("\t")
+            elif tag in (_W + "br", _W + "cr"):
+                paragraphs[-1].append("\n")
+            elif tag == _W + "p":
+                text = "".join(paragraphs.pop())
+                if not paragraphs:
+                    if tables == 0:
+                        yield "p", text
+                    elif tables == 1:
+                        cell.append(text)
+                el.clear()
+            elif tag == _W + "tc" and tables == 1:
+                row.append("\n".join(cell))
+                cell = []
+            elif tag == _W + "tr" and tables == 1:
+                yield "row", row
+                row = []
+            elif tag == _W + "tbl":
+                tables -= 1
+                el.clear()
+
 
-    doc = Document(str(path))
-    paragraphs = []
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if text:
-            paragraphs.append(text)
-    # Also extract table cells
-    for table in doc.tables:
-        for row in table.rows:
-            row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
+def _read_docx(path: Path) -> str:
+    """Plain text of a DOCX: body paragraphs, then table rows as "cell | cell" lines."""
+    paragraphs, rows = [], []
+    for kind, value in _docx_blocks(path):
+        if kind == "p":
+            if value.strip():
+                paragraphs.append(value.strip())
+        else:
+            row_text = " | ".join(c.strip() for c in value if c.strip())
             if row_text:
-                paragraphs.append(row_text)
-    return "\n\n".join(paragraphs)
+                rows.append(row_text)
+    return "\n\n".join(paragraphs + rows)
 
 
 # ── Chunking ──────────────────────────────────────────────────────────────────
@@ -94,94 +171,330 @@ def _chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP)
     return [c for c in chunks if len(c) > 100]  # skip tiny trailing chunks
 
 
-# ── Embedding ─────────────────────────────────────────────────────────────────
+def _read_and_chunk(path: Path) -> tuple[int, list[str]]:
+    """(characters read, chunks) for one document — runs in a worker process."""
+    text = _read_docx(path)
+    return len(text), _chunk_text(text)
 
-def _embed_batch(client, texts: list[str]) -> list[list[float]]:
-    """Embed a batch of texts, respecting API rate limits."""
-    response = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    return [item.embedding for item in response.data]
 
+def _parse_docs(paths: list[Path]) -> list[tuple[int, list[str]]]:
+    """_read_and_chunk for every path, in a process pool when there is more than one."""
+    workers = min(PARSE_WORKERS, len(paths))
+    if workers <= 1:
+        return [_read_and_chunk(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_read_and_chunk, paths))
 
-# ── Main indexing ─────────────────────────────────────────────────────────────
 
-def build_index(force: bool = False) -> None:
-    chunks_path = RAG_OUT_DIR / "chunks.json"
-    embed_path  = RAG_OUT_DIR / "embeddings.npy"
-
-    if chunks_path.exists() and embed_path.exists() and not force:
-        existing = json.loads(chunks_path.read_text())
-        print(f"[rag] Index already exists: {len(existing)} chunks. Use --force to rebuild.")
-        return
+# ── Embedding ─────────────────────────────────────────────────────────────────
 
+def _local_embedder(manifest: dict, corpus: list[str]) -> tuple[HashedTfidfEmbedder, bool]:
+    """(embedder, fitted now). The model an index was built with is reused as is,
+    so its vectors stay valid; a new one is fitted on the whole corpus."""
+    if manifest.get("embedder", {}).get("provider") == "local" and (RAG_OUT_DIR / LOCAL_FILE).exists():
+        return HashedTfidfEmbedder.load(RAG_OUT_DIR), False
+    print(f"[rag] Fitting local {LOCAL_MODEL} embedder on {len(corpus)} chunks")
+    return HashedTfidfEmbedder().fit(corpus), True
+
+
+class _RateLimiter:
+    """Sliding one-minute window over requests and approximate tokens, shared by threads."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm, self.tpm = rpm, tpm
+        self.lock = threading.Lock()
+        self.sent: deque = deque()   # (time, tokens)
+
+    def acquire(self, tokens: int) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.sent and now - self.sent[0][0] >= 60:
+                    self.sent.popleft()
+                used = sum(t for _, t in self.sent)
+                if not self.sent or (len(self.sent) < self.rpm and used + tokens <= self.tpm):
+                    self.sent.append((now, tokens))
+                    return
+                wait = 60 - (now - self.sent[0][0])
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+
+def _embed_all(embedder, texts: list[str], concurrent: bool) -> list[np.ndarray]:
+    """Embed texts in EMBED_BATCH batches. Remote providers get EMBED_CONCURRENCY
+    requests in flight under the RPM/TPM limits, each retried with backoff."""
+    batches = [texts[i:i + EMBED_BATCH] for i in range(0, len(texts), EMBED_BATCH)]
+    limiter = _RateLimiter(EMBED_RPM, EMBED_TPM) if concurrent else None
+
+    def run(batch: list[str]) -> np.ndarray:
+        if limiter:
+            limiter.acquire(sum(len(t) for t in batch) // 4)
+        for attempt in range(EMBED_RETRIES):
+            try:
+                return embedder.embed(batch)
+            except Exception as e:
+                if attempt == EMBED_RETRIES - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"[rag]   Embedding request failed ({type(e).__name__}: {e}) — retrying in {delay}s")
+                time.sleep(delay)
+
+    out: list[np.ndarray] = []
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY if concurrent else 1) as pool:
+        for done, vecs in enumerate(pool.map(run, batches), 1):
+            out.extend(vecs)
+            print(f"[rag]   Embedded batch {done}/{len(batches)} ({len(vecs)} texts)")
+    return out
+
+
+def _openai_embedder() -> OpenAIEmbedder:
     _load_key("apikey-openai-talking-pnid", "OPENAI_API_KEY")
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
-        print("[rag] ERROR: OPENAI_API_KEY not set")
+        print("[rag] ERROR: OPENAI_API_KEY not set (or build offline with --embedder local)")
         sys.exit(1)
-
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
-
+    return OpenAIEmbedder(api_key)
+
+
+# ── Incremental index ─────────────────────────────────────────────────────────
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _fingerprint(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": hashlib.sha256(path.read_bytes()).hexdigest()[:16]}
+
+
+def _doc_unchanged(path: Path, entry: dict) -> bool:
+    """Same file as last build: equal size, and equal mtime or (after a copy) equal content."""
+    st = path.stat()
+    if st.st_size != entry.get("size"):
+        return False
+    return st.st_mtime_ns == entry.get("mtime_ns") or \
+        hashlib.sha256(path.read_bytes()).hexdigest()[:16] == entry.get("sha256")
+
+
+def _discover_docs() -> dict[str, list[str]]:
+    """fname → pid tags: DOC_TAG_MAP first, then any other narrative DOCX as global."""
+    docs = dict(DOC_TAG_MAP)
+    if NARRATIVES_DIR.exists():
+        for path in sorted(NARRATIVES_DIR.glob("*.docx")):
+            if not path.name.startswith("~$"):      # Word lock files
+                docs.setdefault(path.name, ["global"])
+    return docs
+
+
+def _files_match(manifest: dict) -> bool:
+    """Every file the manifest records exists with the sha256 it recorded (as rag_retriever checks)."""
+    for name, digest in manifest["files"].items():
+        path = RAG_OUT_DIR / name
+        if not path.exists() or hashlib.sha256(path.read_bytes()).hexdigest()[:16] != digest:
+            return False
+    return True
+
+
+def _load_existing(provider: str) -> tuple[list[dict], np.ndarray | None, dict]:
+    """(chunks, embeddings, manifest) of the current index; empty if missing or inconsistent.
+    A manifest that records file digests must match the files on disk, or a build that
+    died halfway would pair old chunk hashes with new vectors; such an index is rebuilt.
+    Indexes built before the manifest existed get their chunk hashes computed here."""
+    chunks_path, embed_path = RAG_OUT_DIR / "chunks.json", RAG_OUT_DIR / "embeddings.npy"
+    manifest_path = RAG_OUT_DIR / "manifest.json"
+    if not chunks_path.exists() or not embed_path.exists():
+        return [], None, {}
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    if "files" in manifest and not _files_match(manifest):
+        print("[rag] Existing index files do not match manifest.json (interrupted build?) — rebuilding")
+        return [], None, {}
+    chunks = json.loads(chunks_path.read_text())
+    scales_path = RAG_OUT_DIR / "embedding_scales.npy"
+    if "files" in manifest:
+        has_scales = "embedding_scales.npy" in manifest["files"]    # a leftover one is stale
+    else:
+        has_scales = scales_path.exists()
+    embeddings = dequantize(np.load(str(embed_path)),
+                            np.load(str(scales_path)) if has_scales else None)
+    if len(chunks) != len(embeddings):
+        print(f"[rag] Existing index is inconsistent ({len(chunks)} chunks, "
+              f"{len(embeddings)} vectors) — rebuilding")
+        return [], None, {}
+    for c in chunks:
+        c.setdefault("hash", _text_hash(c["text"]))
+    built_with = manifest.get("embedder") or legacy_info()
+    if built_with["provider"] != provider:
+        print(f"[rag] Index was built with {built_with['provider']} embeddings — re-embedding with {provider}")
+        return [], None, {}
+    return chunks, embeddings, manifest
+
+
+def _replace(path: Path, write) -> str:
+    """Write via a temp file in the same directory and rename over `path`; returns its sha256."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    digest = hashlib.sha256(tmp.read_bytes()).hexdigest()[:16]
+    os.replace(tmp, path)
+    return digest
+
+
+def _save_index(chunks: list[dict], embeddings: np.ndarray, manifest: dict, embedder=None) -> None:
+    """
+    Everything is computed first (quantised rows, ANN training), then the data
+    files are replaced one by one and manifest.json last. The manifest is the
+    commit marker: it records the sha256 of every file it goes with
+    ("files"), so a reader that sees files from another build rejects them.
+    Files the new index no longer has are removed after the manifest.
+    """
     RAG_OUT_DIR.mkdir(parents=True, exist_ok=True)
+    stored, scales = quantize(normalize_rows(embeddings), manifest["storage"]["dtype"])
+    ann = None
+    if manifest.get("ann"):
+        t0 = time.time()
+        ann = IVFIndex.train(stored, manifest["ann"]["nlist"], scales)
+        print(f"[rag] ANN index: {ann.nlist} lists over {len(ann)} rows in {time.time() - t0:.1f}s")
+
+    files = {}
+    if isinstance(embedder, HashedTfidfEmbedder):
+        files[LOCAL_FILE] = _replace(RAG_OUT_DIR / LOCAL_FILE, embedder.save)
+    if scales is not None:
+        files["embedding_scales.npy"] = _replace(RAG_OUT_DIR / "embedding_scales.npy",
+                                                 lambda f: np.save(f, scales))
+    files["embeddings.npy"] = _replace(RAG_OUT_DIR / "embeddings.npy", lambda f: np.save(f, stored))
+    if ann is not None:
+        files[ANN_FILE] = _replace(RAG_OUT_DIR / ANN_FILE, ann.save)
+    files["chunks.json"] = _replace(RAG_OUT_DIR / "chunks.json",
+                                    lambda f: f.write(json.dumps(chunks, indent=2).encode()))
+    manifest["files"] = files
+    _replace(RAG_OUT_DIR / "manifest.json", lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    for name in ("embedding_scales.npy", ANN_FILE):
+        if name not in files and (RAG_OUT_DIR / name).exists():
+            (RAG_OUT_DIR / name).unlink()
 
-    all_chunks = []    # list of {text, source, pid_tags, chunk_index}
-    all_texts  = []    # flat list of text strings for embedding
 
-    print(f"[rag] Reading {len(DOC_TAG_MAP)} documents from {NARRATIVES_DIR}")
+# ── Main indexing ─────────────────────────────────────────────────────────────
 
-    for fname, pid_tags in DOC_TAG_MAP.items():
-        fpath = NARRATIVES_DIR / fname
-        if not fpath.exists():
+def build_index(force: bool = False, provider: str | None = None, ann: bool = False) -> None:
+    """
+    Bring the index in line with the narrative documents. A document whose
+    file is unchanged keeps its chunks; a changed one is re-read and
+    re-chunked, and only chunks whose text hash is not already in the index
+    are embedded. Switching provider, or --force, re-embeds everything.
+    The ANN index is retrained whenever the index is rewritten.
+    """
+    provider = provider or EMBED_PROVIDER
+    if provider not in PROVIDERS:
+        print(f"[rag] ERROR: unknown embedder {provider!r} (expected one of {', '.join(PROVIDERS)})")
+        sys.exit(1)
+    old_chunks, old_embeddings, manifest = ([], None, {}) if force else _load_existing(provider)
+    vectors: dict[str, np.ndarray] = {}
+    for i, c in enumerate(old_chunks):
+        vectors.setdefault(c["hash"], old_embeddings[i])
+    old_by_doc: dict[str, list[dict]] = {}
+    for c in old_chunks:
+        old_by_doc.setdefault(c["source"], []).append(c)
+    old_docs = manifest.get("documents", {})
+
+    docs = _discover_docs()
+    print(f"[rag] Checking {len(docs)} documents in {NARRATIVES_DIR}")
+
+    # Documents with the same tag set are stored next to each other, so each
+    # P&ID's chunks form contiguous row ranges
+    present = {}
+    for fname, pid_tags in sorted(docs.items(), key=lambda d: (d[1], d[0])):
+        if (NARRATIVES_DIR / fname).exists():
+            present[fname] = pid_tags
+        else:
             print(f"[rag]   SKIP (not found): {fname}")
-            continue
-
-        print(f"[rag]   Reading: {fname} → tags={pid_tags}")
-        text = _read_docx(fpath)
-        chunks = _chunk_text(text)
-        print(f"[rag]     {len(text):,} chars → {len(chunks)} chunks")
-
-        for i, chunk in enumerate(chunks):
-            all_chunks.append({
-                "text":        chunk,
-                "source":      fname,
-                "pid_tags":    pid_tags,
-                "chunk_index": i,
-            })
-            all_texts.append(chunk)
-
-    print(f"\n[rag] Total: {len(all_chunks)} chunks to embed")
-
-    # Embed in batches of 100
-    all_embeddings = []
-    batch_size = 100
+    changed = [
+        fname for fname in present
+        if not (fname in old_docs and fname in old_by_doc
+                and _doc_unchanged(NARRATIVES_DIR / fname, old_docs[fname]))
+    ]
     t0 = time.time()
+    parsed = dict(zip(changed, _parse_docs([NARRATIVES_DIR / f for f in changed])))
+    if changed:
+        print(f"[rag] Read {len(changed)} documents in {time.time() - t0:.1f}s")
+
+    all_chunks: list[dict] = []
+    doc_entries: dict[str, dict] = {}
+    for fname, pid_tags in present.items():
+        if fname in parsed:
+            n_chars, pieces = parsed[fname]
+            chunks = [
+                {"text": chunk, "source": fname, "pid_tags": pid_tags,
+                 "chunk_index": i, "hash": _text_hash(chunk)}
+                for i, chunk in enumerate(pieces)
+            ]
+            print(f"[rag]   {fname} → tags={pid_tags}: {n_chars:,} chars → {len(chunks)} chunks")
+            fp = _fingerprint(NARRATIVES_DIR / fname)
+        else:
+            chunks = [{**c, "pid_tags": pid_tags} for c in old_by_doc[fname]]
+            fp = {k: old_docs[fname][k] for k in ("size", "mtime_ns", "sha256")}
+        doc_entries[fname] = {**fp, "pid_tags": pid_tags, "chunks": [c["hash"] for c in chunks]}
+        all_chunks.extend(chunks)
+
+    removed = [f for f in old_docs if f not in doc_entries]
+    same_storage = manifest.get("storage", {}).get("dtype") == EMBED_STORAGE
+    # Once built (or forced with --ann), the ANN index is kept up to date
+    want_ann = bool(all_chunks) and (ann or "ann" in manifest or len(all_chunks) >= ANN_MIN_CHUNKS)
+    same_ann = bool(manifest.get("ann")) == want_ann
+    if (not changed and not removed and all_chunks == old_chunks and old_docs
+            and same_storage and same_ann):
+        print(f"[rag] Index up to date: {len(all_chunks)} chunks. Use --force to rebuild.")
+        return
 
-    for i in range(0, len(all_texts), batch_size):
-        batch = all_texts[i:i + batch_size]
-        print(f"[rag]   Embedding batch {i // batch_size + 1}/{(len(all_texts) + batch_size - 1) // batch_size} ({len(batch)} texts)...")
-        embeddings = _embed_batch(client, batch)
-        all_embeddings.extend(embeddings)
-
-    elapsed = time.time() - t0
-    embed_array = np.array(all_embeddings, dtype=np.float32)
-
-    # Estimate cost: text-embedding-3-small = $0.02 / 1M tokens
-    total_chars = sum(len(t) for t in all_texts)
-    approx_tokens = total_chars // 4
-    approx_cost = approx_tokens * 0.02 / 1_000_000
-
-    print(f"\n[rag] Embedding complete: {len(all_chunks)} chunks, {embed_array.shape}")
-    print(f"[rag] Approx tokens: {approx_tokens:,} | Cost: ~${approx_cost:.4f} | Time: {elapsed:.1f}s")
-
-    # Save
-    chunks_path.write_text(json.dumps(all_chunks, indent=2))
-    np.save(str(embed_path), embed_array)
+    embedder = None
+    if provider == "local":
+        embedder, refitted = _local_embedder(manifest, [c["text"] for c in all_chunks])
+        if refitted:
+            vectors.clear()
+
+    # Embed only chunk texts the index has no vector for yet
+    to_embed = list(dict.fromkeys(c["hash"] for c in all_chunks if c["hash"] not in vectors))
+    texts = {c["hash"]: c["text"] for c in all_chunks}
+    print(f"\n[rag] {len(all_chunks)} chunks ({len(changed)} documents changed, "
+          f"{len(removed)} removed) — {len(to_embed)} to embed")
+
+    if to_embed:
+        embedder = embedder or _openai_embedder()
+
+        t0 = time.time()
+        vecs = _embed_all(embedder, [texts[h] for h in to_embed], concurrent=provider == "openai")
+        vectors.update(zip(to_embed, vecs))
+        elapsed = time.time() - t0
+
+        if provider == "openai":
+            # Estimate cost: text-embedding-3-small = $0.02 / 1M tokens
+            approx_tokens = sum(len(texts[h]) for h in to_embed) // 4
+            approx_cost = approx_tokens * 0.02 / 1_000_000
+            print(f"[rag] Approx tokens: {approx_tokens:,} | Cost: ~${approx_cost:.4f} | Time: {elapsed:.1f}s")
+        else:
+            print(f"[rag] Time: {elapsed:.2f}s")
+
+    info = embedder.info() if embedder else manifest.get("embedder") or legacy_info()
+    embed_array = np.array([vectors[c["hash"]] for c in all_chunks], dtype=np.float32) \
+        if all_chunks else np.zeros((0, info["dim"]), dtype=np.float32)
+    new_manifest = {
+        "version": MANIFEST_VERSION,
+        "embedder": info,
+        "storage": {"dtype": EMBED_STORAGE, "normalized": True},
+        "chunk_count": len(all_chunks),
+        "partitions": partition_rows(all_chunks),
+        "documents": doc_entries,
+    }
+    if want_ann:
+        new_manifest["ann"] = {"kind": "ivf-flat", "nlist": default_nlist(len(all_chunks))}
+    _save_index(all_chunks, embed_array, new_manifest, embedder)
 
     print(f"[rag] Saved:")
-    print(f"  → {chunks_path}  ({len(all_chunks)} chunks)")
-    print(f"  → {embed_path}  (shape {embed_array.shape})")
+    print(f"  → {RAG_OUT_DIR / 'chunks.json'}  ({len(all_chunks)} chunks)")
+    print(f"  → {RAG_OUT_DIR / 'embeddings.npy'}  (shape {embed_array.shape}, {EMBED_STORAGE})")
+    print(f"  → {RAG_OUT_DIR / 'manifest.json'}  ({len(doc_entries)} documents)")
 
 
 if __name__ == "__main__":
     force = "--force" in sys.argv
-    build_index(force=force)
+    provider = sys.argv[sys.argv.index("--embedder") + 1] if "--embedder" in sys.argv else None
+    build_index(force=force, provider=provider, ann="--ann" in sys.argv)
@@ -0,0 +1,223 @@
+"""
+ref_match.py — fuzzy matching of off-page references across P&IDs.
+
+Off-page labels for the same connection rarely agree character for character:
+drawing numbers are formatted differently (PID-0049 / PID 49), revisions are
+appended (…-001-C02), one side says TO and the other FROM, and OCR drops or
+swaps letters. RefMatcher indexes canonicalised references by character
+trigram, blocked by the drawing number they mention, so candidates for a
+reference come from a few short posting lists instead of every other
+reference. Candidates are scored with match_score (trigram overlap + edit
+distance) and clustered with union-find.
+
+Usage:
+  python ref_match.py --check    # exit 1 if a REGRESSION_CASES pair is misjudged
+"""
+
+import re
+import sys
+
+MATCH_VERSION = 3           # bump when canonical_ref / match_score change, so cached matches are redone
+TRIGRAM = 3
+MIN_SUFFIX_REF = 8          # a canonical ref this long may match another it is a suffix of
+MAX_POSTING_FRACTION = 0.5  # in blocks of 20+ refs, trigrams shared by more than this share are skipped
+
+_DRAWING_RE  = re.compile(r"PID[\s\-_.]*0*(\d{1,4})(?![A-Z0-9])")
+_SHEET_RE    = re.compile(r"(PID\d{4})(?:[\s\-_]*\d{3})?(?:[\s\-_]*[A-Z]\d{2})?(?![A-Z0-9])")
+_REVISION_RE = re.compile(r"[\s\-_]+REV\.?\s*[A-Z0-9]{1,2}$")
+_DIRECTION_RE = re.compile(r"^(?:TO|FROM)\s+")
+
+# (ref, ref, should match at 0.85) pairs RefMatcher.candidates has to get right
+REGRESSION_CASES = [
+    ("TO PID-0049", "FROM PID 49", True),
+    ("PR-PID-0049", "FROM PLANT-01-UNIT-362-AREA-07-N-PG-PP01-PR-PID-0049", True),  # suffix rule, below the Dice bound
+    ("TO PID-0O49", "FROM PID-0O12", False),                # OCR-broken drawing numbers
+    ("TO DS-1", "FROM DS-3", False),
+]
+
+
+def drawing_number(ref: str) -> str | None:
+    """
+    Drawing number a reference points at (PID-0049, PID 49 → 'PID0049'), if
+    any. A number that runs on into letters (an OCR slip such as PID-0O49) is
+    not read as a drawing number, so the ref is matched outside any block.
+    """
+    m = _DRAWING_RE.search((ref or "").upper())
+    return f"PID{int(m.group(1)):04d}" if m else None
+
+
+def canonical_ref(ref: str) -> str:
+    """
+    Matching form: uppercase, TO/FROM prefix and trailing sheet/revision
+    suffixes dropped, drawing number formatted as PID0049, separators removed.
+    """
+    s = (ref or "").upper().strip()
+    s = _DIRECTION_RE.sub("", s)
+    s = _DRAWING_RE.sub(lambda m: f"PID{int(m.group(1)):04d}", s)
+    s = _SHEET_RE.sub(r"\1", s)
+    s = _REVISION_RE.sub("", s)
+    return re.sub(r"[^A-Z0-9]", "", s)
+
+
+def _trigrams(s: str) -> set[str]:
+    padded = f"^{s}$"
+    return {padded[i:i + TRIGRAM] for i in range(max(1, len(padded) - TRIGRAM + 1))}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _drawing_tail(canon: str) -> str | None:
+    """canon from its last PID on: equal for two drawing refs where one ends with the other."""
+    at = canon.rfind("PID")
+    return canon[at:] if at >= 0 else None
+
+
+def match_score(a: str, b: str) -> float:
+    """
+    Similarity of two canonical refs in [0, 1]: 1.0 when equal, 0.9 when a
+    drawing reference ends with the other (plant/unit prefix variants),
+    otherwise the mean of trigram Dice overlap and normalised edit similarity.
+    Refs whose numbers differ (DS-1 / DS-3, P-101 / P-102) name different
+    things and score at most 0.5.
+    """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    short, long_ = sorted((a, b), key=len)
+    if len(short) >= MIN_SUFFIX_REF and long_.endswith(short) and "PID" in short:
+        return 0.9
+    if re.findall(r"\d+", a) != re.findall(r"\d+", b):
+        return 0.5 if a in b or b in a else 0.0
+    ga, gb = _trigrams(a), _trigrams(b)
+    dice = 2 * len(ga & gb) / (len(ga) + len(gb))
+    n = max(len(a), len(b))
+    edit = 1 - _edit_distance(a, b, n) / n
+    return round((dice + edit) / 2, 3)
+
+
+class RefMatcher:
+    """
+    Trigram index over canonical refs, blocked by drawing number. `add` each
+    reference once; `candidates(key)` returns (other key, score) pairs above
+    `threshold`, best first.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.canon: dict[str, str] = {}            # key → canonical ref
+        self.block: dict[str, str | None] = {}     # key → drawing number
+        self.postings: dict[tuple, set[str]] = {}  # (block, trigram) → keys
+        self.tails: dict[tuple, set[str]] = {}     # (block, drawing tail) → keys
+        self.block_size: dict[str | None, int] = {}
+
+    def add(self, key: str, ref: str) -> None:
+        canon = canonical_ref(ref)
+        block = drawing_number(ref)
+        self.canon[key] = canon
+        self.block[key] = block
+        self.block_size[block] = self.block_size.get(block, 0) + 1
+        for g in _trigrams(canon):
+            self.postings.setdefault((block, g), set()).add(key)
+        tail = _drawing_tail(canon)
+        if tail is not None:
+            self.tails.setdefault((block, tail), set()).add(key)
+
+    def candidates(self, key: str) -> list[tuple[str, float]]:
+        canon, block = self.canon[key], self.block[key]
+        if not canon:
+            return []
+        grams = _trigrams(canon)
+        size = self.block_size[block]
+        cap = int(size * MAX_POSTING_FRACTION) if size >= 20 else size
+        shared: dict[str, int] = {}
+        for g in grams:
+            posting = self.postings.get((block, g), ())
+            if len(posting) > cap and len(grams) > 1:
+                continue
+            for other in posting:
+                if other != key:
+                    shared[other] = shared.get(other, 0) + 1
+        # Drawing refs one of which ends with the other share a tail and score 0.9
+        # however few trigrams they share, so they are scored before any pruning
+        found, scored = [], {key}
+        tail = _drawing_tail(canon)
+        for other in self.tails.get((block, tail), ()) if tail is not None else ():
+            if other in scored:
+                continue
+            scored.add(other)
+            score = match_score(canon, self.canon[other])
+            if score >= self.threshold:
+                found.append((other, score))
+        # Dice lower bound prunes before the edit distance is computed
+        for other, n in shared.items():
+            if other in scored:
+                continue
+            other_grams = len(_trigrams(self.canon[other]))
+            if 2 * n / (len(grams) + other_grams) < self.threshold / 2:
+                continue
+            score = match_score(canon, self.canon[other])
+            if score >= self.threshold:
+                found.append((other, score))
+        return sorted(found, key=lambda x: (-x[1], x[0]))
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent: dict[str, str] = {}
+
+    def find(self, x: str) -> str:
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: str, b: str) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self) -> dict[str, list[str]]:
+        out: dict[str, list[str]] = {}
+        for x in sorted(self.parent):
+            out.setdefault(self.find(x), []).append(x)
+        return out
+
+
+def check(threshold: float = 0.85) -> list[tuple]:
+    """REGRESSION_CASES whose refs candidates() matches (or not) against expectation, either way round."""
+    wrong = []
+    for a, b, expected in REGRESSION_CASES:
+        matcher = RefMatcher(threshold)
+        matcher.add("a", a)
+        matcher.add("b", b)
+        got = (bool(matcher.candidates("a")), bool(matcher.candidates("b")))
+        if got != (expected, expected):
+            wrong.append((a, b, expected, got))
+    return wrong
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        wrong = check()
+        for a, b, expected, got in wrong:
+            print(f"[ref_match] {a!r} / {b!r}: expected match={expected}, got {got}")
+        if wrong:
+            sys.exit(1)
+        print(f"[ref_match] {len(REGRESSION_CASES)} regression cases pass")
+    else:
+        print(__doc__)
@@ -1,25 +1,54 @@
 """
 schema.py — Step 4 of the ingestion pipeline.
 
-Convert unified_extraction.json → pid.graph.v0.1.1 JSON using Claude Sonnet.
-The model receives the unified extraction and produces a schema-conformant graph.
+Convert unified_extraction.json → pid.graph.v0.1.1 JSON.
 
-Resume: skips if pid_graph.json already exists.
+Two modes (config.SCHEMA_MODE):
+  rules — deterministic local converter: type/subtype mapping, tag-based node
+          ids, endpoint resolution through stitch ids/aliases/bridges,
+          terminators from off-page refs, junctions from spec breaks, dedup.
+          Only components whose type cannot be mapped (the residue) are sent
+          to Claude Sonnet, in one small classification call, cached by
+          component hash.
+  llm   — Sonnet conversion, sharded by source tile (quadtree-split when a
+          region is too large) with globally pre-assigned node ids; shards run
+          concurrently and are merged deterministically. No truncation.
+          Each shard's response is parsed as it streams (graph_stream.py):
+          elements are validated on arrival, structural errors abort the
+          call early, and partial graphs are checkpointed so a cut-off or
+          interrupted call resumes from the last complete element.
+
+Resume: skips if the graph already exists and schema_manifest.json shows it
+was converted from the current unified extraction by the current converter
+(mode, STRATEGY_VERSION, CONVERTER_VERSION); anything else — including a graph
+with no manifest — is regenerated. stitch_delta.json is only reported.
+
+`python schema.py --compare [pid ...]` writes schema_equivalence.json: the
+rule-based graph measured against the LLM graph for the same extraction.
 """
 
 import json
 import os
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import anthropic
 
 from config import (
-    MODEL_SCHEMA, MAX_TOKENS_SCHEMA, STRATEGY_VERSION, calc_cost,
-    pid_work_dir, graphs_dir, save_json, load_json,
+    MODEL_SCHEMA, MAX_TOKENS_SCHEMA, MAX_TOKENS_RESIDUE, SCHEMA_MODE, STRATEGY_VERSION,
+    SCHEMA_SHARD_MAX_CHARS, SCHEMA_SHARD_WORKERS, SCHEMA_MAX_CONTINUATIONS, SCHEMA_CHECKPOINT_EVERY,
+    POC_PIDS, calc_cost, pid_work_dir, graphs_dir, save_json, load_json, content_hash,
 )
+from graph_store import open_store, store_path, write_store
+from graph_stream import GraphStreamParser, GraphStreamError
+import graph_validator
 import re
 
+# Bump when a converter's output changes for the same extraction, so saved graphs are regenerated
+CONVERTER_VERSION = {"rules": 1, "llm": 1}
+
 # ─────────────────────────────────────────────────────────────────────────────
 
 SCHEMA_DEF = """{
@@ -88,6 +117,8 @@ SCHEMA_DEF = """{
   },
   "additionalProperties": false
 }"""
+SCHEMA = json.loads(SCHEMA_DEF)
+PID_GRAPH = graph_validator.build(SCHEMA)   # compiled validate_graph / repair_graph
 
 SYSTEM_PROMPT = """You are a process engineering expert and P&ID data modeller.
 Convert P&ID extraction data into a structured graph JSON conforming to pid.graph.v0.1.1 schema.
@@ -124,59 +155,653 @@ INSTRUCTIONS:
 Return valid JSON conforming exactly to pid.graph.v0.1.1. No extra keys at root level."""
 
 
-def convert_to_graph(pid_id: str, unified: dict, force: bool = False) -> dict:
+RESIDUE_PROMPT_TEMPLATE = """Classify these P&ID components from {pid_id}. Their extracted type could not be
+mapped to a pid.graph.v0.1.1 node type by rule.
+
+COMPONENTS (keyed by component key):
+{components}
+
+For each key return:
+  type:    one of equipment, valve, instrument, junction, terminator, nozzle, annotation
+  subtype: "<type>.<kind>", e.g. valve.gate, instrument.pressure_transmitter, junction.tee
+  layer:   one of process, instrument, electrical, mechanical, utility, annotation, other
+
+Return ONLY JSON: {{"<key>": {{"type": "...", "subtype": "...", "layer": "..."}}, ...}}"""
+
+SHARD_NOTE_TEMPLATE = """
+
+SHARDING: this extraction is region "{shard}" of the drawing; other regions are converted
+separately and merged afterwards.
+- Every component carries "node_id". Use it verbatim as that component's node id — it is
+  unique across the whole drawing. Do not rename components or merge different node_ids.
+- Connection from/to are already node ids. Keep them; connections to other regions are added later.
+- Nodes you create that are not listed components (off-page terminators, spec-break junctions)
+  must have ids starting with "{prefix}"."""
+
+CONTINUATION_TEMPLATE = """
+
+CONTINUATION: a previous response for this region was cut off. These elements were already
+received and are kept — do NOT repeat them:
+  node ids: {node_ids}
+  edge ids: {edge_ids}
+Return the same JSON structure containing ONLY the remaining nodes and edges."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Rule-based conversion
+# ─────────────────────────────────────────────────────────────────────────────
+
+NODE_TYPES  = ("equipment", "valve", "instrument", "junction", "terminator", "nozzle", "annotation")
+NODE_LAYERS = ("process", "instrument", "electrical", "mechanical", "utility", "annotation", "other")
+NODE_STATUS = ("existing", "new", "removed", "future", "temporary")
+EDGE_KINDS  = ("process", "signal", "impulse", "association", "containment")
+EDGE_ENDPOINTS = ("EDGE_LEFT", "EDGE_RIGHT", "EDGE_TOP", "EDGE_BOTTOM")
+
+# Subtype abbreviations used by extract.PASS1_COMPACT_PROMPT
+SUBTYPE_ABBREV = {
+    "VG": "valve.gate", "VB": "valve.ball", "VBU": "valve.butterfly", "VCK": "valve.check",
+    "VCT": "valve.control", "VS": "valve.spectacle", "EQ": "equipment",
+    "IP": "instrument.pressure", "IT": "instrument.temperature", "IF": "instrument.flow",
+    "IL": "instrument.level", "IC": "instrument.controller", "IAN": "instrument.analyzer",
+    "J": "junction", "T": "terminator", "A": "annotation",
+}
+
+# Extracted type words that are not schema node types
+TYPE_ALIASES = {
+    "off_page": "terminator", "offpage": "terminator", "off_page_connector": "terminator",
+    "off_page_ref": "terminator", "connector": "terminator", "boundary": "terminator",
+    "boundary_marker": "terminator", "battery_limit": "terminator",
+    "tee": "junction", "reducer": "junction", "fitting": "junction", "spec_break": "junction",
+    "pipe_junction": "junction",
+    "text": "annotation", "note": "annotation", "label": "annotation",
+    "line_tag": "annotation", "line_designation": "annotation",
+    "vessel": "equipment", "drum": "equipment", "tank": "equipment", "pump": "equipment",
+    "compressor": "equipment", "exchanger": "equipment",
+}
+
+# Node type → default layer (everything else is "process")
+TYPE_LAYERS = {"instrument": "instrument", "annotation": "annotation"}
+
+EDGE_KIND_ALIASES = {
+    "pipe": "process", "piping": "process", "line": "process",
+    "electrical": "signal", "data": "signal", "software": "signal", "pneumatic": "signal",
+    "instrument": "signal", "capillary": "impulse", "mechanical": "association",
+}
+
+# Short keys from the compact sub-tile prompt → full field names
+COMPACT_KEYS = {
+    "pos": "normal_position", "dp": "design_pressure", "dt": "design_temp",
+    "op": "op_pressure", "ot": "op_temp", "loop": "loop_id",
+    "line": "line_tag", "spec": "pipe_class", "dia": "diameter",
+}
+
+# Schema fields lifted out of props onto the node / edge itself
+NODE_FIELDS = ("service", "loop_id", "signal_type", "off_page_ref", "off_page_doc_id")
+EDGE_FIELDS = ("line_tag", "pipe_class", "diameter", "fluid_code", "flow_dir", "status")
+
+_SUB_PREFIX_RE = re.compile(r"^sub[a-z0-9]+_")         # extract._merge_sub_tile_results ids
+_ISA_TAG_RE    = re.compile(r"^([A-Z]{2,5})[\s\-_]?\d")
+_PLANT_UNIT_RE = re.compile(r"-([A-Z]{2}\d{2})-(\d{3})-")
+
+
+def _empty(v) -> bool:
+    return v in (None, "", [], {})
+
+
+def _word(text) -> str:
+    return str(text or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def _slug(text) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(text or "").lower()).strip("_")[:48]
+
+
+def _norm_tag(tag) -> str:
+    return re.sub(r"[\s\-_]", "", str(tag or "").upper())
+
+
+def _tile_code(tile: str) -> str:
+    """'tile_r1c2' → 'r1c2'"""
+    m = re.search(r"r\d+c\d+", tile or "")
+    return m.group(0) if m else (_slug(tile) or "tile")
+
+
+def _type_from_tag(tag: str) -> str | None:
+    """ISA letter code fallback for components extracted without a type: xxV → valve."""
+    m = _ISA_TAG_RE.match(str(tag or "").strip().upper())
+    if not m:
+        return None
+    return "valve" if m.group(1).endswith("V") else "instrument"
+
+
+def _classify(comp: dict) -> tuple[str, str] | None:
+    """(type, subtype) for an extracted component, or None when no rule applies."""
+    raw_type = str(comp.get("type") or "").strip()
+    raw_sub  = str(comp.get("subtype") or "").strip()
+    t   = _word(SUBTYPE_ABBREV.get(raw_type.upper(), raw_type))
+    sub = _word(SUBTYPE_ABBREV.get(raw_sub.upper(), raw_sub))
+
+    if "." in t:                                   # type given as "valve.ball"
+        sub = sub or t
+        t = t.split(".", 1)[0]
+    alias = t if t in TYPE_ALIASES else ""
+    t = TYPE_ALIASES.get(t, t)
+
+    sub_base = sub.split(".", 1)[0] if sub else ""
+    if sub_base in NODE_TYPES and t in NODE_TYPES and sub_base != t:
+        return None                                # e.g. valve vs instrument.safety_valve
+    if t not in NODE_TYPES:
+        t = TYPE_ALIASES.get(sub_base, sub_base)
+    if t not in NODE_TYPES and not raw_type:
+        t = _type_from_tag(comp.get("tag")) or ""
+    if t not in NODE_TYPES:
+        return None
+
+    sub = sub or alias or t
+    if "." not in sub and sub != t:
+        sub = f"{t}.{sub}"
+    return t, sub
+
+
+def _residue_key(comp: dict) -> str:
+    """Cache key for a residue component — its content, not its (tile-local) id."""
+    return content_hash({k: comp.get(k) for k in ("type", "subtype", "tag", "label", "props")})
+
+
+def _lift_fields(source: dict, target: dict, props: dict, fields: tuple, skip: tuple) -> None:
+    """Copy extracted key/values onto a node or edge: schema fields on target, the rest in props."""
+    for k, v in source.items():
+        if k in skip or _empty(v):
+            continue
+        key = COMPACT_KEYS.get(k, k)
+        if key in fields and key not in target and isinstance(v, (str, int, float)):
+            target[key] = str(v)
+        elif key not in props:
+            props[key] = v
+
+
+def _build_node(comp: dict, node_id: str, ntype: str, subtype: str, layer: str | None = None) -> dict:
+    node = {"id": node_id, "type": ntype, "subtype": subtype}
+    tag = str(comp.get("tag") or "").strip()
+    if tag:
+        node["tag"] = tag
+    layer = layer or comp.get("layer")
+    node["layer"] = layer if layer in NODE_LAYERS else TYPE_LAYERS.get(ntype, "process")
+    status = _word(comp.get("status") or (comp.get("props") or {}).get("status"))
+    if status in NODE_STATUS:
+        node["status"] = status
+
+    props: dict = {}
+    skip = ("id", "type", "subtype", "tag", "layer", "status", "props", "bbox", "bb",
+            "_source_tile", "_merged_ids")
+    _lift_fields(comp, node, props, NODE_FIELDS, skip)
+    if isinstance(comp.get("props"), dict):
+        _lift_fields(comp["props"], node, props, NODE_FIELDS, ("status",))
+    if ntype == "equipment" and "service" not in node and isinstance(comp.get("label"), str):
+        node["service"] = comp["label"]
+    if comp.get("bbox"):
+        props["bbox"] = comp["bbox"]
+    if comp.get("_source_tile"):
+        props["source_tile"] = comp["_source_tile"]
+    node["props"] = props
+    return node
+
+
+def _merge_node(keep: dict, other: dict) -> None:
+    """Fold a same-tag duplicate into `keep` (first occurrence wins on conflicts)."""
+    for k, v in other.items():
+        if k == "props":
+            for pk, pv in v.items():
+                if _empty(keep["props"].get(pk)):
+                    keep["props"][pk] = pv
+        elif _empty(keep.get(k)):
+            keep[k] = v
+
+
+def _resolve_endpoint(ref, tile: str, sub: str, index: dict) -> str | None:
     """
-    Convert unified extraction to pid.graph.v0.1.1 using Claude Sonnet.
-    Saves to both work dir and graphs dir.
+    Map a connection endpoint to a node id. Endpoints are tile-local component
+    ids ("V1"), sub-tile ids ("subl_V1"), stitch bridges ("tile_r1c1::V1"),
+    full stitch ids ("tile_r1c1__V1") or, occasionally, tags.
     """
-    work_dir  = pid_work_dir(pid_id)
-    out_work  = work_dir / "pid_graph.json"
-    out_graph = graphs_dir() / f"{pid_id}.graph.json"
+    ref = str(ref or "").strip()
+    if not ref or ref in EDGE_ENDPOINTS:
+        return None
+    if "::" in ref:
+        tile, ref = ref.split("::", 1)
+    elif "__" in ref and ref.startswith("tile_"):
+        tile, ref = ref.split("__", 1)
 
-    if out_graph.exists() and not force:
-        print(f"[schema] Resume: {pid_id}.graph.json already exists")
-        return load_json(out_graph)
+    local = index["local"]
+    if sub and (tile, sub + ref) in local:
+        return local[(tile, sub + ref)]
+    if (tile, ref) in local:
+        return local[(tile, ref)]
+    in_pieces = index["sub"].get((tile, ref), set())
+    if len(in_pieces) == 1:
+        return next(iter(in_pieces))
+    by_tag = index["tags"].get(_norm_tag(ref))
+    if by_tag:
+        return by_tag
+    anywhere = index["global"].get(ref, set())
+    return next(iter(anywhere)) if len(anywhere) == 1 else None
+
+
+def _edge_kind(kind) -> str:
+    k = _word(kind)
+    return k if k in EDGE_KINDS else EDGE_KIND_ALIASES.get(k, "process")
+
+
+def _build_edge(conn: dict, src: str, dst: str, kind: str) -> dict:
+    edge = {"id": "", "from": src, "to": dst, "kind": kind}
+    props: dict = {}
+    _lift_fields(conn, edge, props, EDGE_FIELDS,
+                 ("id", "from", "to", "kind", "layer", "props", "_source_tile"))
+    if isinstance(conn.get("props"), dict):
+        _lift_fields(conn["props"], edge, props, EDGE_FIELDS, ())
+    if edge.get("flow_dir") not in (None, "uni", "bi"):
+        props.setdefault("flow_dir", edge.pop("flow_dir"))
+    edge["layer"] = "instrument" if kind in ("signal", "impulse") else "process"
+    if props:
+        edge["props"] = props
+    return edge
 
-    print(f"[schema] Converting {pid_id} extraction → pid.graph.v0.1.1")
 
+def _connection_endpoints(conn: dict, index: dict) -> tuple[str | None, str | None, str]:
+    """(from node id, to node id, status) — status is ok, tile_border, unresolved or self_loop."""
+    tile = conn.get("_source_tile", "")
+    local = str(conn.get("id", "")).split("__", 1)[-1]
+    m = _SUB_PREFIX_RE.match(local)
+    sub = m.group(0) if m else ""
+    ends = (conn.get("from"), conn.get("to"))
+    if any(str(e or "") in EDGE_ENDPOINTS for e in ends):
+        return None, None, "tile_border"     # bridged by stitch as a cross_tile connection
+    src, dst = (_resolve_endpoint(e, tile, sub, index) for e in ends)
+    if not src or not dst:
+        return src, dst, "unresolved"
+    if src == dst:
+        return src, dst, "self_loop"
+    return src, dst, "ok"
+
+
+def _add_edge(edges: dict[tuple, dict], edge: dict, stats: Counter, bridge: bool = False) -> None:
+    """Add an edge keyed by (from, to, kind); duplicates fill each other's missing fields."""
+    key = (edge["from"], edge["to"], edge["kind"])
+    if bridge and (edge["to"], edge["from"], edge["kind"]) in edges:
+        stats["edges_merged"] += 1           # stitch bridges each border from both sides
+        return
+    if key in edges:
+        for k, v in edge.items():
+            if _empty(edges[key].get(k)):
+                edges[key][k] = v
+        stats["edges_merged"] += 1
+    else:
+        edges[key] = edge
+
+
+def _assign_edge_ids(edges: dict[tuple, dict]) -> None:
+    """Deterministic edge ids in the LLM graphs' style: e_<from>_<to>."""
+    used: Counter = Counter()
+    for edge in edges.values():
+        base = f"e_{_slug(edge['from'])}_{_slug(edge['to'])}"
+        used[base] += 1
+        edge["id"] = base if used[base] == 1 else f"{base}_{used[base]}"
+
+
+def _metadata(pid_id: str, unified: dict) -> dict:
+    """doc_id/units as in CONVERT_PROMPT_TEMPLATE rule 8; plant/unit from line tags."""
+    votes = Counter(
+        m.groups()
+        for c in unified.get("connections", [])
+        for m in [_PLANT_UNIT_RE.search(str(c.get("line_tag") or c.get("line") or ""))] if m
+    )
+    plant, unit = votes.most_common(1)[0][0] if votes else (None, None)
+    meta = {"doc_id": pid_id}
+    if plant:
+        meta["plant"], meta["unit"] = plant, unit
+    meta["units"] = {"pressure": "barg", "temperature": "degC"}
+    meta["strategy_version"] = STRATEGY_VERSION
+    return meta
+
+
+def _assign_node_ids(components: list[dict], types: list[str]) -> list[str]:
+    """
+    Global node id per component: the cleaned tag, else <type>_<rXcY>_<nnn>.
+    Shared by the rule converter and the LLM shards so every region of a
+    drawing names the same component the same way.
+    """
+    ids: list[str] = []
+    tag_of: dict[str, str] = {}
+    counters: Counter = Counter()
+    for comp, ntype in zip(components, types):
+        tile = comp.get("_source_tile", "")
+        tag = str(comp.get("tag") or "").strip()
+        if tag:
+            node_id = re.sub(r"\s+", "", tag)
+            if tag_of.setdefault(node_id, _norm_tag(tag)) != _norm_tag(tag):
+                node_id = f"{node_id}_{_tile_code(tile)}"
+        else:
+            code = _tile_code(tile)
+            counters[(ntype, code)] += 1
+            node_id = f"{ntype}_{code}_{counters[(ntype, code)]:03d}"
+        ids.append(node_id)
+    return ids
+
+
+def _index_components(components: list[dict], node_ids: list[str]) -> dict:
+    """Lookup tables for _resolve_endpoint: stitch/local ids, sub-tile ids, tags."""
+    index = {"local": {}, "sub": {}, "tags": {}, "global": {}}
+    for comp, node_id in zip(components, node_ids):
+        tile = comp.get("_source_tile", "")
+        if comp.get("tag"):
+            index["tags"].setdefault(_norm_tag(comp["tag"]), node_id)
+        for full_id in [comp.get("id", "")] + list(comp.get("_merged_ids", [])):
+            t, _, local = full_id.partition("__") if "__" in full_id else (tile, "", full_id)
+            index["local"][(t, local)] = node_id
+            index["global"].setdefault(local, set()).add(node_id)
+            bare = _SUB_PREFIX_RE.sub("", local)
+            if bare != local:
+                index["sub"].setdefault((t, bare), set()).add(node_id)
+    return index
+
+
+def rules_to_graph(pid_id: str, unified: dict, residue_classes: dict | None = None) -> tuple[dict, dict]:
+    """
+    Deterministic unified extraction → pid.graph.v0.1.1 conversion.
+    residue_classes maps _residue_key(comp) → {type, subtype, layer} for the
+    components _classify() cannot map; unmatched residue becomes
+    annotation.unclassified so nothing extracted is silently lost.
+    Returns (graph, stats).
+    """
+    residue_classes = residue_classes or {}
+    components = unified.get("components", [])
+    nodes: dict[str, dict] = {}
+    stats = Counter()
+
+    # ── Components → nodes ───────────────────────────────────────────────────
+    classes = []
+    for comp in components:
+        layer = None
+        mapped = _classify(comp)
+        if mapped:
+            ntype, subtype = mapped
+        else:
+            cls = residue_classes.get(_residue_key(comp))
+            if cls and cls.get("type") in NODE_TYPES:
+                ntype = cls["type"]
+                subtype = cls.get("subtype") or ntype
+                layer = cls.get("layer")
+                stats["residue_classified"] += 1
+            else:
+                ntype, subtype, layer = "annotation", "annotation.unclassified", "annotation"
+                stats["residue_unclassified"] += 1
+        classes.append((ntype, subtype, layer, mapped is not None))
+
+    node_ids = _assign_node_ids(components, [c[0] for c in classes])
+    index = _index_components(components, node_ids)
+
+    for comp, node_id, (ntype, subtype, layer, mapped) in zip(components, node_ids, classes):
+        node = _build_node(comp, node_id, ntype, subtype, layer)
+        if not mapped:
+            node["props"].setdefault("extracted_type", comp.get("type"))
+        if node_id in nodes:
+            _merge_node(nodes[node_id], node)
+            stats["nodes_merged"] += 1
+        else:
+            nodes[node_id] = node
+
+    edges: dict[tuple, dict] = {}
+
+    # ── Off-page references → terminators ────────────────────────────────────
+    for ref in unified.get("off_page_refs", []):
+        if not isinstance(ref, dict):
+            continue
+        tile  = ref.get("_source_tile", "")
+        label = ref.get("ref_label") or ref.get("label") or ""
+        target = _resolve_endpoint(ref.get("id"), tile, "", index)
+        if not (label or target):
+            continue
+        if target and nodes[target]["type"] == "terminator":
+            term = nodes[target]
+        else:
+            term_id = f"term_{_slug(label) or _slug(ref.get('id'))}"
+            term = nodes.setdefault(term_id, {
+                "id": term_id, "type": "terminator", "subtype": "terminator.off_page",
+                "layer": "process", "props": {},
+            })
+            if target:
+                inbound = _word(ref.get("direction")) == "in"
+                _add_edge(edges, {"id": "", "from": term_id if inbound else target,
+                                  "to": target if inbound else term_id,
+                                  "kind": "process", "layer": "process"}, stats)
+            stats["terminators"] += 1
+        if label:
+            term.setdefault("off_page_ref", str(label))
+        if ref.get("connects_to_doc"):
+            term.setdefault("off_page_doc_id", str(ref["connects_to_doc"]))
+        if ref.get("direction"):
+            term["props"].setdefault("direction", ref["direction"])
+
+    # ── Spec breaks → junctions ──────────────────────────────────────────────
+    for sb in unified.get("spec_breaks", []):
+        if not isinstance(sb, dict):
+            continue
+        frm = sb.get("from_spec") or sb.get("from")
+        to  = sb.get("to_spec") or sb.get("to")
+        if not (frm or to):
+            continue
+        tile   = sb.get("_source_tile", "")
+        target = _resolve_endpoint(sb.get("id"), tile, "", index)
+        if target and nodes[target]["type"] == "junction":
+            junction = nodes[target]
+        else:
+            jid = f"junction_spec_break_{_slug(frm)}_{_slug(to)}_{_tile_code(tile)}"
+            junction = nodes.setdefault(jid, {
+                "id": jid, "type": "junction", "subtype": "junction.spec_break",
+                "layer": "process", "props": {},
+            })
+            if target:
+                junction["props"].setdefault("location_node", target)
+            stats["spec_break_junctions"] += 1
+        props = junction["props"]
+        props["spec_change"] = True
+        props.setdefault("from_spec", frm)
+        props.setdefault("to_spec", to)
+        where = sb.get("location_description") or sb.get("location") or sb.get("loc")
+        if where and where not in props.setdefault("notes", []):
+            props["notes"].append(where)
+
+    # ── Connections → edges ──────────────────────────────────────────────────
+    for conn in unified.get("connections", []):
+        src, dst, status = _connection_endpoints(conn, index)
+        if status != "ok":
+            stats[f"edges_{status}"] += 1
+            continue
+        _add_edge(edges, _build_edge(conn, src, dst, _edge_kind(conn.get("kind"))), stats,
+                  bridge=bool(conn.get("cross_tile")))
+
+    _assign_edge_ids(edges)
+
+    graph = {
+        "schema_version": "pid.graph.v0.1.1",
+        "metadata": _metadata(pid_id, unified),
+        "nodes": list(nodes.values()),
+        "edges": list(edges.values()),
+    }
+    stats["nodes"] = len(graph["nodes"])
+    stats["edges"] = len(graph["edges"])
+    return graph, dict(stats)
+
+
+def _parse_model_json(text: str):
+    raw = text.strip()
+    if raw.startswith("```"):
+        raw = raw.split("\n", 1)[1].rsplit("```", 1)[0].strip()
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        cleaned = re.sub(r",\s*([}\]])", r"\1", raw)
+        return json.loads(cleaned)
+
+
+def _classify_residue(pid_id: str, pending: dict[str, dict]) -> tuple[dict, dict]:
+    """One small Sonnet call classifying the components no rule could map."""
     api_key = os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
         raise EnvironmentError("ANTHROPIC_API_KEY not set")
-
     client = anthropic.Anthropic(api_key=api_key)
 
-    # Trim extraction to fit in context (keep components + connections + spec_breaks)
-    extraction_slim = {
-        "pid_id": unified.get("pid_id"),
-        "components": unified.get("components", []),
-        "connections": [
-            c for c in unified.get("connections", [])
-            if not c.get("cross_tile")  # skip raw edge-bridges, Sonnet will reconstruct
-               or (c.get("from", "").count("::") == 0)
-        ],
-        "off_page_refs": unified.get("off_page_refs", []),
-        "spec_breaks": unified.get("spec_breaks", []),
-        "notes": unified.get("notes", []),
+    listing = {
+        key: {k: comp[k] for k in ("type", "subtype", "tag", "label", "props") if not _empty(comp.get(k))}
+        for key, comp in pending.items()
+    }
+    prompt = RESIDUE_PROMPT_TEMPLATE.format(pid_id=pid_id, components=json.dumps(listing, indent=2))
+    msg = client.messages.create(
+        model=MODEL_SCHEMA,
+        max_tokens=MAX_TOKENS_RESIDUE,
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    classes = _parse_model_json(msg.content[0].text)
+    valid = {}
+    for key, cls in (classes.items() if isinstance(classes, dict) else []):
+        if key in pending and isinstance(cls, dict) and cls.get("type") in NODE_TYPES:
+            layer = cls.get("layer")
+            valid[key] = {
+                "type": cls["type"],
+                "subtype": str(cls.get("subtype") or cls["type"]),
+                "layer": layer if layer in NODE_LAYERS else TYPE_LAYERS.get(cls["type"], "process"),
+            }
+    return valid, {"input_tokens": msg.usage.input_tokens, "output_tokens": msg.usage.output_tokens}
+
+
+def _convert_with_rules(pid_id: str, unified: dict, work_dir: Path, use_llm: bool = True) -> tuple[dict, dict]:
+    """Rule-based conversion; residue classified by Sonnet (cached per component hash)."""
+    t0 = time.time()
+    cache_path = work_dir / "schema_residue_cache.json"
+    cache = load_json(cache_path) if cache_path.exists() else {}
+
+    residue = {
+        _residue_key(c): c for c in unified.get("components", []) if _classify(c) is None
     }
+    pending = {k: c for k, c in residue.items() if k not in cache}
+    usage = {"input_tokens": 0, "output_tokens": 0}
+    calls = 0
+    if pending and use_llm:
+        print(f"[schema] {len(pending)} component(s) need classification — calling {MODEL_SCHEMA}")
+        try:
+            classes, usage = _classify_residue(pid_id, pending)
+            calls = 1
+            cache.update(classes)
+            save_json(cache_path, cache)
+        except (EnvironmentError, anthropic.APIError, json.JSONDecodeError) as exc:
+            print(f"[schema] WARNING: residue classification failed ({exc}) — "
+                  f"kept as annotation.unclassified")
 
-    extraction_json = json.dumps(extraction_slim, indent=2)
+    graph, stats = rules_to_graph(pid_id, unified, cache)
+    elapsed = time.time() - t0
+    cost = calc_cost(MODEL_SCHEMA, usage["input_tokens"], usage["output_tokens"])
+    print(f"[schema] Rules: {stats['nodes']} nodes, {stats['edges']} edges  |  "
+          f"residue {len(residue)} ({len(residue) - len(pending)} cached)  |  "
+          f"{stats.get('edges_unresolved', 0)} unresolved connections  |  {elapsed:.2f}s")
 
-    # If too large, truncate connections to top 500
-    if len(extraction_json) > 80_000:
-        extraction_slim["connections"] = extraction_slim["connections"][:500]
-        extraction_slim["_truncated"] = True
-        extraction_json = json.dumps(extraction_slim, indent=2)
-        print(f"[schema] WARNING: extraction truncated to fit context window")
+    token_report = {
+        "step": "schema",
+        "mode": "rules",
+        "model": MODEL_SCHEMA if calls else "rules",
+        "api_calls": calls,
+        "input_tokens":  usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cost_usd": round(cost, 4),
+        "elapsed_s": round(elapsed, 2),
+        "residue": len(residue),
+        "stats": stats,
+    }
+    return graph, token_report
 
-    prompt = CONVERT_PROMPT_TEMPLATE.format(
-        pid_id=pid_id,
-        schema=SCHEMA_DEF,
-        extraction=extraction_json,
-        strategy_version=STRATEGY_VERSION,
-    )
 
-    print(f"[schema] Calling {MODEL_SCHEMA} for schema conversion (streaming)...")
-    t0 = time.time()
+# ─────────────────────────────────────────────────────────────────────────────
+# LLM conversion — region shards converted concurrently
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _split_components(comps: list[dict]) -> list[list[dict]]:
+    """Quadtree split on page-bbox centres; index halves when geometry is missing or degenerate."""
+    boxed = [c for c in comps if c.get("bbox")]
+    if boxed and len(boxed) * 2 >= len(comps):
+        xs = [(c["bbox"][0] + c["bbox"][2]) / 2 for c in boxed]
+        ys = [(c["bbox"][1] + c["bbox"][3]) / 2 for c in boxed]
+        mx, my = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        quads: list[list[dict]] = [[], [], [], []]
+        loose = 0
+        for c in comps:
+            bb = c.get("bbox")
+            if bb:
+                q = 2 * ((bb[1] + bb[3]) / 2 > my) + ((bb[0] + bb[2]) / 2 > mx)
+            else:
+                q, loose = loose % 4, loose + 1
+            quads[q].append(c)
+        parts = [q for q in quads if q]
+        if len(parts) > 1:
+            return parts
+    half = (len(comps) + 1) // 2
+    return [comps[:half], comps[half:]]
+
+
+def _region_groups(name: str, prefix: str, comps: list[dict], conns: list[dict]) -> list[tuple]:
+    """Split a region quadtree-style until its payload fits SCHEMA_SHARD_MAX_CHARS."""
+    ids = {c["node_id"] for c in comps}
+    inner = [c for c in conns if c["from"] in ids and c["to"] in ids]
+    if len(comps) > 1 and len(json.dumps(comps)) + len(json.dumps(inner)) > SCHEMA_SHARD_MAX_CHARS:
+        groups = []
+        for i, part in enumerate(_split_components(comps)):
+            groups += _region_groups(f"{name}.q{i}", f"{prefix}q{i}_", part, inner)
+        return groups
+    return [(name, prefix, comps)]
+
+
+def _build_shards(groups: list[tuple], conns: list[dict], refs: list, breaks: list,
+                  index: dict) -> tuple[list[dict], list[dict]]:
+    """
+    Turn (name, id prefix, components) groups into shard payloads. A connection
+    goes to the shard owning both endpoints; the rest are returned as cross-shard
+    connections, which the merge adds by rule. Off-page refs and spec breaks
+    follow the component they name, else their source tile.
+    """
+    owner: dict[str, int] = {}
+    for i, (_, _, comps) in enumerate(groups):
+        for c in comps:
+            owner.setdefault(c["node_id"], i)
+    shards = [
+        {"name": name, "prefix": prefix, "components": comps,
+         "connections": [], "off_page_refs": [], "spec_breaks": []}
+        for name, prefix, comps in groups
+    ]
+    cross = []
+    for conn in conns:
+        a, b = owner.get(conn["from"]), owner.get(conn["to"])
+        if a is not None and a == b:
+            shards[a]["connections"].append(conn)
+        else:
+            cross.append(conn)
+    for key, items in (("off_page_refs", refs), ("spec_breaks", breaks)):
+        for item in items:
+            i = None
+            if isinstance(item, dict):
+                tile = item.get("_source_tile", "")
+                i = owner.get(_resolve_endpoint(item.get("id"), tile, "", index))
+                if i is None and tile:
+                    i = next((k for k, g in enumerate(groups) if g[0].startswith(tile)), None)
+            shards[i or 0][key].append(item)
+    return shards, cross
+
+
+def _stream_call(client: anthropic.Anthropic, prompt: str, parser: GraphStreamParser,
+                 tokens: Counter) -> str:
+    """
+    Stream one Sonnet call through the incremental parser and return its
+    stop_reason. A GraphStreamError from the parser aborts the call mid-stream;
+    token usage so far is added to `tokens` either way.
+    """
     # Use streaming — large graphs can exceed the SDK's non-streaming 10-min timeout
     with client.messages.stream(
         model=MODEL_SCHEMA,
@@ -184,71 +809,485 @@ def convert_to_graph(pid_id: str, unified: dict, force: bool = False) -> dict:
         system=SYSTEM_PROMPT,
         messages=[{"role": "user", "content": prompt}],
     ) as stream:
-        raw_streamed = stream.get_final_text()
-        msg = stream.get_final_message()
-    elapsed = time.time() - t0
+        try:
+            for text in stream.text_stream:
+                parser.feed(text)
+            return stream.get_final_message().stop_reason
+        finally:
+            tokens["calls"] += 1
+            try:
+                usage = stream.current_message_snapshot.usage
+                tokens["input_tokens"]  += usage.input_tokens or 0
+                tokens["output_tokens"] += usage.output_tokens or 0
+            except Exception:
+                pass   # aborted before the first event — nothing billed worth counting
 
-    schema_in  = msg.usage.input_tokens
-    schema_out = msg.usage.output_tokens
-    schema_cost = calc_cost(MODEL_SCHEMA, schema_in, schema_out)
-    stop_reason = msg.stop_reason
-    print(f"[schema] Tokens: {schema_in:,} in / {schema_out:,} out  |  "
-          f"${schema_cost:.3f}  |  {elapsed:.0f}s  |  stop={stop_reason}")
 
-    if stop_reason == "max_tokens":
+def _convert_shard(client: anthropic.Anthropic, pid_id: str, shard: dict, index: dict,
+                   work_dir: Path) -> list[dict]:
+    """
+    Convert one shard. Nodes and edges are parsed and validated as they stream
+    in and checkpointed to schema_partial/<shard>.json, so a call that is cut
+    off (max_tokens), aborted on a structural error or interrupted resumes
+    from the last complete element with a continuation prompt — also on the
+    next pipeline run. After SCHEMA_MAX_CONTINUATIONS the shard is split and
+    its parts converted instead, so nothing is truncated.
+    """
+    name = shard["name"]
+    payload = {
+        "pid_id": pid_id,
+        "region": name,
+        "components": [{k: v for k, v in c.items() if k != "_merged_ids"} for c in shard["components"]],
+        "connections": shard["connections"],
+        "off_page_refs": shard["off_page_refs"],
+        "spec_breaks": shard["spec_breaks"],
+    }
+    payload_hash = content_hash(payload)
+    prompt = CONVERT_PROMPT_TEMPLATE.format(
+        pid_id=pid_id,
+        schema=SCHEMA_DEF,
+        extraction=json.dumps(payload, indent=2),
+        strategy_version=STRATEGY_VERSION,
+    ) + SHARD_NOTE_TEMPLATE.format(shard=name, prefix=shard["prefix"])
+
+    partial_path = work_dir / "schema_partial" / f"{name}.json"
+    state = load_json(partial_path) if partial_path.exists() else None
+    if state and state.get("payload_hash") != payload_hash:
+        state = None
+
+    def checkpoint(parser: GraphStreamParser) -> dict:
+        data = {"payload_hash": payload_hash, **parser.graph()}
+        save_json(partial_path, data)
+        return data
+
+    t0 = time.time()
+    tokens: Counter = Counter()
+    result = {"name": name, "graph": None, "cross": [], "issues": 0}
+    for attempt in range(SCHEMA_MAX_CONTINUATIONS + 1):
+        parser = GraphStreamParser(SCHEMA, nodes=(state or {}).get("nodes"), edges=(state or {}).get("edges"))
+        if state and state.get("metadata"):
+            parser.header["metadata"] = state["metadata"]
+
+        def on_element(kind: str, obj: dict, parser=parser) -> None:
+            count = len(parser.nodes) + len(parser.edges)
+            if count % SCHEMA_CHECKPOINT_EVERY == 0:
+                checkpoint(parser)
+                print(f"[schema]   {name}: {len(parser.nodes)} nodes, {len(parser.edges)} edges …")
+        parser.on_element = on_element
+
+        call_prompt = prompt
+        if parser.nodes or parser.edges:
+            print(f"[schema]   {name}: resuming from checkpoint "
+                  f"({len(parser.nodes)} nodes, {len(parser.edges)} edges)")
+            call_prompt += CONTINUATION_TEMPLATE.format(
+                node_ids=json.dumps(sorted(parser.seen["nodes"])),
+                edge_ids=json.dumps(sorted(parser.seen["edges"])),
+            )
+
+        try:
+            stop_reason = _stream_call(client, call_prompt, parser, tokens)
+        except GraphStreamError as exc:
+            print(f"[schema]   {name}: aborted mid-stream — {exc}")
+            state = checkpoint(parser)
+            continue
+        except BaseException:
+            checkpoint(parser)      # interrupted — the next run resumes from here
+            raise
+
+        result["issues"] += len(parser.issues)
+        if parser.complete and stop_reason != "max_tokens":
+            partial_path.unlink(missing_ok=True)
+            result["graph"] = parser.graph()
+            break
+        state = checkpoint(parser)
+        print(f"[schema]   {name}: output cut off (stop={stop_reason}) after "
+              f"{len(parser.nodes)} nodes, {len(parser.edges)} edges — continuing")
+
+    result.update({
+        "calls": tokens["calls"],
+        "input_tokens":  tokens["input_tokens"],
+        "output_tokens": tokens["output_tokens"],
+        "elapsed_s": round(time.time() - t0, 1),
+    })
+    if result["graph"] is not None:
+        print(f"[schema]   {name}: {len(result['graph']['nodes'])} nodes, "
+              f"{len(result['graph']['edges'])} edges  "
+              f"[{result['input_tokens']:,} in / {result['output_tokens']:,} out  "
+              f"{result['calls']} call(s)  {result['elapsed_s']:.0f}s]")
+        return [result]
+
+    if len(shard["components"]) < 2:
         raise RuntimeError(
-            f"[schema] Output truncated at {schema_out} tokens — "
-            f"increase MAX_TOKENS_SCHEMA (currently {MAX_TOKENS_SCHEMA}) or split the graph."
+            f"[schema] Shard {name} still incomplete after {SCHEMA_MAX_CONTINUATIONS} continuations "
+            f"with a single component — increase MAX_TOKENS_SCHEMA (currently {MAX_TOKENS_SCHEMA})."
         )
+    print(f"[schema]   {name}: still incomplete after {SCHEMA_MAX_CONTINUATIONS} continuations — splitting shard")
+    partial_path.unlink(missing_ok=True)
+    groups = [
+        (f"{name}.q{i}", f"{shard['prefix']}q{i}_", part)
+        for i, part in enumerate(_split_components(shard["components"]))
+    ]
+    parts, result["cross"] = _build_shards(
+        groups, shard["connections"], shard["off_page_refs"], shard["spec_breaks"], index)
+    results = [result]
+    for part in parts:
+        results += _convert_shard(client, pid_id, part, index, work_dir)
+    return results
 
-    raw = raw_streamed.strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1].rsplit("```", 1)[0].strip()
 
-    try:
-        graph = json.loads(raw)
-    except json.JSONDecodeError:
-        cleaned = re.sub(r",\s*([}\]])", r"\1", raw)
-        graph = json.loads(cleaned)
+def _merge_shard_graphs(pid_id: str, unified: dict, results: list[dict], cross: list[dict],
+                        components: list[dict], node_ids: list[str], index: dict) -> tuple[dict, dict]:
+    """
+    Deterministic merge: shards in name order, nodes by global id (first shard
+    wins, later ones fill gaps), edges by (from, to, kind). Components a shard
+    dropped are restored by rule; cross-shard connections are added by rule.
+    """
+    stats = Counter()
+    results = sorted((r for r in results if r["graph"]), key=lambda r: r["name"])
+    nodes: dict[str, dict] = {}
+    metadata = _metadata(pid_id, unified)
+    for r in results:
+        for k, v in (r["graph"].get("metadata") or {}).items():
+            metadata.setdefault(k, v)
+        for node in r["graph"].get("nodes", []):
+            if not isinstance(node, dict) or not node.get("id"):
+                continue
+            node.setdefault("props", {})
+            if node["id"] in nodes:
+                _merge_node(nodes[node["id"]], node)
+                stats["nodes_merged"] += 1
+            else:
+                nodes[node["id"]] = node
 
-    # Validate required fields
-    assert graph.get("schema_version") == "pid.graph.v0.1.1", "Wrong schema_version"
-    assert "nodes" in graph and "edges" in graph, "Missing nodes or edges"
+    for comp, node_id in zip(components, node_ids):
+        if node_id not in nodes:
+            ntype, subtype = _classify(comp) or ("annotation", "annotation.unclassified")
+            nodes[node_id] = _build_node(comp, node_id, ntype, subtype)
+            stats["nodes_restored"] += 1
 
-    node_count = len(graph["nodes"])
-    edge_count = len(graph["edges"])
-    print(f"[schema] Graph: {node_count} nodes, {edge_count} edges")
+    edges: dict[tuple, dict] = {}
+    for r in results:
+        tile = r["name"].split(".", 1)[0]
+        for edge in r["graph"].get("edges", []):
+            if not isinstance(edge, dict):
+                continue
+            src, dst = (
+                e if e in nodes else _resolve_endpoint(e, tile, "", index)
+                for e in (edge.get("from"), edge.get("to"))
+            )
+            if not src or not dst or src not in nodes or dst not in nodes or src == dst:
+                stats["edges_dangling"] += 1
+                continue
+            _add_edge(edges, {**edge, "from": src, "to": dst, "kind": _edge_kind(edge.get("kind"))}, stats)
+    for conn in cross:
+        _add_edge(edges, _build_edge(conn, conn["from"], conn["to"], _edge_kind(conn.get("kind"))),
+                  stats, bridge=bool(conn.get("cross_tile")))
+        stats["edges_cross_shard"] += 1
+    _assign_edge_ids(edges)
+
+    graph = {
+        "schema_version": "pid.graph.v0.1.1",
+        "metadata": metadata,
+        "nodes": list(nodes.values()),
+        "edges": list(edges.values()),
+    }
+    stats["nodes"] = len(graph["nodes"])
+    stats["edges"] = len(graph["edges"])
+    return graph, dict(stats)
+
+
+def _convert_with_llm(pid_id: str, unified: dict, work_dir: Path) -> tuple[dict, dict]:
+    """
+    Sonnet conversion, sharded: one region per source tile, quadtree-split
+    while a region's payload exceeds SCHEMA_SHARD_MAX_CHARS. Node ids are
+    assigned globally up front, shards run concurrently, and the shard graphs
+    are merged deterministically — latency is that of the slowest shard.
+    """
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise EnvironmentError("ANTHROPIC_API_KEY not set")
+
+    client = anthropic.Anthropic(api_key=api_key)
+
+    components = unified.get("components", [])
+    node_ids = _assign_node_ids(components, [(_classify(c) or ("component",))[0] for c in components])
+    index = _index_components(components, node_ids)
+
+    conns, skipped = [], Counter()
+    for conn in unified.get("connections", []):
+        src, dst, status = _connection_endpoints(conn, index)
+        if status == "ok":
+            conns.append({**conn, "from": src, "to": dst})
+        else:
+            skipped[status] += 1
+
+    by_tile: dict[str, list[dict]] = {}
+    for comp, node_id in zip(components, node_ids):
+        by_tile.setdefault(comp.get("_source_tile", ""), []).append({**comp, "node_id": node_id})
+    groups = []
+    for tile in sorted(by_tile):
+        groups += _region_groups(tile or "tile", f"{_tile_code(tile)}_", by_tile[tile], conns)
+    shards, cross = _build_shards(
+        groups or [("tile", "tile_", [])], conns,
+        unified.get("off_page_refs", []), unified.get("spec_breaks", []), index)
+
+    workers = max(1, min(SCHEMA_SHARD_WORKERS, len(shards)))
+    print(f"[schema] Calling {MODEL_SCHEMA} for schema conversion: {len(shards)} shard(s), "
+          f"{len(cross)} cross-shard connections, {workers} concurrent (streaming)...")
+    t0 = time.time()
+    results: list[dict] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for shard_results in pool.map(lambda s: _convert_shard(client, pid_id, s, index, work_dir), shards):
+            results.extend(shard_results)
+    elapsed = time.time() - t0
+
+    cross += [c for r in results for c in r["cross"]]
+    graph, stats = _merge_shard_graphs(pid_id, unified, results, cross, components, node_ids, index)
+    stats.update({f"edges_{k}": v for k, v in skipped.items()})
+
+    schema_in  = sum(r["input_tokens"] for r in results)
+    schema_out = sum(r["output_tokens"] for r in results)
+    schema_cost = calc_cost(MODEL_SCHEMA, schema_in, schema_out)
+    calls  = sum(r["calls"] for r in results)
+    issues = sum(r["issues"] for r in results)
+    print(f"[schema] Tokens: {schema_in:,} in / {schema_out:,} out  |  "
+          f"${schema_cost:.3f}  |  {elapsed:.0f}s  |  {calls} calls  |  {issues} schema issues")
 
-    # Save token report
     token_report = {
         "step": "schema",
+        "mode": "llm",
         "model": MODEL_SCHEMA,
-        "api_calls": 1,
+        "api_calls": calls,
         "input_tokens":  schema_in,
         "output_tokens": schema_out,
         "cost_usd": round(schema_cost, 4),
         "elapsed_s": round(elapsed, 1),
+        "shards": [
+            {k: r[k] for k in ("name", "calls", "input_tokens", "output_tokens", "elapsed_s", "issues")}
+            for r in results
+        ],
+        "stats": stats,
     }
+    return graph, token_report
+
+
+def _load_delta(work_dir: Path, unified_hash: str) -> dict | None:
+    """stitch_delta.json if it describes the current unified extraction."""
+    delta_path = work_dir / "stitch_delta.json"
+    if not delta_path.exists():
+        return None
+    delta = load_json(delta_path)
+    return delta if delta.get("unified_hash") == unified_hash else None
+
+
+def _converter_stamp(mode: str) -> dict:
+    """What schema_manifest.json records about the converter, beyond the input hash."""
+    return {"mode": mode, "strategy_version": STRATEGY_VERSION,
+            "converter_version": CONVERTER_VERSION.get(mode)}
+
+
+def _graph_is_current(work_dir: Path, unified_hash: str, mode: str) -> bool:
+    """True if the saved graph was converted from this exact unified extraction by this converter."""
+    manifest_path = work_dir / "schema_manifest.json"
+    if not manifest_path.exists():
+        return False   # no provenance — regenerate
+    manifest = load_json(manifest_path)
+    return manifest.get("unified_hash") == unified_hash and all(
+        manifest.get(k) == v for k, v in _converter_stamp(mode).items()
+    )
+
+
+def convert_to_graph(pid_id: str, unified: dict, force: bool = False, mode: str | None = None) -> dict:
+    """
+    Convert unified extraction to pid.graph.v0.1.1 (mode "rules" or "llm",
+    default config.SCHEMA_MODE). Saves to both work dir and graphs dir.
+    The existing graph is reused unless forced, the unified extraction changed
+    or the converter (mode / version) changed.
+    """
+    mode = mode or SCHEMA_MODE
+    work_dir  = pid_work_dir(pid_id)
+    out_work  = work_dir / "pid_graph.json"
+    out_graph = graphs_dir() / f"{pid_id}.graph.json"
+
+    unified_hash = content_hash(unified)
+    delta = _load_delta(work_dir, unified_hash)
+
+    if out_graph.exists() and not force:
+        if _graph_is_current(work_dir, unified_hash, mode):
+            print(f"[schema] Resume: {pid_id}.graph.json is up to date with the unified extraction")
+            graph = load_json(out_graph)
+            if open_store(store_path(out_graph)) is None:
+                write_store(graph, store_path(out_graph), [out_graph])
+            return graph
+        if delta:
+            c, e = delta["components"], delta["connections"]
+            print(f"[schema] Extraction changed since last conversion "
+                  f"(tiles: {', '.join(delta.get('changed_tiles', [])) or '-'}; "
+                  f"components +{len(c['added'])} -{len(c['removed'])} ~{len(c['modified'])}, "
+                  f"connections +{len(e['added'])} -{len(e['removed'])} ~{len(e['modified'])})")
+        else:
+            print(f"[schema] Extraction or converter changed since last conversion")
+
+    print(f"[schema] Converting {pid_id} extraction → pid.graph.v0.1.1 ({mode})")
+
+    if mode == "llm":
+        graph, token_report = _convert_with_llm(pid_id, unified, work_dir)
+        save_json(work_dir / "pid_graph_llm.json", graph)   # reference for --compare
+    else:
+        graph, token_report = _convert_with_rules(pid_id, unified, work_dir)
+
+    # Repair what can be repaired, then validate against the compiled schema
+    graph, repairs = PID_GRAPH.repair_graph(graph)
+    errors = PID_GRAPH.validate_graph(graph) + PID_GRAPH.reference_errors(graph)
+    print(f"[schema] Validation: {len(repairs)} repairs, {len(errors)} remaining schema errors")
+    for err in errors[:5]:
+        print(f"[schema]   {err}")
+    assert graph.get("schema_version") == "pid.graph.v0.1.1", "Wrong schema_version"
+    assert "nodes" in graph and "edges" in graph, "Missing nodes or edges"
+
+    node_count = len(graph["nodes"])
+    edge_count = len(graph["edges"])
+    print(f"[schema] Graph: {node_count} nodes, {edge_count} edges")
+
     save_json(work_dir / "schema_token_report.json", token_report)
 
     save_json(out_work,  graph)
     save_json(out_graph, graph)
+    write_store(graph, store_path(out_graph), [out_graph])
+    save_json(work_dir / "schema_manifest.json", {
+        "pid_id": pid_id,
+        "unified_hash": unified_hash,
+        **_converter_stamp(mode),
+        "model": token_report["model"],
+        "validation": {"repairs": repairs[:50], "repair_count": len(repairs), "errors": errors[:50]},
+        "delta": {
+            "changed_tiles": delta.get("changed_tiles", []),
+            "components": {k: len(v) for k, v in delta["components"].items()},
+            "connections": {k: len(v) for k, v in delta["connections"].items()},
+        } if delta else None,
+    })
     print(f"[schema] Saved → {out_graph}")
     return graph
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Equivalence report — rule-based graph vs the LLM graph
+# ─────────────────────────────────────────────────────────────────────────────
+
+def compare_graphs(graph: dict, reference: dict) -> dict:
+    """
+    Compare two graphs of the same P&ID. Nodes are matched by normalised tag
+    (untagged node ids are generated differently by each converter, so they
+    are compared by type counts only); edges by their unordered tagged endpoints.
+    """
+    def tagged(g: dict) -> dict[str, dict]:
+        return {_norm_tag(n["tag"]): n for n in g.get("nodes", []) if n.get("tag")}
+
+    def tagged_edges(g: dict) -> set[tuple]:
+        tag_of = {n["id"]: _norm_tag(n.get("tag")) for n in g.get("nodes", [])}
+        pairs = set()
+        for e in g.get("edges", []):
+            a, b = tag_of.get(e.get("from")), tag_of.get(e.get("to"))
+            if a and b:
+                pairs.add(tuple(sorted((a, b))))
+        return pairs
+
+    def ratio(n: int, d: int) -> float | None:
+        return round(n / d, 3) if d else None
+
+    ours, ref = tagged(graph), tagged(reference)
+    shared = ours.keys() & ref.keys()
+    type_mismatch = sorted(t for t in shared if ours[t]["type"] != ref[t]["type"])
+    e_ours, e_ref = tagged_edges(graph), tagged_edges(reference)
+    e_shared = e_ours & e_ref
+
+    return {
+        "nodes": {"rules": len(graph.get("nodes", [])), "llm": len(reference.get("nodes", []))},
+        "edges": {"rules": len(graph.get("edges", [])), "llm": len(reference.get("edges", []))},
+        "node_types": {
+            "rules": dict(Counter(n.get("type") for n in graph.get("nodes", []))),
+            "llm":   dict(Counter(n.get("type") for n in reference.get("nodes", []))),
+        },
+        "tags": {
+            "shared": len(shared),
+            "recall":    ratio(len(shared), len(ref)),
+            "precision": ratio(len(shared), len(ours)),
+            "type_agreement": ratio(len(shared) - len(type_mismatch), len(shared)),
+            "rules_only": sorted(ours[t]["tag"] for t in ours.keys() - ref.keys()),
+            "llm_only":   sorted(ref[t]["tag"] for t in ref.keys() - ours.keys()),
+            "type_mismatch": [
+                {"tag": ours[t]["tag"], "rules": ours[t]["type"], "llm": ref[t]["type"]}
+                for t in type_mismatch
+            ],
+        },
+        "tagged_edges": {
+            "shared": len(e_shared),
+            "recall":    ratio(len(e_shared), len(e_ref)),
+            "precision": ratio(len(e_shared), len(e_ours)),
+            "rules_only": [list(p) for p in sorted(e_ours - e_ref)],
+            "llm_only":   [list(p) for p in sorted(e_ref - e_ours)],
+        },
+    }
+
+
+def equivalence_report(pid_ids: list[str], use_llm: bool = False) -> dict:
+    """
+    Convert each P&ID's unified extraction with the rules and compare against
+    its LLM graph (pid_graph_llm.json if kept, else the graph in graphs/ unless
+    that was itself produced by the rules). Writes schema_equivalence.json per P&ID.
+    """
+    results = {}
+    for pid_id in pid_ids:
+        work_dir = pid_work_dir(pid_id)
+        unified_path = work_dir / "unified_extraction.json"
+        manifest_path = work_dir / "schema_manifest.json"
+        ref_path = work_dir / "pid_graph_llm.json"
+        if not ref_path.exists():
+            manifest = load_json(manifest_path) if manifest_path.exists() else {}
+            if manifest.get("mode", "llm") == "llm":
+                ref_path = graphs_dir() / f"{pid_id}.graph.json"
+        if not unified_path.exists() or not ref_path.exists():
+            print(f"[schema] {pid_id}: skipped — needs unified_extraction.json and an LLM graph")
+            continue
+
+        t0 = time.time()
+        graph, token_report = _convert_with_rules(pid_id, load_json(unified_path), work_dir, use_llm)
+        report = compare_graphs(graph, load_json(ref_path))
+        report.update({
+            "pid_id": pid_id,
+            "reference": str(ref_path),
+            "rules_elapsed_s": round(time.time() - t0, 3),
+            "rules_stats": token_report["stats"],
+            "residue": token_report["residue"],
+        })
+        save_json(work_dir / "schema_equivalence.json", report)
+        results[pid_id] = report
+        tg, te = report["tags"], report["tagged_edges"]
+        print(f"[schema] {pid_id}: nodes {report['nodes']['rules']} vs {report['nodes']['llm']}  |  "
+              f"tags recall {tg['recall']} precision {tg['precision']} "
+              f"type agreement {tg['type_agreement']}  |  "
+              f"tagged edges recall {te['recall']} precision {te['precision']}")
+    return results
+
+
 if __name__ == "__main__":
     import sys
     from config import pid_id_from_pdf
 
     if len(sys.argv) < 2:
-        print("Usage: python schema.py <pid_id_or_pdf> [--force]")
+        print("Usage: python schema.py <pid_id_or_pdf> [--force] [--llm]")
+        print("       python schema.py --compare [pid_id ...] [--with-residue]")
         sys.exit(1)
 
+    if sys.argv[1] == "--compare":
+        pids = [a for a in sys.argv[2:] if not a.startswith("--")] or list(POC_PIDS)
+        equivalence_report(pids, use_llm="--with-residue" in sys.argv)
+        sys.exit(0)
+
     arg = sys.argv[1]
     pid = pid_id_from_pdf(Path(arg)) if arg.endswith(".pdf") else arg
     force = "--force" in sys.argv
 
     work_dir = pid_work_dir(pid)
     unified = load_json(work_dir / "unified_extraction.json")
-    convert_to_graph(pid, unified, force=force)
+    convert_to_graph(pid, unified, force=force, mode="llm" if "--llm" in sys.argv else None)
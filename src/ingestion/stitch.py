@@ -4,21 +4,38 @@ stitch.py — Step 3 of the ingestion pipeline.
 Merge 6 per-tile extraction JSONs into a single unified_extraction.json.
 Responsibilities:
   - Apply pass3 corrections to pass1/pass2 data
-  - Deduplicate components in the 15% overlap zones (fuzzy tag match)
+  - Map each component's tile-relative bbox into page pixel space
+  - Deduplicate components in the 15% overlap zones (tag match + spatial overlap)
   - Resolve EDGE_* references across adjacent tiles
   - Merge connections that span tile boundaries
 
-Resume: skips if unified_extraction.json already exists.
+Incremental: each tile's pass1/2/3 inputs are hashed and recorded in
+stitch_cache.json. A re-run only re-merges tiles whose hash changed and
+re-resolves the borders around them; stitch_delta.json lists the components
+and connections that actually changed so schema.py can reuse unchanged output.
+Resume: skips if unified_extraction.json exists and no tile hash changed.
 """
 
 import json
 import re
 from pathlib import Path
 
-from config import pid_work_dir, save_json, load_json
+from config import pid_work_dir, save_json, load_json, content_hash
 
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Spatial dedup: two untagged symbols from different tiles are the same symbol
+# when their page-space boxes overlap by at least DEDUP_IOU (or their centres
+# sit within DEDUP_CENTER_TOL of the smaller box's size — small symbols drawn
+# slightly offset by the model rarely reach a high IoU).
+DEDUP_IOU        = 0.30
+DEDUP_CENTER_TOL = 0.50
+DEDUP_CELL_PX    = 128    # grid-index cell size (page pixels)
+
+# Bump when _apply_corrections / border resolution change so cached tile
+# merges from an older stitch are not reused.
+STITCH_CACHE_VERSION = 1
+
 TILE_ADJACENCY = {
     # (row, col) → which edges connect to which neighbour tile
     # key: (r, c), value: { "EDGE_RIGHT": (r, c+1), "EDGE_BOTTOM": (r+1, c), ... }
@@ -140,114 +157,322 @@ def _normalize_tag(tag: str) -> str:
     return re.sub(r"[\s\-]", "", tag.upper()) if tag else ""
 
 
+def _load_tile_bounds(pid_id: str) -> dict[str, dict]:
+    """Tile name → pixel bounds from tiles/tile_metadata.json ({} if not tiled yet)."""
+    meta_path = pid_work_dir(pid_id) / "tiles" / "tile_metadata.json"
+    if not meta_path.exists():
+        return {}
+    meta = load_json(meta_path)
+    return {t["name"].replace(".png", ""): t["bounds"] for t in meta.get("tiles", [])}
+
+
+def _page_bbox(comp: dict, bounds: dict | None) -> list[float] | None:
+    """
+    Convert a component's tile-relative bbox (0-1000 on each axis) into page
+    pixel coordinates [x0, y0, x1, y1]. Returns None if either is missing or malformed.
+    """
+    bb = comp.get("bbox") or comp.get("bb")
+    if not bounds or not (isinstance(bb, (list, tuple)) and len(bb) == 4):
+        return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in bb)
+    except (TypeError, ValueError):
+        return None
+    x0, x1 = sorted((x0, x1))
+    y0, y1 = sorted((y0, y1))
+    sx = bounds["width"] / 1000.0
+    sy = bounds["height"] / 1000.0
+    return [
+        round(bounds["x0"] + x0 * sx, 1), round(bounds["y0"] + y0 * sy, 1),
+        round(bounds["x0"] + x1 * sx, 1), round(bounds["y0"] + y1 * sy, 1),
+    ]
+
+
+def _iou(a: list[float], b: list[float]) -> float:
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _same_symbol(a: dict, b: dict) -> bool:
+    """Geometric duplicate test for two components with page bboxes."""
+    if a.get("_source_tile") == b.get("_source_tile"):
+        return False   # two symbols drawn side by side on one tile are both real
+    ta, tb = a.get("type"), b.get("type")
+    if ta and tb and ta != tb:
+        return False
+    ga, gb = _normalize_tag(a.get("tag", "")), _normalize_tag(b.get("tag", ""))
+    if ga and gb and ga != gb:
+        return False
+    ba, bb = a["bbox"], b["bbox"]
+    if _iou(ba, bb) >= DEDUP_IOU:
+        return True
+    size = min(max(ba[2] - ba[0], ba[3] - ba[1]), max(bb[2] - bb[0], bb[3] - bb[1]))
+    dx = (ba[0] + ba[2]) / 2 - (bb[0] + bb[2]) / 2
+    dy = (ba[1] + ba[3]) / 2 - (bb[1] + bb[3]) / 2
+    return size > 0 and (dx * dx + dy * dy) ** 0.5 <= size * DEDUP_CENTER_TOL
+
+
+def _merge_values(a, b):
+    """Union-merge two extracted values; `a` wins on scalar conflicts."""
+    if a in (None, "", [], {}):
+        return b
+    if b in (None, "", [], {}):
+        return a
+    if isinstance(a, dict) and isinstance(b, dict):
+        merged = dict(a)
+        for k, v in b.items():
+            merged[k] = _merge_values(merged.get(k), v)
+        return merged
+    if isinstance(a, list) and isinstance(b, list):
+        merged = list(a)
+        seen = {json.dumps(x, sort_keys=True) for x in a}
+        for x in b:
+            key = json.dumps(x, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                merged.append(x)
+        return merged
+    return a
+
+
+def _merge_component(keep: dict, other: dict) -> dict:
+    """Fold a duplicate into `keep`: union of fields and props, ids kept as aliases."""
+    merged = dict(keep)
+    for k, v in other.items():
+        if k in ("id", "bbox", "_source_tile", "_merged_ids"):
+            continue
+        merged[k] = _merge_values(merged.get(k), v)
+    if not merged.get("bbox") and other.get("bbox"):
+        merged["bbox"] = other["bbox"]
+    aliases = merged.get("_merged_ids", []) + [other["id"]] + other.get("_merged_ids", [])
+    merged["_merged_ids"] = aliases
+    return merged
+
+
 def _dedup_components(all_comps: list[dict]) -> list[dict]:
     """
     Deduplicate components from overlapping tiles.
-    Strategy: if two components share the same normalized tag, keep the one with more data.
-    Components without tags are kept as-is.
+    Strategy:
+      1. Components sharing the same normalized tag are one component.
+      2. Components with page bboxes are bucketed into a uniform grid; only
+         components sharing a cell are compared, so the spatial pass stays
+         near-linear. Overlapping boxes from different tiles (same type, no
+         conflicting tags) are one component — this catches the untagged
+         junctions, nozzles and valves that tag matching cannot.
+    Duplicates are folded into the first occurrence with a union of their
+    fields/props; the absorbed ids are kept in `_merged_ids`.
     """
-    seen_tags: dict[str, dict] = {}
-    untagged = []
-
-    for comp in all_comps:
+    n = len(all_comps)
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)   # lowest index stays the root
+
+    # 1. Tag matches
+    first_by_tag: dict[str, int] = {}
+    for i, comp in enumerate(all_comps):
         tag = _normalize_tag(comp.get("tag", ""))
-        if not tag:
-            untagged.append(comp)
+        if tag:
+            if tag in first_by_tag:
+                union(first_by_tag[tag], i)
+            else:
+                first_by_tag[tag] = i
+
+    # 2. Spatial matches via grid index
+    grid: dict[tuple[int, int], list[int]] = {}
+    for i, comp in enumerate(all_comps):
+        bb = comp.get("bbox")
+        if not bb:
             continue
-        if tag not in seen_tags:
-            seen_tags[tag] = comp
+        cx0, cy0 = int(bb[0] // DEDUP_CELL_PX), int(bb[1] // DEDUP_CELL_PX)
+        cx1, cy1 = int(bb[2] // DEDUP_CELL_PX), int(bb[3] // DEDUP_CELL_PX)
+        candidates: set[int] = set()
+        for gx in range(cx0, cx1 + 1):
+            for gy in range(cy0, cy1 + 1):
+                cell = grid.setdefault((gx, gy), [])
+                candidates.update(cell)
+                cell.append(i)
+        for j in candidates:
+            if find(i) != find(j) and _same_symbol(all_comps[j], comp):
+                union(j, i)
+
+    groups: dict[int, dict] = {}
+    for i, comp in enumerate(all_comps):
+        root = find(i)
+        if root not in groups:
+            groups[root] = comp
         else:
-            # Keep whichever has more props
-            existing = seen_tags[tag]
-            existing_props = len(json.dumps(existing.get("props", {})))
-            new_props = len(json.dumps(comp.get("props", {})))
-            if new_props > existing_props:
-                seen_tags[tag] = comp
-
-    return list(seen_tags.values()) + untagged
+            groups[root] = _merge_component(groups[root], comp)
+    return list(groups.values())
 
 
-def _resolve_edge_connections(
+def _resolve_tile_borders(
+    tile_key: tuple,
     tile_data: dict[tuple, dict],
     adjacency: dict,
 ) -> list[dict]:
     """
-    Find EDGE_* endpoints and create cross-tile connections.
-    For each EDGE_RIGHT in tile (r,c), look for EDGE_LEFT in tile (r, c+1)
-    and connect the components at those edges.
+    Bridge connections leaving one tile: for each EDGE_RIGHT in tile (r,c),
+    look for EDGE_LEFT in tile (r, c+1) and connect the components at those edges.
+    Depends only on this tile and its neighbours.
     """
     cross_connections = []
+    data = tile_data[tile_key]
+    adj = adjacency.get(tile_key, {})
+    for conn in data.get("connections", []):
+        from_id = conn.get("from", "")
+        to_id   = conn.get("to", "")
+
+        for edge_dir, neighbour_key in adj.items():
+            opposite = {
+                "EDGE_RIGHT": "EDGE_LEFT",
+                "EDGE_LEFT":  "EDGE_RIGHT",
+                "EDGE_BOTTOM": "EDGE_TOP",
+                "EDGE_TOP":    "EDGE_BOTTOM",
+            }[edge_dir]
+
+            if from_id == edge_dir or to_id == edge_dir:
+                # This connection exits this tile at edge_dir
+                # The component on the other side is at the neighbour tile's opposite edge
+                neighbour_data = tile_data.get(neighbour_key)
+                if not neighbour_data:
+                    continue
+                # Find entering connections at the opposite edge in neighbour
+                for nconn in neighbour_data.get("connections", []):
+                    nfrom = nconn.get("from", "")
+                    nto   = nconn.get("to", "")
+                    if nfrom == opposite or nto == opposite:
+                        # Create a bridge connection
+                        bridge_id = f"bridge_{tile_key[0]}{tile_key[1]}_{neighbour_key[0]}{neighbour_key[1]}_{edge_dir}"
+                        actual_from = to_id if from_id == edge_dir else from_id
+                        actual_to   = nfrom if nfrom != opposite else nto
+                        if actual_from not in ("EDGE_LEFT", "EDGE_RIGHT", "EDGE_TOP", "EDGE_BOTTOM") and \
+                           actual_to   not in ("EDGE_LEFT", "EDGE_RIGHT", "EDGE_TOP", "EDGE_BOTTOM"):
+                            cross_connections.append({
+                                "id": bridge_id,
+                                "from": f"{data['tile']}::{actual_from}",
+                                "to":   f"{neighbour_data['tile']}::{actual_to}",
+                                "kind": conn.get("kind", "process"),
+                                "line_tag":   conn.get("line_tag") or nconn.get("line_tag"),
+                                "pipe_class": conn.get("pipe_class") or nconn.get("pipe_class"),
+                                "diameter":   conn.get("diameter") or nconn.get("diameter"),
+                                "cross_tile": True,
+                            })
 
-    for tile_key, data in tile_data.items():
-        adj = adjacency.get(tile_key, {})
-        for conn in data.get("connections", []):
-            from_id = conn.get("from", "")
-            to_id   = conn.get("to", "")
-
-            for edge_dir, neighbour_key in adj.items():
-                opposite = {
-                    "EDGE_RIGHT": "EDGE_LEFT",
-                    "EDGE_LEFT":  "EDGE_RIGHT",
-                    "EDGE_BOTTOM": "EDGE_TOP",
-                    "EDGE_TOP":    "EDGE_BOTTOM",
-                }[edge_dir]
-
-                if from_id == edge_dir or to_id == edge_dir:
-                    # This connection exits this tile at edge_dir
-                    # The component on the other side is at the neighbour tile's opposite edge
-                    neighbour_data = tile_data.get(neighbour_key)
-                    if not neighbour_data:
-                        continue
-                    # Find entering connections at the opposite edge in neighbour
-                    for nconn in neighbour_data.get("connections", []):
-                        nfrom = nconn.get("from", "")
-                        nto   = nconn.get("to", "")
-                        if nfrom == opposite or nto == opposite:
-                            # Create a bridge connection
-                            bridge_id = f"bridge_{tile_key[0]}{tile_key[1]}_{neighbour_key[0]}{neighbour_key[1]}_{edge_dir}"
-                            actual_from = to_id if from_id == edge_dir else from_id
-                            actual_to   = nfrom if nfrom != opposite else nto
-                            if actual_from not in ("EDGE_LEFT", "EDGE_RIGHT", "EDGE_TOP", "EDGE_BOTTOM") and \
-                               actual_to   not in ("EDGE_LEFT", "EDGE_RIGHT", "EDGE_TOP", "EDGE_BOTTOM"):
-                                cross_connections.append({
-                                    "id": bridge_id,
-                                    "from": f"{data['tile']}::{actual_from}",
-                                    "to":   f"{neighbour_data['tile']}::{actual_to}",
-                                    "kind": conn.get("kind", "process"),
-                                    "line_tag":   conn.get("line_tag") or nconn.get("line_tag"),
-                                    "pipe_class": conn.get("pipe_class") or nconn.get("pipe_class"),
-                                    "diameter":   conn.get("diameter") or nconn.get("diameter"),
-                                    "cross_tile": True,
-                                })
+    return cross_connections
 
+
+def _resolve_edge_connections(
+    tile_data: dict[tuple, dict],
+    adjacency: dict,
+) -> list[dict]:
+    """Find EDGE_* endpoints and create cross-tile connections for every tile."""
+    cross_connections = []
+    for tile_key in tile_data:
+        cross_connections.extend(_resolve_tile_borders(tile_key, tile_data, adjacency))
     return cross_connections
 
 
+def _tile_hash(tile_result: dict) -> str:
+    """Hash of the pass1/2/3 inputs of one tile (token accounting excluded)."""
+    return content_hash({p: tile_result.get(p, {}) for p in ("pass1", "pass2", "pass3")})
+
+
+def _diff_items(old: list[dict], new: list[dict]) -> dict:
+    """Added / removed / modified ids between two component or connection lists."""
+    old_h = {item.get("id"): content_hash(item) for item in old}
+    new_h = {item.get("id"): content_hash(item) for item in new}
+    return {
+        "added":    sorted(k for k in new_h if k not in old_h),
+        "removed":  sorted(k for k in old_h if k not in new_h),
+        "modified": sorted(k for k in new_h if k in old_h and new_h[k] != old_h[k]),
+    }
+
+
+def _build_delta(previous: dict | None, unified: dict, changed_tiles: list[str]) -> dict:
+    """Describe what changed between the previous and the new unified extraction."""
+    prev = previous or {}
+    components  = _diff_items(prev.get("components", []),  unified["components"])
+    connections = _diff_items(prev.get("connections", []), unified["connections"])
+    unchanged = previous is not None and \
+        content_hash(previous) == content_hash(unified)
+    return {
+        "pid_id": unified["pid_id"],
+        "unified_hash": content_hash(unified),
+        "previous_hash": content_hash(previous) if previous is not None else None,
+        "unchanged": unchanged,
+        "changed_tiles": changed_tiles,
+        "components": components,
+        "connections": connections,
+    }
+
+
 def stitch(pid_id: str, tile_extractions: list[dict], force: bool = False) -> dict:
     """
     Stitch tile extractions into a unified extraction document.
     Returns the unified extraction dict and saves it to disk.
     """
-    work_dir = pid_work_dir(pid_id)
-    out_path = work_dir / "unified_extraction.json"
-
-    if out_path.exists() and not force:
-        print(f"[stitch] Resume: unified_extraction.json already exists for {pid_id}")
+    work_dir   = pid_work_dir(pid_id)
+    out_path   = work_dir / "unified_extraction.json"
+    cache_path = work_dir / "stitch_cache.json"
+    delta_path = work_dir / "stitch_delta.json"
+
+    # Hash before merging — _apply_corrections edits pass1 components in place
+    hashes = {t.get("tile", "unknown"): _tile_hash(t) for t in tile_extractions}
+
+    cache = load_json(cache_path) if cache_path.exists() and not force else {}
+    if cache.get("version") != STITCH_CACHE_VERSION:
+        cache = {}
+    cached_tiles   = cache.get("tiles", {})
+    cached_borders = cache.get("borders", {})
+    changed_tiles = sorted(
+        [t for t, h in hashes.items() if cached_tiles.get(t, {}).get("hash") != h] +
+        [t for t in cached_tiles if t not in hashes]
+    )
+
+    if out_path.exists() and cache and not changed_tiles:
+        print(f"[stitch] Resume: unified_extraction.json up to date for {pid_id} "
+              f"(all {len(hashes)} tile hashes match)")
         return load_json(out_path)
 
-    print(f"[stitch] Stitching {len(tile_extractions)} tiles for {pid_id}")
+    if cache:
+        print(f"[stitch] Incremental stitch for {pid_id}: "
+              f"{len(changed_tiles)} changed tile(s): {', '.join(changed_tiles)}")
+    else:
+        print(f"[stitch] Stitching {len(tile_extractions)} tiles for {pid_id}")
 
     adjacency = _build_adjacency()
+    tile_bounds = _load_tile_bounds(pid_id)
 
-    # Apply corrections and flatten each tile
+    # Apply corrections and flatten each tile (reuse cached merges for unchanged tiles)
     tile_data: dict[tuple, dict] = {}
     for tile_result in tile_extractions:
-        merged = _apply_corrections(tile_result)
+        name = tile_result.get("tile", "unknown")
+        cached = cached_tiles.get(name)
+        if cached and cached.get("hash") == hashes[name]:
+            merged = cached["merged"]
+            status = "cached"
+        else:
+            merged = _apply_corrections(tile_result)
+            status = "merged"
         key = _tile_key(merged["tile"])
         tile_data[key] = merged
         print(f"[stitch]   Tile {merged['tile']}: "
               f"{len(merged['components'])} components, "
-              f"{len(merged['connections'])} connections")
+              f"{len(merged['connections'])} connections  [{status}]")
 
     # Collect all components and deduplicate
     all_components = []
@@ -261,10 +486,19 @@ def stitch(pid_id: str, tile_extractions: list[dict], force: bool = False) -> di
                 cid = f"{tile_prefix}__{cid}"
             comp["id"] = cid
             comp["_source_tile"] = tile_prefix
+            # Tile-relative 0-1000 bbox → page pixels, so overlap duplicates line up
+            page_bb = _page_bbox(comp, tile_bounds.get(tile_prefix))
+            comp.pop("bb", None)
+            if page_bb:
+                comp["bbox"] = page_bb
+            else:
+                comp.pop("bbox", None)
             all_components.append(comp)
 
+    with_bbox = sum(1 for c in all_components if c.get("bbox"))
     deduped = _dedup_components(all_components)
-    print(f"[stitch] Components: {len(all_components)} raw → {len(deduped)} after dedup")
+    print(f"[stitch] Components: {len(all_components)} raw → {len(deduped)} after dedup "
+          f"({with_bbox} with page bbox)")
 
     # Collect all intra-tile connections
     all_connections = []
@@ -279,10 +513,29 @@ def stitch(pid_id: str, tile_extractions: list[dict], force: bool = False) -> di
             conn["_source_tile"] = tile_prefix
             all_connections.append(conn)
 
-    # Resolve cross-tile connections
-    cross = _resolve_edge_connections(tile_data, adjacency)
+    # Resolve cross-tile connections — only borders touching a changed tile
+    # are re-resolved; a tile's bridges depend on it and its neighbours only.
+    cross = []
+    borders: dict[str, dict] = {}
+    resolved = 0
+    for key, data in tile_data.items():
+        name = data["tile"]
+        neighbours = sorted(
+            hashes.get(tile_data[nk]["tile"], "")
+            for nk in adjacency.get(key, {}).values() if nk in tile_data
+        )
+        border_key = content_hash([hashes.get(name, ""), neighbours])
+        cached = cached_borders.get(name)
+        if cached and cached.get("key") == border_key:
+            bridges = cached["bridges"]
+        else:
+            bridges = _resolve_tile_borders(key, tile_data, adjacency)
+            resolved += 1
+        borders[name] = {"key": border_key, "bridges": bridges}
+        cross.extend(bridges)
     all_connections.extend(cross)
-    print(f"[stitch] Connections: {len(all_connections) - len(cross)} intra + {len(cross)} cross-tile")
+    print(f"[stitch] Connections: {len(all_connections) - len(cross)} intra + {len(cross)} cross-tile "
+          f"({resolved}/{len(tile_data)} tile borders re-resolved)")
 
     # Collect off-page refs, spec breaks, notes, quality flags
     all_off_page_refs = []
@@ -290,8 +543,10 @@ def stitch(pid_id: str, tile_extractions: list[dict], force: bool = False) -> di
     all_notes         = []
     all_quality_flags = []
     for data in tile_data.values():
-        all_off_page_refs.extend(data.get("off_page_refs", []))
-        all_spec_breaks.extend(data.get("spec_breaks", []))
+        # Tile-tagged so schema.py can resolve their (tile-local) component ids
+        for key, out in (("off_page_refs", all_off_page_refs), ("spec_breaks", all_spec_breaks)):
+            out.extend({**r, "_source_tile": data["tile"]} if isinstance(r, dict) else r
+                       for r in data.get(key, []))
         all_notes.extend(data.get("notes", []))
         all_quality_flags.extend(data.get("quality_flags", []))
 
@@ -307,12 +562,29 @@ def stitch(pid_id: str, tile_extractions: list[dict], force: bool = False) -> di
         "stats": {
             "components_raw": len(all_components),
             "components_deduped": len(deduped),
+            "components_with_bbox": with_bbox,
             "connections_intra": len(all_connections) - len(cross),
             "connections_cross": len(cross),
         },
     }
 
+    previous = load_json(out_path) if out_path.exists() else None
+    delta = _build_delta(previous, unified, changed_tiles)
+    save_json(delta_path, delta)
+    if previous is not None:
+        c, e = delta["components"], delta["connections"]
+        print(f"[stitch] Delta: components +{len(c['added'])} -{len(c['removed'])} ~{len(c['modified'])}  |  "
+              f"connections +{len(e['added'])} -{len(e['removed'])} ~{len(e['modified'])}")
+
     save_json(out_path, unified)
+    save_json(cache_path, {
+        "version": STITCH_CACHE_VERSION,
+        "tiles": {
+            data["tile"]: {"hash": hashes.get(data["tile"], ""), "merged": data}
+            for data in tile_data.values()
+        },
+        "borders": borders,
+    })
     print(f"[stitch] Done: unified_extraction.json → {out_path}")
     return unified
 
@@ -1,24 +1,51 @@
 """
 supergraph.py — Step 6 of the ingestion pipeline.
 
-Wire 3 per-P&ID graphs into a super graph by resolving off_page_ref connections.
-Two terminator nodes with the same off_page_ref (normalised) on different P&IDs
-are connected by an inter-P&ID edge.
-
-Resume: skips if supergraph.json already exists.
+Wire every per-P&ID graph in graphs_dir() into a super graph by resolving
+off_page_ref connections. All terminators whose off_page_ref (normalised)
+appears on two or more P&IDs are connected to one hub node "hub::<ref>" —
+k edges per shared reference instead of an edge per pair of occurrences.
+Member edges follow the terminators' flow: an outgoing off-page terminator
+feeds the hub and the hub feeds an incoming one. A hub without both kinds
+of member (every label says TO, or the flow is unknown) is wired both ways,
+so a traversal still crosses it from one P&ID into the other.
+Labels that differ only in formatting, revision, TO/FROM or an OCR slip are
+clustered into the same hub by ref_match (trigram index + edit distance,
+blocked by drawing number); such hubs are marked match="fuzzy" with a score.
+
+Incremental: a reference index (reference_cache_dir()/supergraph_index.json)
+keeps each graph's mtime/size, terminators and summary. Only new or changed
+graphs are loaded (in parallel) and only their own references are replaced;
+a deleted graph drops its references. The index also keeps every pair of
+refs ref_match scored above the threshold, so only refs not seen before are
+matched (against the drawing-number blocks they fall in). The LLM connectivity summary runs only
+on demand (enrich=True / --enrich); otherwise the previous one is kept.
+
+Every graph also gets a binary store (graph_store.py): <pid>.graph.bin, and
+supergraph.bin holding the merged graph the backend tools query.
+
+Resume: skips when no graph changed and supergraph.json exists.
 """
 
 import json
 import os
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import anthropic
 
 from config import (
-    MODEL_SCHEMA, MAX_TOKENS_SCHEMA,
-    POC_PIDS, graphs_dir, save_json, load_json,
+    MODEL_SCHEMA, SUPERGRAPH_LOAD_WORKERS, REF_MATCH_THRESHOLD,
+    graphs_dir, reference_cache_dir, save_json, load_json,
 )
+from graph_store import merge_supergraph, open_store, store_path, write_store
+from ref_match import MATCH_VERSION, RefMatcher, UnionFind, drawing_number
+from schema import PID_GRAPH
+from validate import validate_completeness
+
+SUPERGRAPH_INDEX_VERSION = 3
 
 # ─────────────────────────────────────────────────────────────────────────────
 
@@ -27,109 +54,311 @@ def _norm_ref(ref: str) -> str:
     return re.sub(r"[\s\-_./]", "", ref.upper()) if ref else ""
 
 
-def build_supergraph(force: bool = False) -> dict:
+def _discover_graphs() -> dict[str, Path]:
+    """pid_id → path for every <pid_id>.graph.json in graphs_dir()."""
+    return {
+        path.name[: -len(".graph.json")]: path
+        for path in sorted(graphs_dir().glob("*.graph.json"))
+    }
+
+
+def _terminator_flow(node: dict, n_in: int, n_out: int) -> str | None:
+    """
+    "out" when flow leaves the sheet at this terminator, "in" when it enters,
+    None if unknown: props.direction, else a TO / FROM label, else which
+    side of the terminator its own edges are on.
+    """
+    direction = str((node.get("props") or {}).get("direction") or "").lower()
+    if direction in ("in", "out"):
+        return direction
+    m = re.match(r"\s*(TO|FROM)\b", (node.get("off_page_ref") or "").upper())
+    if m:
+        return "out" if m.group(1) == "TO" else "in"
+    if n_in and not n_out:
+        return "out"
+    if n_out and not n_in:
+        return "in"
+    return None
+
+
+def _completeness_counts(nodes: list, edges: list) -> dict:
+    """validate.py completeness rules for one graph, counted per rule."""
+    issues, warnings = validate_completeness(nodes, edges)
+    by_rule: dict[str, int] = {}
+    for item in issues + warnings:
+        # a summary entry counts every offending node, not just the items it lists
+        by_rule[item["rule"]] = by_rule.get(item["rule"], 0) + item.get("count", 1)
+    return {"issues": len(issues), "warnings": len(warnings), "by_rule": by_rule}
+
+
+def _index_graph(path: Path) -> dict:
+    """Everything the supergraph needs from one graph, so it is loaded only when it changes."""
+    st = path.stat()
+    graph = load_json(path)
+    nodes, edges = graph.get("nodes", []), graph.get("edges", [])
+    n_in, n_out = Counter(e.get("to") for e in edges), Counter(e.get("from") for e in edges)
+    return {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "node_count": len(nodes),
+        "edge_count": len(edges),
+        "metadata": graph.get("metadata", {}),
+        "equipment": [n["tag"] for n in nodes if n.get("type") == "equipment" and n.get("tag")][:20],
+        "terminators": [
+            {"id": n["id"], "tag": n.get("tag"), "ref": n.get("off_page_ref"),
+             "norm": _norm_ref(n.get("off_page_ref") or ""),
+             "flow": _terminator_flow(n, n_in[n["id"]], n_out[n["id"]])}
+            for n in nodes if n.get("type") == "terminator"
+        ],
+        "completeness": _completeness_counts(nodes, edges),
+    }
+
+
+def _update_index(index: dict, discovered: dict[str, Path], force: bool) -> tuple[list, list]:
+    """
+    Bring the reference index in line with the graphs on disk. Returns
+    (changed, removed) pid lists; only those P&IDs' references are touched.
+    """
+    pids, refs = index["pids"], index["refs"]
+    changed = []
+    for pid_id, path in discovered.items():
+        st = path.stat()
+        entry = pids.get(pid_id)
+        if force or not entry or (entry["mtime_ns"], entry["size"]) != (st.st_mtime_ns, st.st_size):
+            changed.append(pid_id)
+    removed = [pid_id for pid_id in pids if pid_id not in discovered]
+
+    for pid_id in changed + removed:
+        for t in pids.get(pid_id, {}).get("terminators", []):
+            occ = refs.get(t["norm"], [])
+            if [pid_id, t["id"]] in occ:
+                occ.remove([pid_id, t["id"]])
+            if not occ:
+                refs.pop(t["norm"], None)
+        pids.pop(pid_id, None)
+
+    workers = max(1, min(SUPERGRAPH_LOAD_WORKERS, len(changed)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loaded = dict(zip(changed, pool.map(lambda pid: _index_graph(discovered[pid]), changed)))
+    for pid_id in changed:
+        entry = pids[pid_id] = loaded[pid_id]
+        for t in entry["terminators"]:
+            if t["norm"]:
+                refs.setdefault(t["norm"], []).append([pid_id, t["id"]])
+        print(f"[supergraph] Indexed {pid_id}: {entry['node_count']} nodes, {entry['edge_count']} edges, "
+              f"{len(entry['terminators'])} terminators")
+    index["pids"] = dict(sorted(pids.items()))
+    return changed, removed
+
+
+def _match_refs(index: dict, raw: dict[str, str]) -> int:
+    """
+    Bring index["matches"] (ref → {other ref: ref_match score} for every pair
+    scoring REF_MATCH_THRESHOLD or more) in line with index["refs"]: removed
+    refs are dropped, and only refs not matched before are looked up, in a
+    RefMatcher over the drawing-number blocks they fall in. A new matcher
+    version or threshold redoes them all. Returns the number of refs matched.
+    """
+    settings = [MATCH_VERSION, REF_MATCH_THRESHOLD]
+    if index.get("match_settings") != settings:
+        index["match_settings"], index["matches"] = settings, {}
+    refs, matches = index["refs"], index["matches"]
+    for norm in [n for n in matches if n not in refs]:
+        for other in matches.pop(norm):
+            matches.get(other, {}).pop(norm, None)
+    added = sorted(n for n in refs if n not in matches)
+    if not added:
+        return 0
+
+    block_of = {n: drawing_number(raw.get(n, n)) for n in refs}
+    blocks = {block_of[n] for n in added}
+    matcher = RefMatcher(REF_MATCH_THRESHOLD)
+    for norm in sorted(refs):
+        if block_of[norm] in blocks:
+            matcher.add(norm, raw.get(norm, norm))
+    for norm in added:
+        matches.setdefault(norm, {})
+        for other, score in matcher.candidates(norm):
+            matches[norm][other] = score
+            matches.setdefault(other, {})[norm] = score
+    return len(added)
+
+
+def _build_hubs(index: dict) -> tuple[list[dict], list[str]]:
+    """
+    Cluster off-page references: identical normalised refs first, then
+    different labels whose ref_match score reaches REF_MATCH_THRESHOLD
+    (kept in the index by _match_refs), joined with union-find. Every cluster
+    spanning two or more P&IDs becomes a hub. Returns (hubs, isolated refs).
+    """
+    refs = index["refs"]
+    raw = {
+        t["norm"]: t["ref"]
+        for entry in index["pids"].values() for t in entry["terminators"] if t["norm"]
+    }
+    pids_of = {norm: {pid for pid, _ in occ} for norm, occ in refs.items()}
+
+    matched = _match_refs(index, raw)
+    if matched:
+        print(f"[supergraph] Matched {matched} new off-page refs")
+    uf = UnionFind()
+    scores: dict[tuple, float] = {}
+    for norm in sorted(refs):
+        uf.find(norm)
+        for other, score in index["matches"][norm].items():
+            if len(pids_of[norm] | pids_of[other]) < 2:
+                continue   # two labels on the same sheet are two different connections
+            uf.union(norm, other)
+            scores[tuple(sorted((norm, other)))] = score
+
+    hubs, isolated = [], []
+    for cluster in uf.groups().values():
+        pids = set().union(*(pids_of[n] for n in cluster))
+        if len(pids) < 2:
+            isolated += [raw.get(n, n) for n in cluster]
+            continue
+        # Hub named after the most used label (then the longest)
+        key = max(cluster, key=lambda n: (len(refs[n]), len(n), n))
+        members = sorted({(pid, nid) for n in cluster for pid, nid in refs[n]})
+        hub = {
+            "id": f"hub::{key}",
+            "off_page_ref": raw.get(key, key),
+            "match": "exact" if len(cluster) == 1 else "fuzzy",
+            "pids": sorted(pids),
+            "members": [f"{pid}::{nid}" for pid, nid in members],
+        }
+        if len(cluster) > 1:
+            hub["refs"] = [raw.get(n, n) for n in cluster]
+            hub["score"] = min(v for (a, b), v in scores.items() if a in cluster and b in cluster)
+        hubs.append(hub)
+    return sorted(hubs, key=lambda h: h["id"]), sorted(isolated)
+
+
+def _read_graph(path: Path) -> dict:
+    """A graph as the backend sees it: repaired, with the fixes under `_repairs`."""
+    graph, repairs = PID_GRAPH.repair_graph(load_json(path))
+    if repairs:
+        graph["_repairs"] = repairs
+    return graph
+
+
+def _write_stores(supergraph: dict, discovered: dict[str, Path]) -> None:
+    """
+    Binary stores (graph_store.py) for every P&ID graph whose store is missing
+    or stale, and for the merged supergraph the backend tools query.
     """
-    Load all available P&ID graphs and wire them into a super graph.
+    graphs: dict[str, dict | None] = {}
+
+    def read(pid_id: str) -> dict | None:
+        if pid_id not in graphs:
+            path = discovered.get(pid_id)
+            graphs[pid_id] = _read_graph(path) if path else None
+        return graphs[pid_id]
+
+    for pid_id, path in discovered.items():
+        if open_store(store_path(path)) is None:
+            write_store(read(pid_id), store_path(path), [path])
+            print(f"[supergraph] Wrote {store_path(path).name}")
+
+    sg_path = graphs_dir() / "supergraph.json"
+    if open_store(store_path(sg_path)) is None:
+        pids = [p for p in supergraph.get("pid_graphs", {}) if p in discovered]
+        merged = merge_supergraph(supergraph, read)
+        write_store(merged, store_path(sg_path), [sg_path] + [discovered[p] for p in pids])
+        print(f"[supergraph] Wrote {store_path(sg_path).name}: "
+              f"{len(merged['nodes'])} nodes, {len(merged['edges'])} edges")
+
+
+def build_supergraph(force: bool = False, enrich: bool = False) -> dict:
+    """
+    Index the P&ID graphs on disk and wire them into a super graph.
     Returns the supergraph dict and saves it to graphs_dir/supergraph.json.
     """
-    out_path = graphs_dir() / "supergraph.json"
-
-    if out_path.exists() and not force:
-        print("[supergraph] Resume: supergraph.json already exists")
-        return load_json(out_path)
-
-    # Load all available graphs
-    gdir = graphs_dir()
-    graphs: dict[str, dict] = {}
-    for pid_id in POC_PIDS:
-        gpath = gdir / f"{pid_id}.graph.json"
-        if gpath.exists():
-            graphs[pid_id] = load_json(gpath)
-            n = len(graphs[pid_id].get("nodes", []))
-            e = len(graphs[pid_id].get("edges", []))
-            print(f"[supergraph] Loaded {pid_id}: {n} nodes, {e} edges")
-        else:
-            print(f"[supergraph] WARNING: {pid_id}.graph.json not found, skipping")
-
-    if len(graphs) < 2:
+    out_path   = graphs_dir() / "supergraph.json"
+    index_path = reference_cache_dir() / "supergraph_index.json"
+
+    index = load_json(index_path) if index_path.exists() and not force else {}
+    if index.get("version") != SUPERGRAPH_INDEX_VERSION:
+        index = {"version": SUPERGRAPH_INDEX_VERSION, "pids": {}, "refs": {}, "matches": {}}
+
+    discovered = _discover_graphs()
+    changed, removed = _update_index(index, discovered, force)
+    previous = load_json(out_path) if out_path.exists() else None
+    if previous and not changed and not removed and not enrich:
+        print("[supergraph] Resume: no P&ID graph changed since supergraph.json was built")
+        _write_stores(previous, discovered)
+        return previous
+    if removed:
+        print(f"[supergraph] Removed from index: {', '.join(removed)}")
+
+    if len(index["pids"]) < 2:
+        save_json(index_path, index)
         print("[supergraph] Need at least 2 P&ID graphs to build supergraph")
         return {}
 
-    # Build index of terminator nodes by normalised off_page_ref
-    # { norm_ref: [(pid_id, node)] }
-    ref_index: dict[str, list[tuple[str, dict]]] = {}
-    for pid_id, graph in graphs.items():
-        for node in graph.get("nodes", []):
-            if node.get("type") == "terminator" and node.get("off_page_ref"):
-                norm = _norm_ref(node["off_page_ref"])
-                ref_index.setdefault(norm, []).append((pid_id, node))
-
-    # Find matches across different P&IDs
+    hubs, isolated = _build_hubs(index)
+    save_json(index_path, index)
+    terminator = {
+        (pid_id, t["id"]): t
+        for pid_id, entry in index["pids"].items() for t in entry["terminators"]
+    }
     inter_pid_edges = []
-    matched_refs = set()
-    edge_count = 0
-
-    for norm_ref, occurrences in ref_index.items():
-        # Unique P&IDs that have this ref
-        pids_with_ref = list({pid for pid, _ in occurrences})
-        if len(pids_with_ref) < 2:
-            continue  # same ref on only one P&ID — can't wire
-
-        matched_refs.add(norm_ref)
-        # Create an edge between each pair of P&IDs sharing this ref
-        for i in range(len(occurrences)):
-            for j in range(i + 1, len(occurrences)):
-                pid_a, node_a = occurrences[i]
-                pid_b, node_b = occurrences[j]
-                if pid_a == pid_b:
-                    continue
-                edge_id = f"inter_{pid_a}_{pid_b}_{norm_ref}_{edge_count}"
-                inter_pid_edges.append({
-                    "id": edge_id,
-                    "from": f"{pid_a}::{node_a['id']}",
-                    "to":   f"{pid_b}::{node_b['id']}",
-                    "kind": "process",
-                    "props": {
-                        "off_page_ref": node_a.get("off_page_ref"),
-                        "cross_pid": True,
-                    },
-                })
-                edge_count += 1
-
-    print(f"[supergraph] Matched {len(matched_refs)} off-page refs → {edge_count} inter-P&ID edges")
-
-    # Use Claude Sonnet to enrich the supergraph with a connectivity summary
-    enriched_connections = _enrich_with_llm(graphs, inter_pid_edges)
-
-    # Build supergraph document
+    for h in hubs:
+        members = [(member, *member.split("::", 1)) for member in h["members"]]
+        flows = {terminator[pid_id, node_id].get("flow") for _, pid_id, node_id in members}
+        directed = {"in", "out"} <= flows   # otherwise every member is wired both ways
+        for member, pid_id, node_id in members:
+            t = terminator[pid_id, node_id]
+            props = {"off_page_ref": t["ref"], "flow": t.get("flow"), "cross_pid": True}
+            if not (directed and t.get("flow") == "in"):
+                inter_pid_edges.append({"id": f"hub_{pid_id}_{node_id}", "from": member,
+                                        "to": h["id"], "kind": "process", "props": props})
+            if not (directed and t.get("flow") == "out"):
+                inter_pid_edges.append({"id": f"hub_{pid_id}_{node_id}_rev", "from": h["id"],
+                                        "to": member, "kind": "process", "props": props})
+    print(f"[supergraph] {len(hubs)} shared off-page refs → {len(inter_pid_edges)} hub edges, "
+          f"{len(isolated)} isolated refs")
+
+    if enrich:
+        connectivity = _enrich_with_llm(index["pids"], hubs)
+    else:
+        connectivity = (previous or {}).get("connectivity_summary", {})
+
+    total_issues = sum(e["completeness"]["issues"] for e in index["pids"].values())
+    print(f"[supergraph] Completeness: {total_issues} issues across {len(index['pids'])} P&IDs")
+
     supergraph = {
-        "schema_version": "pid.supergraph.v0.1.0",
+        "schema_version": "pid.supergraph.v0.2.0",
         "metadata": {
-            "pid_ids": list(graphs.keys()),
-            "description": "Cross-P&ID super graph for POC P&IDs 006, 007, 008",
+            "pid_ids": list(index["pids"]),
+            "description": f"Cross-P&ID super graph for {len(index['pids'])} P&IDs",
         },
         "pid_graphs": {
             pid_id: {
-                "node_count": len(g.get("nodes", [])),
-                "edge_count": len(g.get("edges", [])),
-                "metadata": g.get("metadata", {}),
+                "node_count": entry["node_count"],
+                "edge_count": entry["edge_count"],
+                "metadata": entry["metadata"],
             }
-            for pid_id, g in graphs.items()
+            for pid_id, entry in index["pids"].items()
         },
+        "hubs": hubs,
         "inter_pid_edges": inter_pid_edges,
-        "connectivity_summary": enriched_connections,
+        "isolated_refs": isolated,
+        "completeness": {pid_id: e["completeness"] for pid_id, e in index["pids"].items()},
+        "connectivity_summary": connectivity,
     }
 
     save_json(out_path, supergraph)
     print(f"[supergraph] Saved supergraph.json → {out_path}")
-    print(f"[supergraph] {len(graphs)} P&IDs, {edge_count} inter-P&ID connections")
+    _write_stores(supergraph, discovered)
+    print(f"[supergraph] {len(index['pids'])} P&IDs, {len(hubs)} inter-P&ID connections")
     return supergraph
 
 
-def _enrich_with_llm(graphs: dict, inter_edges: list) -> dict:
+def _enrich_with_llm(pids: dict, hubs: list) -> dict:
     """
-    Use Claude Sonnet to summarise the connectivity between P&IDs.
-    Returns a connectivity summary dict.
+    Use Claude Sonnet to summarise the connectivity between P&IDs, from the
+    reference index (no graph is reloaded). Returns a connectivity summary dict.
     """
     api_key = os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
@@ -140,24 +369,15 @@ def _enrich_with_llm(graphs: dict, inter_edges: list) -> dict:
 
     # Build a concise overview of what each P&ID contains
     pid_summaries = {}
-    for pid_id, graph in graphs.items():
-        nodes = graph.get("nodes", [])
-        equipment = [n.get("tag") for n in nodes if n.get("type") == "equipment" and n.get("tag")]
-        terminators = [
-            {"tag": n.get("tag"), "ref": n.get("off_page_ref")}
-            for n in nodes if n.get("type") == "terminator"
-        ]
+    for pid_id, entry in pids.items():
+        terminators = [{"tag": t["tag"], "ref": t["ref"]} for t in entry["terminators"]]
         pid_summaries[pid_id] = {
-            "equipment": equipment[:20],
+            "equipment": entry["equipment"],
             "terminator_count": len(terminators),
             "terminators": terminators[:20],
         }
 
-    edge_summary = [
-        {"from_pid": e["from"].split("::")[0], "to_pid": e["to"].split("::")[0],
-         "ref": e.get("props", {}).get("off_page_ref")}
-        for e in inter_edges[:30]
-    ]
+    edge_summary = [{"pids": h["pids"], "ref": h["off_page_ref"]} for h in hubs[:30]]
 
     prompt = f"""You are a process engineer reviewing P&ID connectivity.
 
@@ -196,4 +416,4 @@ Return JSON:
 if __name__ == "__main__":
     import sys
     force = "--force" in sys.argv
-    build_supergraph(force=force)
+    build_supergraph(force=force, enrich="--enrich" in sys.argv)
@@ -0,0 +1,84 @@
+"""
+sync_backend.py — generates the backend's copies of modules shared with ingestion.
+
+The backend (talking-pnids-py) is deployed on its own and imports nothing
+from src/, so the modules both sides need are copied into backend/utils/:
+  ingestion/graph_store.py  binary CSR graph store
+  ingestion/embedding.py    embedding providers and row quantisation
+  ingestion/ann.py          IVF-flat ANN index
+  ingestion/tag_index.py    suffix-indexed fuzzy tag matcher
+  extractor/tags.py         tag type registries and regexes
+
+Each source carries one "Copied to backend/utils/<name>.py by sync_backend.py."
+line in its docstring; in the copy that line is replaced by a do-not-edit
+note naming the source, and the rest is byte for byte the same. Edit the
+source, then regenerate.
+
+Usage:
+  python sync_backend.py --emit     # regenerate the backend copies
+  python sync_backend.py --check    # exit 1 if any backend copy is stale
+"""
+
+import re
+import sys
+from pathlib import Path
+
+from config import REPO_ROOT
+
+SRC_DIR       = REPO_ROOT / "src"
+BACKEND_UTILS = SRC_DIR / "talking-pnids-py" / "backend" / "utils"
+
+SHARED = [
+    SRC_DIR / "ingestion" / "graph_store.py",
+    SRC_DIR / "ingestion" / "embedding.py",
+    SRC_DIR / "ingestion" / "ann.py",
+    SRC_DIR / "ingestion" / "tag_index.py",
+    SRC_DIR / "extractor" / "tags.py",
+]
+
+_NOTE_RE = re.compile(r"^Copied to backend/utils/(\S+\.py) by (?:ingestion/)?sync_backend\.py\.$", re.M)
+
+
+def generate_copy(source: Path) -> str:
+    """The backend copy of `source`: its text with the copy note turned into a generated header."""
+    text = source.read_text()
+    notes = _NOTE_RE.findall(text)
+    if notes != [source.name]:
+        raise ValueError(f"{source}: expected one 'Copied to backend/utils/{source.name} "
+                         f"by sync_backend.py.' line in the docstring")
+    rel = source.relative_to(SRC_DIR)
+    return _NOTE_RE.sub(
+        f"GENERATED from src/{rel} by src/ingestion/sync_backend.py — do not edit;\n"
+        f"regenerate with `python src/ingestion/sync_backend.py --emit`.",
+        text,
+    )
+
+
+def backend_path(source: Path) -> Path:
+    return BACKEND_UTILS / source.name
+
+
+def stale() -> list[Path]:
+    """Backend copies that are missing or differ from their generated text."""
+    return [backend_path(src) for src in SHARED
+            if not backend_path(src).exists() or backend_path(src).read_text() != generate_copy(src)]
+
+
+def emit() -> None:
+    for src in SHARED:
+        backend_path(src).write_text(generate_copy(src))
+        print(f"[sync] Wrote {backend_path(src).relative_to(SRC_DIR)} from {src.relative_to(SRC_DIR)}")
+
+
+if __name__ == "__main__":
+    if "--emit" in sys.argv:
+        emit()
+    elif "--check" in sys.argv:
+        paths = stale()
+        for path in paths:
+            print(f"[sync] {path.name} is stale — run: python sync_backend.py --emit")
+        if paths:
+            sys.exit(1)
+        print(f"[sync] {len(SHARED)} backend copies are current")
+    else:
+        print(__doc__)
@@ -0,0 +1,102 @@
+"""
+tag_index.py — suffix-indexed fuzzy tag matcher.
+
+Tags on a drawing and in reference lists differ by plant/unit prefixes and
+separators: PP01-362-LIT001, LIT-001 and LIT001 are the same instrument. Two
+tags match when their normalised forms are equal or one ends with the other.
+
+TagMatcher interns the normalised tags of a node list in a trie over the
+reversed strings, built once per graph. Walking a reversed reference:
+  - every tag that ends on the walked path is a suffix of the reference
+  - every tag below the last trie node has the reference as its suffix
+so a lookup costs O(len(ref)) instead of a regex + endswith pass over every
+node. Matches are returned in node order, the same node a linear scan finds.
+
+Copied to backend/utils/tag_index.py by sync_backend.py.
+"""
+
+import re
+
+_END = "$end"   # indices of items whose tag ends at this trie node
+_MIN = "$min"   # smallest item index anywhere below this trie node
+
+
+def normalize_tag(tag: str) -> str:
+    """Uppercase, separators removed: PP01-362-LIT 001 → PP01362LIT001."""
+    return re.sub(r"[\s\-_]", "", (tag or "").upper())
+
+
+class TagMatcher:
+    """
+    Index over `items` (node dicts by default) keyed by `key(item)`, normalised
+    with `normalize`. Items without a key, or whose key normalises to "", are
+    not indexed.
+    """
+
+    def __init__(self, items: list, key=lambda n: n.get("tag"), normalize=normalize_tag):
+        self.items = list(items)
+        self.normalize = normalize
+        self.by_norm: dict[str, list[int]] = {}
+        self._root: dict = {_MIN: len(self.items)}
+        for i, item in enumerate(self.items):
+            norm = normalize(key(item) or "")
+            if not norm:
+                continue
+            self.by_norm.setdefault(norm, []).append(i)
+            trie = self._root
+            trie[_MIN] = min(trie[_MIN], i)
+            for ch in reversed(norm):
+                trie = trie.setdefault(ch, {_MIN: i})
+                trie[_MIN] = min(trie[_MIN], i)
+            trie.setdefault(_END, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.by_norm)
+
+    def _walk(self, norm: str) -> tuple[list[int], dict | None]:
+        """(indices of tags that are suffixes of norm, trie node for norm or None)."""
+        suffixes: list[int] = []
+        trie = self._root
+        for ch in reversed(norm):
+            trie = trie.get(ch)
+            if trie is None:
+                return suffixes, None
+            suffixes.extend(trie.get(_END, ()))
+        return suffixes, trie
+
+    def exact(self, ref: str):
+        """First item whose normalised tag equals ref's, or None."""
+        hits = self.by_norm.get(self.normalize(ref or ""))
+        return self.items[hits[0]] if hits else None
+
+    def find(self, ref: str):
+        """First item (in list order) whose tag equals, ends with, or is a suffix of ref."""
+        norm = self.normalize(ref or "")
+        if not norm:
+            return None
+        suffixes, trie = self._walk(norm)
+        best = min(suffixes, default=len(self.items))
+        if trie is not None:
+            best = min(best, trie[_MIN])
+        return self.items[best] if best < len(self.items) else None
+
+    def find_all(self, ref: str) -> list:
+        """Every matching item, in list order."""
+        norm = self.normalize(ref or "")
+        if not norm:
+            return []
+        hits, trie = self._walk(norm)
+        hits = set(hits)
+        stack = [trie] if trie is not None else []
+        while stack:
+            t = stack.pop()
+            for ch, child in t.items():
+                if ch == _END:
+                    hits.update(child)
+                elif ch != _MIN:
+                    stack.append(child)
+        return [self.items[i] for i in sorted(hits)]
+
+    def lookup(self, ref: str):
+        """Exact match if there is one, else the first fuzzy match."""
+        return self.exact(ref) or self.find(ref)
@@ -3,7 +3,9 @@ validate.py — Step 5 of the ingestion pipeline.
 
 Cross-validates the pid.graph.v0.1.1 JSON against three sources:
   1. PID Data.xlsx  — structured ground truth (equipment specs, instrument tags,
-                       control loops, valve sizes) for the V001 KO drum system
+                       control loops, valve sizes) for the V001 KO drum system;
+                       only when config.VALIDATE_EXCEL — read once into a cached
+                       columnar snapshot
   2. OCR tag list   — catch hallucinated or missed tags
   3. Completeness rules — every vessel/PSV/valve/loop has required attributes
 
@@ -11,90 +13,144 @@ Outputs a confidence report JSON.
 Resume: skips if validation_report.json already exists.
 """
 
+import hashlib
 import json
 import re
 from pathlib import Path
 
-from config import pid_work_dir, save_json, load_json, load_ocr_tags, PID_DATA_XLSX, STRATEGY_VERSION
-
-# ─────────────────────────────────────────────────────────────────────────────
-
-def _normalize_tag(tag: str) -> str:
-    """Strip prefix variants: PP01-362-LIT001 → LIT001, also keep full form."""
-    return re.sub(r"[\s\-_]", "", (tag or "").upper())
-
-
-def _tag_matches(graph_tag: str, ref_tag: str) -> bool:
-    """
-    Fuzzy tag match: handles prefix variants.
-    PP01-362-LIT001 matches LIT001, LIT-001, PP01-362-LIT-001, etc.
-    """
-    if not graph_tag or not ref_tag:
-        return False
-    g = _normalize_tag(graph_tag)
-    r = _normalize_tag(ref_tag)
-    # Exact match
-    if g == r:
-        return True
-    # One ends with the other (prefix stripping)
-    return g.endswith(r) or r.endswith(g)
-
-
-def _find_node(nodes: list, ref_tag: str) -> dict | None:
-    """Find a node in the graph that matches ref_tag (with prefix flexibility)."""
-    for n in nodes:
-        if _tag_matches(n.get("tag", ""), ref_tag):
-            return n
-    return None
-
+from config import (
+    pid_work_dir, reference_cache_dir, save_json, load_json, load_ocr_tags,
+    PID_DATA_XLSX, VALIDATE_EXCEL, STRATEGY_VERSION,
+)
+from tag_index import TagMatcher, normalize_tag
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Section 1: Excel ground truth validation
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Sheet key → (worksheet, tag column). The tag column keys the per-sheet index.
+EXCEL_SHEETS = {
+    "equipment":       ("Eqpt",          "Equipment_Tag"),
+    "lines":           ("Line",          "Line_Tag"),
+    "field_gauges":    ("Field_Gauges",  "Field_Inst_Tag"),
+    "field_tx_dcs":    ("Field_TX_DCS",  "Field_TX_DCS_Tag"),
+    "field_tx_esd":    ("Field_TX_ESD",  "Field_TX_ESD_Tag"),
+    "dcs_controllers": ("DCS_CNTRLR",    "DCS_CNTRLR_Tag"),
+    "esd_controllers": ("ESD_CNTRLR",    "ESD_CNTRLR_Tag"),
+    "control_valves":  ("Control_Valve", "Control_Valve_Tag"),
+    "esd_valves":      ("ESD_Valve",     "ESD_Valve_Tag"),
+    "manual_valves":   ("Manual_Valve",  "Manual_Valve_Tag"),
+}
+EXCEL_SNAPSHOT_VERSION = 2
+_EXCEL_CACHE: dict = {}   # in-process: {"key": (mtime_ns, size), "gt": snapshot}
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cell(value):
+    """JSON-safe cell value (dates as ISO strings)."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _read_workbook(path: Path) -> dict:
+    """Stream every sheet of EXCEL_SHEETS (read-only mode) into columns + a tag index."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(str(path), read_only=True, data_only=True)
+    sheets, index = {}, {}
+    try:
+        for key, (sheet_name, tag_col) in EXCEL_SHEETS.items():
+            sheets[key] = {"columns": [], "data": {}, "rows": 0}
+            index[key] = {}
+            if sheet_name not in wb.sheetnames:
+                continue
+            rows = wb[sheet_name].iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            columns = [str(h).strip() if h else f"col_{i}" for i, h in enumerate(header)]
+            data = [[] for _ in columns]
+            n = 0
+            for row in rows:
+                if not any(v is not None for v in row):
+                    continue
+                for i in range(len(columns)):
+                    data[i].append(_cell(row[i]) if i < len(row) else None)
+                n += 1
+            sheets[key] = {"columns": columns, "data": dict(zip(columns, data)), "rows": n}
+            for i, tag in enumerate(sheets[key]["data"].get(tag_col, [])):
+                if tag not in (None, ""):
+                    index[key].setdefault(str(tag).strip(), []).append(i)
+    finally:
+        wb.close()
+    return {"sheets": sheets, "index": index}
+
+
 def _load_excel_ground_truth() -> dict | None:
     """
-    Load PID Data.xlsx into a structured dict.
+    Load PID Data.xlsx as a columnar snapshot:
+      {"sheets": {key: {"columns", "data": {column: [values]}, "rows"}},
+       "index":  {key: {tag: [rows]}}}
+    for the sheet keys in EXCEL_SHEETS. The workbook is parsed in read-only
+    (streaming) mode once; the snapshot is cached on disk keyed by the file's
+    mtime/size, falling back to its SHA-256 when only the mtime moved, and kept
+    in memory for the rest of the process.
     Returns None if file not found or openpyxl not installed.
-
-    Schema mirrors the Excel sheets:
-      equipment, lines, field_gauges, field_tx_dcs, field_tx_esd,
-      dcs_controllers, esd_controllers, control_valves, esd_valves, manual_valves
     """
     if not PID_DATA_XLSX.exists():
         return None
-    try:
-        import openpyxl
-    except ImportError:
-        print("[validate] WARNING: openpyxl not installed, skipping Excel validation")
-        return None
-
-    wb = openpyxl.load_workbook(str(PID_DATA_XLSX))
-
-    def sheet_to_dicts(sheet_name: str) -> list[dict]:
-        ws = wb[sheet_name]
-        rows = list(ws.iter_rows(values_only=True))
-        if len(rows) < 2:
-            return []
-        headers = [str(h).strip() if h else f"col_{i}" for i, h in enumerate(rows[0])]
-        result = []
-        for row in rows[1:]:
-            if any(v is not None for v in row):
-                result.append({headers[i]: row[i] for i in range(len(headers))})
-        return result
-
-    return {
-        "equipment":       sheet_to_dicts("Eqpt"),
-        "lines":           sheet_to_dicts("Line"),
-        "field_gauges":    sheet_to_dicts("Field_Gauges"),
-        "field_tx_dcs":    sheet_to_dicts("Field_TX_DCS"),
-        "field_tx_esd":    sheet_to_dicts("Field_TX_ESD"),
-        "dcs_controllers": sheet_to_dicts("DCS_CNTRLR"),
-        "esd_controllers": sheet_to_dicts("ESD_CNTRLR"),
-        "control_valves":  sheet_to_dicts("Control_Valve"),
-        "esd_valves":      sheet_to_dicts("ESD_Valve"),
-        "manual_valves":   sheet_to_dicts("Manual_Valve"),
-    }
+    st = PID_DATA_XLSX.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    if _EXCEL_CACHE.get("key") == key:
+        return _EXCEL_CACHE["gt"]
+
+    cache_path = reference_cache_dir() / "pid_data.snapshot.json"
+    snapshot = load_json(cache_path) if cache_path.exists() else None
+    if snapshot and snapshot.get("version") != EXCEL_SNAPSHOT_VERSION:
+        snapshot = None
+    if snapshot:
+        src = snapshot["source"]
+        if (src["mtime_ns"], src["size"]) != key:
+            if src["sha256"] != _file_sha256(PID_DATA_XLSX):
+                snapshot = None
+            else:   # touched, not changed
+                src["mtime_ns"], src["size"] = key
+                save_json(cache_path, snapshot)
+
+    if snapshot is None:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            print("[validate] WARNING: openpyxl not installed, skipping Excel validation")
+            return None
+        snapshot = {
+            "version": EXCEL_SNAPSHOT_VERSION,
+            "source": {"name": PID_DATA_XLSX.name, "mtime_ns": key[0], "size": key[1],
+                       "sha256": _file_sha256(PID_DATA_XLSX)},
+            **_read_workbook(PID_DATA_XLSX),
+        }
+        save_json(cache_path, snapshot)
+        print(f"[validate] Excel snapshot rebuilt: "
+              f"{sum(s['rows'] for s in snapshot['sheets'].values())} rows → {cache_path.name}")
+
+    _EXCEL_CACHE.update(key=key, gt=snapshot)
+    return snapshot
+
+
+def _records(gt: dict, key: str):
+    """(tag, row dict) for every tagged row of a sheet, in sheet order (repeated tags included)."""
+    data = gt["sheets"].get(key, {}).get("data", {})
+    rows = sorted((i, tag) for tag, rows in gt["index"].get(key, {}).items() for i in rows)
+    for i, tag in rows:
+        yield tag, {col: values[i] for col, values in data.items()}
 
 
 def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dict]:
@@ -106,11 +162,12 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
     warnings = []
     found = {}
     missing = {}
+    # Fuzzy tag lookup: PP01-362-LIT001 matches LIT001, LIT-001, PP01-362-LIT-001, etc.
+    matcher = TagMatcher(nodes)
 
     # ── Equipment specs ───────────────────────────────────────────────────────
-    for eqpt in gt.get("equipment", []):
-        tag = eqpt.get("Equipment_Tag", "")
-        node = _find_node(nodes, tag)
+    for tag, eqpt in _records(gt, "equipment"):
+        node = matcher.find(tag)
         if not node:
             issues.append({
                 "rule": "excel_equipment_missing",
@@ -162,24 +219,21 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
 
     # ── Instruments (field gauges + DCS transmitters + ESD transmitters) ──────
     all_instruments = (
-        [(r, "Field_Inst_Tag",    "field_gauge")    for r in gt.get("field_gauges", [])] +
-        [(r, "Field_TX_DCS_Tag",  "dcs_transmitter") for r in gt.get("field_tx_dcs", [])] +
-        [(r, "Field_TX_ESD_Tag",  "esd_transmitter") for r in gt.get("field_tx_esd", [])]
+        [(tag, "field_gauge")     for tag, _ in _records(gt, "field_gauges")] +
+        [(tag, "dcs_transmitter") for tag, _ in _records(gt, "field_tx_dcs")] +
+        [(tag, "esd_transmitter") for tag, _ in _records(gt, "field_tx_esd")]
     )
-    for row, tag_col, kind in all_instruments:
-        tag = row.get(tag_col, "")
-        if not tag:
-            continue
+    for tag, kind in all_instruments:
         # Handle compound tags like LZT002A/B/C — split and check each
         sub_tags = [t.strip() for t in re.split(r"[/,]", tag)]
         base = sub_tags[0]
         # Check for the base tag or any variant
-        node = _find_node(nodes, base)
+        node = matcher.find(base)
         if not node and len(sub_tags) > 1:
             for st in sub_tags[1:]:
                 # Try appending suffix to base stem
                 stem = re.sub(r"[A-Z]$", "", base)
-                node = _find_node(nodes, stem + st) or _find_node(nodes, st)
+                node = matcher.find(stem + st) or matcher.find(st)
                 if node:
                     break
         if not node:
@@ -194,11 +248,10 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
             found[tag] = node["id"]
 
     # ── Controllers ───────────────────────────────────────────────────────────
-    for row in gt.get("dcs_controllers", []):
-        tag     = row.get("DCS_CNTRLR_Tag", "")
+    for tag, row in _records(gt, "dcs_controllers"):
         inp     = row.get("DCS_CNTRLR_Input", "")
         out     = row.get("DCS_CNTRLR_Output", "")
-        node    = _find_node(nodes, tag)
+        node    = matcher.find(tag)
         if not node:
             issues.append({
                 "rule": "excel_dcs_controller_missing",
@@ -210,8 +263,8 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
         else:
             found[tag] = node["id"]
             # Check loop wiring: input and output should exist and be connected
-            in_node  = _find_node(nodes, inp)
-            out_node = _find_node(nodes, out)
+            in_node  = matcher.find(inp)
+            out_node = matcher.find(out)
             if not in_node:
                 warnings.append({
                     "rule": "excel_loop_input_missing",
@@ -225,9 +278,8 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
                     "message": f"Controller {tag} output {out} not found in graph",
                 })
 
-    for row in gt.get("esd_controllers", []):
-        tag  = row.get("ESD_CNTRLR_Tag", "")
-        node = _find_node(nodes, tag)
+    for tag, _ in _records(gt, "esd_controllers"):
+        node = matcher.find(tag)
         if not node:
             issues.append({
                 "rule": "excel_esd_controller_missing",
@@ -241,16 +293,13 @@ def _validate_excel(nodes: list, edges: list, gt: dict) -> tuple[list, list, dic
 
     # ── Valves (control, ESD, manual) ─────────────────────────────────────────
     all_valves = (
-        [(r, "Control_Valve_Tag", "Control_Valve__Size_Process", "control_valve") for r in gt.get("control_valves", [])] +
-        [(r, "ESD_Valve_Tag",     "ESD_Valve__Size_Process",     "esd_valve")     for r in gt.get("esd_valves", [])] +
-        [(r, "Manual_Valve_Tag",  "Manual_Valve__Size_Process",  "manual_valve")  for r in gt.get("manual_valves", [])]
+        [(r, "Control_Valve__Size_Process", "control_valve") for r in _records(gt, "control_valves")] +
+        [(r, "ESD_Valve__Size_Process",     "esd_valve")     for r in _records(gt, "esd_valves")] +
+        [(r, "Manual_Valve__Size_Process",  "manual_valve")  for r in _records(gt, "manual_valves")]
     )
-    for row, tag_col, size_col, kind in all_valves:
-        tag      = row.get(tag_col, "")
+    for (tag, row), size_col, kind in all_valves:
         exp_size = row.get(size_col, "")
-        if not tag:
-            continue
-        node = _find_node(nodes, tag)
+        node = matcher.find(tag)
         if not node:
             issues.append({
                 "rule": f"excel_{kind}_missing",
@@ -294,8 +343,8 @@ def _validate_ocr(nodes: list, pid_id: str) -> tuple[list, list, dict]:
     issues = []
     warnings = []
     ocr_tags = load_ocr_tags(pid_id)
-    graph_tags = {_normalize_tag(n["tag"]): n for n in nodes if n.get("tag")}
-    ocr_norm   = {_normalize_tag(t): t for t in ocr_tags if t.strip()}
+    graph_tags = {normalize_tag(n["tag"]): n for n in nodes if n.get("tag")}
+    ocr_norm   = {normalize_tag(t): t for t in ocr_tags if t.strip()}
 
     confirmed_tags = []
     missed_in_graph = []
@@ -338,83 +387,125 @@ def _validate_ocr(nodes: list, pid_id: str) -> tuple[list, list, dict]:
 # Section 3: Completeness rules
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _validate_completeness(nodes: list, edges: list) -> tuple[list, list]:
+# Each rule: which nodes it applies to (`types` dispatch + optional `when`
+# predicate over the precomputed node view), what they must carry (`props`
+# and top-level `fields`; `any` = one of them is enough), a severity and
+# where it is reported. "each" rules report per node; "summary" rules report
+# one entry with the number of offending nodes (`count`) and their list,
+# capped at `max_items`. Templates get {label} {tag} {id} {missing} {count}.
+COMPLETENESS_RULES = [
+    {
+        "rule": "vessel_conditions", "severity": "high", "level": "issue",
+        "types": {"equipment"}, "when": lambda v: "vessel" in v["subtype"],
+        "props": ("design_pressure", "design_temp", "op_pressure", "op_temp"),
+        "report": "each", "message": "Vessel {tag} missing: {missing}",
+    },
+    {
+        "rule": "psv_attributes", "severity": "high", "level": "issue",
+        "when": lambda v: "PSV" in v["tag"] or "psv" in v["subtype"] or "relief" in v["subtype"],
+        "props": ("set_pressure", "size_code"),
+        "report": "each", "message": "PSV {tag} missing: {missing}",
+    },
+    {
+        "rule": "valve_normal_position", "severity": "medium", "level": "warning",
+        "types": {"valve"}, "props": ("normal_position", "fail_position"), "any": True,
+        "report": "summary", "item": "tag", "max_items": 30,
+        "message": "{count} valves missing normal/fail position",
+    },
+    {
+        "rule": "spec_break_attributes", "severity": "medium", "level": "warning",
+        "when": lambda v: bool(v["props"].get("spec_change")),
+        "props": ("from_spec", "to_spec"),
+        "report": "each", "message": "Spec break node {id} missing from_spec or to_spec",
+    },
+    {
+        "rule": "terminator_ref", "severity": "medium", "level": "warning",
+        "types": {"terminator"}, "fields": ("off_page_ref",),
+        "report": "summary", "item": "id",
+        "message": "{count} terminators missing off_page_ref",
+    },
+]
+
+
+def _compile_rules(rules: list[dict]) -> tuple[dict[str, list[dict]], list[dict]]:
+    """Dispatch table: node type → rules restricted to it, plus rules for every type."""
+    by_type: dict[str, list[dict]] = {}
+    generic = []
+    for rule in rules:
+        for t in rule.get("types") or ():
+            by_type.setdefault(t, []).append(rule)
+        if not rule.get("types"):
+            generic.append(rule)
+    return by_type, generic
+
+
+_RULES_BY_TYPE, _RULES_GENERIC = _compile_rules(COMPLETENESS_RULES)
+
+
+def validate_completeness(nodes: list, edges: list) -> tuple[list, list]:
+    """
+    One pass over the nodes: each node's type/subtype/tag keys are computed
+    once and only the rules registered for its type (plus the generic ones)
+    are evaluated. Control-loop completeness is grouped in the same pass.
+    """
     issues = []
     warnings = []
+    hits: dict[str, list] = {}        # rule → per-node entries ("each") or items ("summary")
+    loop_map: dict[str, list] = {}
+    rules_for: dict = {}
 
-    # Every vessel must have design/op pressure + temp
-    vessels = [n for n in nodes if n.get("type") == "equipment" and
-               "vessel" in (n.get("subtype") or "").lower()]
-    for v in vessels:
-        props = v.get("props", {})
-        missing = [f for f in ("design_pressure", "design_temp", "op_pressure", "op_temp")
-                   if not props.get(f)]
-        if missing:
-            issues.append({
-                "rule": "vessel_conditions",
-                "severity": "high",
-                "message": f"Vessel {v.get('tag','?')} missing: {', '.join(missing)}",
-                "node_id": v["id"],
-            })
+    for n in nodes:
+        ntype = n.get("type")
+        view = {
+            "type": ntype,
+            "subtype": (n.get("subtype") or "").lower(),
+            "tag": (n.get("tag") or "").upper(),
+            "props": n.get("props") or {},
+        }
+        if n.get("loop_id"):
+            loop_map.setdefault(n["loop_id"], []).append(n)
 
-    # Every PSV must have set_pressure and size_code
-    psvs = [n for n in nodes if "PSV" in (n.get("tag") or "").upper() or
-            "psv" in (n.get("subtype") or "").lower() or
-            "relief" in (n.get("subtype") or "").lower()]
-    for psv in psvs:
-        props = psv.get("props", {})
-        missing = [f for f in ("set_pressure", "size_code") if not props.get(f)]
-        if missing:
-            issues.append({
-                "rule": "psv_attributes",
-                "severity": "high",
-                "message": f"PSV {psv.get('tag','?')} missing: {', '.join(missing)}",
-                "node_id": psv["id"],
-            })
+        rules = rules_for.get(ntype)
+        if rules is None:
+            rules = rules_for[ntype] = _RULES_BY_TYPE.get(ntype, []) + _RULES_GENERIC
+        for rule in rules:
+            when = rule.get("when")
+            if when and not when(view):
+                continue
+            required = [(f, view["props"]) for f in rule.get("props", ())] + \
+                       [(f, n) for f in rule.get("fields", ())]
+            missing = [f for f, src in required if not src.get(f)]
+            if not missing or (rule.get("any") and len(missing) < len(required)):
+                continue
+            if rule["report"] == "summary":
+                item = (n.get("tag") or n["id"]) if rule.get("item") == "tag" else n["id"]
+                hits.setdefault(rule["rule"], []).append(item)
+            else:
+                hits.setdefault(rule["rule"], []).append({
+                    "rule": rule["rule"],
+                    "severity": rule["severity"],
+                    "message": rule["message"].format(
+                        tag=n.get("tag", "?"), id=n["id"], missing=", ".join(missing)),
+                    "node_id": n["id"],
+                })
 
-    # Every valve should have normal_position
-    valves = [n for n in nodes if n.get("type") == "valve"]
-    valves_missing_pos = [
-        v.get("tag") or v["id"] for v in valves
-        if not (v.get("props") or {}).get("normal_position")
-        and not (v.get("props") or {}).get("fail_position")
-    ]
-    if valves_missing_pos:
-        warnings.append({
-            "rule": "valve_normal_position",
-            "severity": "medium",
-            "message": f"{len(valves_missing_pos)} valves missing normal/fail position",
-            "items": valves_missing_pos[:30],
-        })
-
-    # Spec break nodes should have from_spec and to_spec
-    spec_break_nodes = [n for n in nodes if (n.get("props") or {}).get("spec_change")]
-    for sb in spec_break_nodes:
-        props = sb.get("props", {})
-        if not props.get("from_spec") or not props.get("to_spec"):
-            warnings.append({
-                "rule": "spec_break_attributes",
-                "severity": "medium",
-                "message": f"Spec break node {sb['id']} missing from_spec or to_spec",
-                "node_id": sb["id"],
+    for rule in COMPLETENESS_RULES:
+        found = hits.get(rule["rule"])
+        if not found:
+            continue
+        out = issues if rule["level"] == "issue" else warnings
+        if rule["report"] == "summary":
+            out.append({
+                "rule": rule["rule"],
+                "severity": rule["severity"],
+                "message": rule["message"].format(count=len(found)),
+                "count": len(found),
+                "items": found[:rule["max_items"]] if rule.get("max_items") else found,
             })
-
-    # Terminators should have off_page_ref
-    terminators = [n for n in nodes if n.get("type") == "terminator"]
-    term_missing = [t["id"] for t in terminators if not t.get("off_page_ref")]
-    if term_missing:
-        warnings.append({
-            "rule": "terminator_ref",
-            "severity": "medium",
-            "message": f"{len(term_missing)} terminators missing off_page_ref",
-            "items": term_missing,
-        })
+        else:
+            out.extend(found)
 
     # Control loops: transmitter + controller + output valve
-    loop_map: dict[str, list] = {}
-    for n in nodes:
-        if n.get("loop_id"):
-            loop_map.setdefault(n["loop_id"], []).append(n)
     for loop_id, members in loop_map.items():
         has_valve = any(n.get("type") == "valve" for n in members)
         has_instrument = any(n.get("type") == "instrument" for n in members)
@@ -453,8 +544,16 @@ def validate_graph(pid_id: str, graph: dict, force: bool = False) -> dict:
     all_issues   = []
     all_warnings = []
 
-    # ── 1. Excel ground truth (DISABLED — not yet validated as correct) ─────
-    # Functions kept for future use. Not run, not included in report.
+    # ── 1. Excel ground truth (off by default — not yet validated as correct) ─
+    excel_summary = None
+    if VALIDATE_EXCEL:
+        gt = _load_excel_ground_truth()
+        if gt:
+            e_issues, e_warnings, excel_summary = _validate_excel(nodes, edges, gt)
+            all_issues   += e_issues
+            all_warnings += e_warnings
+            print(f"[validate] Excel: {excel_summary['found_in_graph']} of "
+                  f"{excel_summary['total_reference_tags']} reference tags found")
 
     # ── 2. OCR cross-reference ────────────────────────────────────────────────
     o_issues, o_warnings, ocr_summary = _validate_ocr(nodes, pid_id)
@@ -466,7 +565,7 @@ def validate_graph(pid_id: str, graph: dict, force: bool = False) -> dict:
               f"{ocr_summary['extra_in_graph']} unconfirmed")
 
     # ── 3. Completeness rules ─────────────────────────────────────────────────
-    c_issues, c_warnings = _validate_completeness(nodes, edges)
+    c_issues, c_warnings = validate_completeness(nodes, edges)
     all_issues   += c_issues
     all_warnings += c_warnings
 
@@ -499,6 +598,7 @@ def validate_graph(pid_id: str, graph: dict, force: bool = False) -> dict:
             "terminators": len([n for n in nodes if n.get("type") == "terminator"]),
         },
         "ocr_validation": ocr_summary,
+        **({"excel_validation": excel_summary} if excel_summary else {}),
         "confidence_score": round(confidence, 1),
         "high_issues":   high_issues,
         "medium_issues": medium_issues,
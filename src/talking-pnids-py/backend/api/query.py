@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from utils.config import load_config, load_prompts
 from utils.markdown_cache import cache
@@ -10,7 +11,7 @@ from utils.langchain_setup import (
     get_openai_client,
     invoke_with_reasoning,
 )
-from utils.graph_tools import load_graph, run_graph_agent
+from utils.graph_tools import load_graph, load_store, run_graph_agent
 from utils import rag_retriever
 
 router = APIRouter()
@@ -40,7 +41,9 @@ async def process_query(request: QueryRequest):
         use_graph = "graph" in sources
         use_rag   = "rag" in sources
 
-        graph = load_graph(pid_id) if (pid_id and use_graph) else None
+        # A cold or newly registered graph is built on first use (store, GraphIndex):
+        # load it in the threadpool, like the agent call below, not on the event loop
+        has_graph = bool(pid_id and use_graph and await run_in_threadpool(load_store, pid_id))
         # For supergraph queries, RAG should search all chunks (no pid filter)
         rag_pid_filter = None if pid_id == "supergraph" else pid_id
 
@@ -50,12 +53,12 @@ async def process_query(request: QueryRequest):
         # tool_use agent for supergraph so it can query all P&IDs iteratively.
         is_reasoning = model_name.startswith(("o1", "o3", "gpt-5")) and pid_id != "supergraph"
 
-        if graph and not is_reasoning:
+        if has_graph and not is_reasoning:
             # RAG retrieval (silently skipped if index not built yet)
             rag_context = ""
             rag_sources = []
-            if use_rag and rag_retriever.is_available() and api_key:
-                chunks = rag_retriever.retrieve(request.query, rag_pid_filter, api_key, k=4)
+            if use_rag and rag_retriever.is_available():
+                chunks = await rag_retriever.aretrieve(request.query, rag_pid_filter, api_key, k=4)
                 rag_context = rag_retriever.format_for_prompt(chunks)
                 rag_sources = [c["source"] for c in chunks]
 
@@ -72,7 +75,9 @@ async def process_query(request: QueryRequest):
                 elif isinstance(m, AIMessage):
                     session_msgs.append({"role": "assistant", "content": m.content})
 
-            answer, tool_sources = run_graph_agent(
+            # Blocking model calls and tool traversals: keep them off the event loop
+            answer, tool_sources = await run_in_threadpool(
+                run_graph_agent,
                 client=client,
                 model=model_name,
                 pid_id=pid_id,
@@ -95,7 +100,8 @@ async def process_query(request: QueryRequest):
 
         # ── Reasoning model path (o1, o3, gpt-5.x) ───────────────────────────
         # Inject compact graph JSON + RAG as context — no tool_use
-        if graph and is_reasoning:
+        if has_graph and is_reasoning:
+            graph = await run_in_threadpool(load_graph, pid_id)
             import json as _json
 
             compact_nodes = [
@@ -113,8 +119,8 @@ async def process_query(request: QueryRequest):
             )
 
             rag_context = ""
-            if use_rag and rag_retriever.is_available() and api_key:
-                chunks = rag_retriever.retrieve(request.query, rag_pid_filter, api_key, k=4)
+            if use_rag and rag_retriever.is_available():
+                chunks = await rag_retriever.aretrieve(request.query, rag_pid_filter, api_key, k=4)
                 if chunks:
                     rag_context = "ENGINEERING NOTES:\n" + rag_retriever.format_for_prompt(chunks) + "\n\n"
 
@@ -151,8 +157,8 @@ async def process_query(request: QueryRequest):
                 context = f"P&ID Documentation ({len(cache.markdowns)} systems):\n\n" + "".join(parts)
 
         # Augment with RAG even in fallback mode if available
-        if use_rag and rag_retriever.is_available() and pid_id and api_key:
-            chunks = rag_retriever.retrieve(request.query, pid_id, api_key, k=3)
+        if use_rag and rag_retriever.is_available() and pid_id:
+            chunks = await rag_retriever.aretrieve(request.query, pid_id, api_key, k=3)
             if chunks:
                 context += "\nEngineering Notes:\n" + rag_retriever.format_for_prompt(chunks) + "\n\n"
 
@@ -6,6 +6,9 @@ import os
 from dotenv import load_dotenv
 
 from api import files, session, query, pdf
+from utils import rag_retriever
+from utils.artifacts import registry
+from utils.graph_tools import register_graphs
 
 load_dotenv()
 
@@ -48,6 +51,22 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    return {"rag": rag_retriever.metrics(), "artifacts": registry.status()}
+
+@app.on_event("startup")
+async def watch_artifacts():
+    # Preload the RAG index and graphs in the background, then hot-reload them
+    # when ingestion rewrites data/rag or data/graphs
+    register_graphs()
+    registry.start()
+
+@app.on_event("shutdown")
+async def save_caches():
+    registry.stop()
+    rag_retriever.save_query_cache()
+
 @app.get("/debug/paths")
 async def debug_paths():
     """Debug endpoint to check paths"""
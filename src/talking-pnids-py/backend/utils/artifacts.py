@@ -0,0 +1,158 @@
+"""
+artifacts.py — versioned registry of data artifacts that ingestion rewrites.
+
+The RAG index (data/rag) and the graph stores (data/graphs) are registered
+under a name with a loader and the files they are read from. A version is the
+(size, mtime) fingerprint of those files. get() returns the current version's
+value; a value is immutable once published, so a request that took it keeps
+a consistent view until it finishes, even if a newer version is swapped in
+meanwhile.
+
+start() runs a daemon thread that loads every registered artifact once (so
+the first request does not pay for it) and then polls the fingerprints every
+ARTIFACT_POLL_SECONDS (default 2). A changed artifact is loaded on that
+thread once its files have stopped changing for one poll (ingestion writes
+several files), then published with a single assignment; requests keep
+being served from the old version until then. A load that fails keeps the
+old version and is retried when the files change again.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+POLL_SECONDS = float(os.getenv("ARTIFACT_POLL_SECONDS", "2"))
+
+
+def fingerprint(paths: list[Path]) -> tuple:
+    """(path, size, mtime_ns) of each file; None for files that do not exist."""
+    out = []
+    for path in paths:
+        try:
+            st = path.stat()
+            out.append((str(path), st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            out.append((str(path), None))
+    return tuple(out)
+
+
+class Version:
+    """One loaded version of an artifact."""
+
+    def __init__(self, value: Any, fingerprint: tuple, number: int):
+        self.value = value
+        self.fingerprint = fingerprint
+        self.number = number
+        self.loaded_at = time.time()
+
+
+class ArtifactRegistry:
+    def __init__(self, poll_seconds: float = POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._specs: dict[str, tuple[Callable[[], Any], Callable[[], list[Path]]]] = {}
+        self._current: dict[str, Version] = {}
+        self._failed: dict[str, tuple] = {}      # name → fingerprint whose load failed
+        self._pending: dict[str, tuple] = {}     # name → changed fingerprint seen last poll
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, name: str, load: Callable[[], Any], sources: Callable[[], list[Path]]) -> None:
+        """Register (or keep) an artifact: `load()` builds its value from the files `sources()` lists."""
+        with self._lock:
+            if name not in self._specs:
+                self._specs[name] = (load, sources)
+                self._locks[name] = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def get(self, name: str) -> Any:
+        """Current value of a registered artifact, loading it on first use."""
+        version = self._current.get(name)
+        if version is None:
+            with self._locks[name]:
+                version = self._current.get(name)
+                if version is None:
+                    load, sources = self._specs[name]
+                    fp = fingerprint(sources())
+                    version = self._publish(name, load(), fp)
+        return version.value
+
+    def version(self, name: str) -> int:
+        version = self._current.get(name)
+        return version.number if version else 0
+
+    def _publish(self, name: str, value: Any, fp: tuple) -> Version:
+        old = self._current.get(name)
+        version = Version(value, fp, (old.number if old else 0) + 1)
+        self._current[name] = version   # single assignment: readers see old or new
+        self._failed.pop(name, None)
+        return version
+
+    # ── Reloading ─────────────────────────────────────────────────────────────
+
+    def refresh(self) -> list[str]:
+        """Reload every loaded artifact whose files changed; returns the names swapped."""
+        swapped = []
+        for name in list(self._specs):
+            version = self._current.get(name)
+            if version is None:
+                continue
+            load, sources = self._specs[name]
+            fp = fingerprint(sources())
+            if fp == version.fingerprint or fp == self._failed.get(name):
+                self._pending.pop(name, None)
+                continue
+            if self._pending.get(name) != fp:
+                self._pending[name] = fp    # still being written? load on the next poll
+                continue
+            del self._pending[name]
+            with self._locks[name]:
+                try:
+                    value = load()
+                except Exception as e:
+                    self._failed[name] = fp
+                    print(f"Warning: reloading {name} failed, keeping version "
+                          f"{version.number}: {e}")
+                    continue
+                # Files changed again while loading: publish, the next poll catches up
+                self._publish(name, value, fp)
+            swapped.append(name)
+        return swapped
+
+    def _watch(self) -> None:
+        for name in list(self._specs):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Warning: preloading {name} failed: {e}")
+        while not self._stop.wait(self.poll_seconds):
+            for name in self.refresh():
+                print(f"Reloaded {name} (version {self.version(name)})")
+
+    def start(self) -> None:
+        """Preload registered artifacts and watch them for changes in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="artifact-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "version": v.number,
+                "loaded_at": round(v.loaded_at, 3),
+                "reload_failed": name in self._failed,
+            }
+            for name, v in sorted(self._current.items())
+        }
+
+
+registry = ArtifactRegistry()
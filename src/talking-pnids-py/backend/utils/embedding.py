@@ -0,0 +1,180 @@
+"""
+embedding.py — embedding providers for the RAG index and its queries.
+
+The index records which provider built it (manifest.json "embedder"), and the
+backend embeds queries with the same one, so query and chunk vectors are
+always comparable.
+
+  openai  — text-embedding-3-small through the OpenAI API (1536 dims)
+  local   — hashed TF-IDF on CPU: word unigrams + bigrams hashed (crc32) into
+            LOCAL_DIM buckets, sublinear tf × idf, L2-normalised. The idf is
+            fitted on the corpus when the index is first built and then frozen
+            in embedder.npz next to the index, so incremental builds and
+            queries stay in the same space. No network, no model download;
+            a query embeds in well under a millisecond.
+
+Index vectors are stored L2-normalised, as float16 or as int8 with one scale
+per row (quantize / dequantize), so the backend scores with a single dot
+product per row and maps the matrix from disk at a half or a quarter of the
+float32 size. Rows are grouped by pid tag set; manifest.json "partitions"
+maps each tag to its row ranges (partition_rows) so a filtered query scores
+only those rows.
+
+GENERATED from src/ingestion/embedding.py by src/ingestion/sync_backend.py — do not edit;
+regenerate with `python src/ingestion/sync_backend.py --emit`.
+"""
+
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+PROVIDERS    = ("openai", "local")
+STORAGE      = ("float16", "int8", "float32")
+OPENAI_MODEL = "text-embedding-3-small"
+OPENAI_DIM   = 1536
+LOCAL_MODEL  = "hashed-tfidf"
+LOCAL_DIM    = 4096
+LOCAL_FILE   = "embedder.npz"
+
+# Words, keeping tag-like tokens together (hv-0059, 20"-pp01-361, 2.5)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+class OpenAIEmbedder:
+    """
+    Remote embeddings; one API call per batch of texts. Keep one instance per
+    key: its clients hold the keep-alive connection pools.
+    """
+
+    def __init__(self, api_key: str, model: str = OPENAI_MODEL):
+        from openai import OpenAI
+        self.api_key = api_key
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self._async_client = None
+
+    def info(self) -> dict:
+        return {"provider": "openai", "model": self.model, "dim": OPENAI_DIM}
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        """embed() through an AsyncOpenAI client, created on first use."""
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self.api_key)
+        response = await self._async_client.embeddings.create(model=self.model, input=texts)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+class HashedTfidfEmbedder:
+    """Local embeddings: hashed word n-gram TF-IDF. fit() once, then embed()."""
+
+    def __init__(self, dim: int = LOCAL_DIM, idf: np.ndarray | None = None):
+        self.dim = dim
+        self.idf = idf
+
+    def info(self) -> dict:
+        return {"provider": "local", "model": LOCAL_MODEL, "dim": self.dim}
+
+    def _buckets(self, text: str) -> np.ndarray:
+        words = _TOKEN_RE.findall(text.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        # Tags also match without separators: hv-0059 ↔ hv0059
+        grams += [re.sub(r"[-./]", "", w) for w in words if re.search(r"[-./]", w)]
+        return np.array([zlib.crc32(g.encode()) % self.dim for g in grams], dtype=np.int64)
+
+    def fit(self, texts: list[str]) -> "HashedTfidfEmbedder":
+        df = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            df[np.unique(self._buckets(text))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if self.idf is None:
+            raise ValueError("HashedTfidfEmbedder is not fitted")
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(out, texts):
+            buckets, counts = np.unique(self._buckets(text), return_counts=True)
+            row[buckets] = (1 + np.log(counts)) * self.idf[buckets]
+            norm = np.linalg.norm(row)
+            if norm:
+                row /= norm
+        return out
+
+    def save(self, file) -> None:
+        """Write the fitted model (a path or binary file object; LOCAL_FILE in the index dir)."""
+        np.savez(file, idf=self.idf)
+
+    @classmethod
+    def load(cls, directory: Path) -> "HashedTfidfEmbedder":
+        with np.load(directory / LOCAL_FILE) as data:
+            idf = data["idf"]
+        return cls(dim=len(idf), idf=idf)
+
+
+# ── Storage ───────────────────────────────────────────────────────────────────
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Float32 copy with every row scaled to unit length (zero rows stay zero)."""
+    out = np.asarray(matrix, dtype=np.float32).copy()
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """(stored matrix, per-row scales or None) for normalised float32 rows."""
+    if dtype == "float32":
+        return matrix.astype(np.float32), None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = (np.abs(matrix).max(axis=1) / 127).astype(np.float32)
+        safe = np.where(scales > 0, scales, 1)[:, None]
+        return np.round(matrix / safe).astype(np.int8), scales
+    raise ValueError(f"unknown embedding storage {dtype!r} (expected one of {STORAGE})")
+
+
+def dequantize(stored: np.ndarray, scales: np.ndarray | None) -> np.ndarray:
+    out = np.asarray(stored, dtype=np.float32)
+    return out * scales[:, None] if scales is not None else out
+
+
+def partition_rows(chunks: list[dict]) -> dict[str, list[list[int]]]:
+    """
+    Row ranges [start, stop) of the chunks carrying each pid tag ("global"
+    included), adjacent ranges merged. rag.py orders chunks by tag set, so
+    most tags come out as a single range.
+    """
+    parts: dict[str, list[list[int]]] = {}
+    for i, c in enumerate(chunks):
+        for tag in c.get("pid_tags", []):
+            ranges = parts.setdefault(tag, [])
+            if ranges and ranges[-1][1] == i:
+                ranges[-1][1] = i + 1
+            else:
+                ranges.append([i, i + 1])
+    return parts
+
+
+def legacy_info() -> dict:
+    """Provider of an index built before the manifest recorded one."""
+    return {"provider": "openai", "model": OPENAI_MODEL, "dim": OPENAI_DIM}
+
+
+def load_embedder(info: dict, index_dir: Path, api_key: str | None = None):
+    """The embedder that built an index, from its manifest entry."""
+    provider = info.get("provider", "openai")
+    if provider == "local":
+        return HashedTfidfEmbedder.load(index_dir)
+    if provider == "openai":
+        if not api_key:
+            raise ValueError("the RAG index was built with OpenAI embeddings — an API key is needed")
+        return OpenAIEmbedder(api_key, info.get("model", OPENAI_MODEL))
+    raise ValueError(f"unknown embedding provider {provider!r} (expected one of {PROVIDERS})")
@@ -0,0 +1,208 @@
+"""
+graph_index.py — in-memory lookup tables over one graph store, built once per version.
+
+graph_store.py keeps a graph compact and memory-mapped: string columns are
+int32 ids into a string table, lookups probe a hash table and decode the
+strings they compare. That is cheap for one lookup but adds up when a tool
+touches every node (search_nodes decoded three strings per node per call)
+or walks thousands of edges. GraphIndex decodes the string table once and
+keeps:
+  by_tag / by_id     normalised tag → node, id → node (first occurrence)
+  by_type            node type → node indices
+  adjacency          per edge kind and direction, CSR as Python lists
+  edge_between       (from, to) → edge index
+  matcher            TagMatcher for prefix variants (LIT001 ↔ PP01-362-LIT-001),
+                     consulted only for tag-like references (tag_variants)
+
+links() merges adjacency into the per-node neighbour lists a traversal walks
+(graph_traversal.py); it and other derived tables are built on first use and
+kept for the life of the version.
+
+It is built when graph_tools loads a graph version (on the artifact
+watcher's thread), so tool calls only read it.
+"""
+
+import re
+
+import numpy as np
+
+from utils.graph_store import GraphStore, norm_tag
+from utils.tag_index import TagMatcher
+
+NODE_COLUMNS   = ("id", "tag", "tag_norm", "type", "subtype", "service")
+SEARCH_COLUMNS = ("tag_norm", "service", "subtype")
+MIN_VARIANT_TAG = 6      # a normalised tag this long (LIT001) may match its prefix variants
+
+_TAG_CODE_RE = re.compile(r"[A-Z]{1,5}\d+[A-Z]?$")   # ends in a letter code and number: LIT001, V001A
+
+
+class GraphIndex:
+    def __init__(self, store: GraphStore):
+        self.store = store
+        self.n_nodes = store.n_nodes
+        self.kinds = store.kinds
+        self._derived: dict = {}
+
+        # String table and node columns, decoded once
+        blob = store.array("strings.blob").tobytes()
+        offsets = store.array("strings.offsets").tolist()
+        self.strings: list[str] = [blob[a:b].decode() for a, b in zip(offsets, offsets[1:])]
+        self._columns = {col: store.array(f"node.{col}") for col in NODE_COLUMNS}
+        self._values: dict[str, list[str | None]] = {
+            col: [self.strings[s] if s >= 0 else None for s in arr.tolist()]
+            for col, arr in self._columns.items()
+        }
+
+        self.by_tag: dict[str, int] = {}
+        self.by_id: dict[str, int] = {}
+        for i, (tag, nid) in enumerate(zip(self._values["tag_norm"], self._values["id"])):
+            if tag:
+                self.by_tag.setdefault(tag, i)
+            if nid:
+                self.by_id.setdefault(nid, i)
+
+        types = self._columns["type"]
+        self.by_type: dict[str, np.ndarray] = {}
+        order = np.argsort(types, kind="stable")
+        sids, starts = np.unique(types[order], return_index=True)
+        for sid, rows in zip(sids.tolist(), np.split(order, starts[1:])):
+            if sid >= 0:
+                self.by_type[self.strings[sid]] = rows
+
+        # (indptr, nbr, edge) per (kind, direction)
+        self.adjacency: dict[tuple[str, str], tuple[list[int], list[int], list[int]]] = {}
+        for kind in self.kinds:
+            for direction in ("out", "in"):
+                prefix = f"csr.{kind}.{direction}"
+                self.adjacency[kind, direction] = (
+                    store.array(f"{prefix}.indptr").tolist(),
+                    store.array(f"{prefix}.nbr").tolist(),
+                    store.array(f"{prefix}.edge").tolist(),
+                )
+
+        self.edge_between: dict[tuple[int, int], int] = {}
+        src, dst = store.array("edge.src").tolist(), store.array("edge.dst").tolist()
+        for ei, pair in enumerate(zip(src, dst)):
+            if pair[0] >= 0 and pair[1] >= 0:
+                self.edge_between.setdefault(pair, ei)
+
+        # tag_norm is already normalised; norm_tag is applied to the references looked up
+        self.matcher = TagMatcher(range(self.n_nodes), key=self._values["tag_norm"].__getitem__,
+                                  normalize=norm_tag)
+
+        # Distinct values of each searched column (service / subtype lowercased) joined
+        # into one NUL-separated text, so a substring search is one scan in C
+        self._search: dict[str, tuple[np.ndarray, str, np.ndarray]] = {}
+        for col in SEARCH_COLUMNS:
+            sids = np.unique(self._columns[col])
+            sids = sids[sids >= 0]
+            values = [self.strings[s] for s in sids.tolist()]
+            if col != "tag_norm":
+                values = [v.lower() for v in values]
+            starts = np.cumsum([0] + [len(v) + 1 for v in values[:-1]])
+            self._search[col] = (sids, "\0".join(values), starts)
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def value(self, i: int, column: str) -> str | None:
+        return self._values[column][i]
+
+    def label(self, i: int) -> str | None:
+        """Tag of node i, or its id when it has none."""
+        return self.value(i, "tag") or self.value(i, "id")
+
+    def find_tag(self, tag: str) -> int | None:
+        """Node whose normalised tag equals tag's, else None."""
+        return self.by_tag.get(norm_tag(tag or ""))
+
+    def tag_variants(self, tag: str) -> list[int]:
+        """
+        Nodes (ascending) whose tag is a prefix variant of `tag`: one ends with
+        the other (LIT001 ↔ PP01-362-LIT-001). Both must be tag-like — at least
+        MIN_VARIANT_TAG characters ending in a letter code and number — so a
+        bare number ('27') or a short fragment matches nothing.
+        """
+        def tag_like(norm: str | None) -> bool:
+            return bool(norm) and len(norm) >= MIN_VARIANT_TAG and bool(_TAG_CODE_RE.search(norm))
+
+        if not tag_like(norm_tag(tag or "")):
+            return []
+        return [i for i in self.matcher.find_all(tag) if tag_like(self._values["tag_norm"][i])]
+
+    def find_id(self, node_id: str) -> int | None:
+        return self.by_id.get(node_id)
+
+    def nodes_of_type(self, node_type: str, subtype_prefix: str | None = None) -> list[int]:
+        """Indices (ascending) of nodes of a type, optionally with a subtype prefix."""
+        rows = self.by_type.get(node_type)
+        if rows is None:
+            return []
+        if subtype_prefix:
+            sids = self._search["subtype"][0]
+            match = np.zeros(len(self.strings) + 1, dtype=bool)   # last slot: null (-1)
+            match[[s for s in sids.tolist() if self.strings[s].startswith(subtype_prefix)]] = True
+            rows = rows[match[self._columns["subtype"][rows]]]
+        return rows.tolist()
+
+    def neighbors(self, i: int, kind: str, direction: str = "out") -> tuple[list[int], list[int]]:
+        """(neighbour node indices, edge indices) of node i over `kind` edges."""
+        adj = self.adjacency.get((kind, direction))
+        if adj is None:
+            return [], []
+        indptr, nbr, edge = adj
+        a, b = indptr[i], indptr[i + 1]
+        return nbr[a:b], edge[a:b]
+
+    def derived(self, key, build):
+        """build(), computed once per key for this version (a race only builds it twice)."""
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = build()
+        return value
+
+    def links(self, steps: tuple[tuple[str, str], ...]) -> tuple[list[list[int]], list[list[int]]]:
+        """
+        (neighbours, edges) of every node over `steps` — (kind, direction) pairs,
+        concatenated in that order: links((("process", "out"), ("process", "in")))
+        follows process edges either way.
+        """
+        def build():
+            nbrs: list[list[int]] = [[] for _ in range(self.n_nodes)]
+            edges: list[list[int]] = [[] for _ in range(self.n_nodes)]
+            for step in steps:
+                if step not in self.adjacency:
+                    continue
+                indptr, nbr, edge = self.adjacency[step]
+                for i in range(self.n_nodes):
+                    a, b = indptr[i], indptr[i + 1]
+                    if a != b:
+                        nbrs[i] += nbr[a:b]
+                        edges[i] += edge[a:b]
+            return nbrs, edges
+        return self.derived(("links", steps), build)
+
+    def edge(self, a: int, b: int) -> int | None:
+        """Index of an edge a → b, else b → a, else None."""
+        ei = self.edge_between.get((a, b))
+        return ei if ei is not None else self.edge_between.get((b, a))
+
+    def search(self, query: str, limit: int | None = None) -> list[int]:
+        """
+        Nodes (in node order, the first `limit` if given) whose normalised tag
+        contains the normalised query, or whose service or subtype contains it
+        (case-insensitive).
+        """
+        wanted = {"tag_norm": norm_tag(query or ""),
+                  "service": (query or "").lower(), "subtype": (query or "").lower()}
+        hit = np.zeros(self.n_nodes, dtype=bool)
+        for col, needle in wanted.items():
+            if not needle or "\0" in needle:
+                continue
+            sids, text, starts = self._search[col]
+            positions = [m.start() for m in re.finditer(re.escape(needle), text)]
+            if not positions:
+                continue
+            match = np.zeros(len(self.strings) + 1, dtype=bool)   # last slot: null (-1)
+            match[sids[np.searchsorted(starts, positions, side="right") - 1]] = True
+            hit |= match[self._columns[col]]
+        return np.flatnonzero(hit)[:limit].tolist()
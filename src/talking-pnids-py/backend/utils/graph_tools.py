@@ -1,25 +1,44 @@
 """
 graph_tools.py — P&ID graph query tools for the LLM agent.
 
-Loads pid.graph.v0.1.1 JSON files and implements five tools:
+Queries pid.graph.v0.1.1 graphs through their binary stores (graph_store.py:
+string columns, CSR adjacency per edge kind, id/tag hash indexes, all
+memory-mapped) and the GraphIndex built over each one (graph_index.py:
+tag/id/type dicts, adjacency lists, edge lookup), and implements five tools:
   get_node       — full node details by tag
   list_nodes     — all nodes of a given type
-  find_path      — shortest process path between two tags
+  find_path      — shortest process path between two tags (plus alternatives)
   impact_region  — all components reachable from a tag
   search_nodes   — fuzzy tag / service search
 
 Also provides:
   build_tool_definitions() — OpenAI tool_use schema
-  execute_tool()           — dispatch tool calls to implementations
+  execute_tool()           — dispatch tool calls to implementations, each under a ToolBudget
   run_graph_agent()        — full tool_use loop (max 5 iterations)
-  load_graph()             — load + cache graph JSON by pid_id
+  load_store()             — memory-mapped binary graph store by pid_id
+  load_graph()             — the same graph as a dict, for whole-document callers
+  register_graphs()        — put every graph in data/graphs under the artifact registry
+
+Each P&ID's graph is an artifact (utils/artifacts.py) named "graph:<pid_id>",
+watched through its JSON files: re-running ingestion swaps a new LoadedGraph
+in without a restart. The tools take either a pid_id, looked up once for that
+call, or a LoadedGraph: run_graph_agent takes one at its start and passes it
+to every tool call, so a request (and the cursors it pages with) sees a
+single version even if a newer one is swapped in meanwhile.
 """
 
 import json
-import re
+import tempfile
 from pathlib import Path
 from typing import Any
-from functools import lru_cache
+
+from utils.artifacts import registry
+from utils.graph_index import GraphIndex
+from utils.graph_store import GraphStore, merge_supergraph, open_store, store_path, write_store
+from utils.graph_traversal import (COST_SCHEMES, bfs, bidirectional_bfs, edge_costs,
+                                   k_shortest_paths)
+from utils.pid_graph_validator import repair_graph
+from utils.tool_budget import ToolBudget
 
 # ── Path resolution ───────────────────────────────────────────────────────────
 
@@ -29,168 +48,232 @@ def _graphs_dir() -> Path:
     return Path(__file__).resolve().parents[2] / "data" / "graphs"
 
 
-@lru_cache(maxsize=10)
-def load_graph(pid_id: str) -> dict | None:
-    """Load and cache a pid.graph.v0.1.1 JSON by pid_id.
-    When pid_id == 'supergraph', merges all three P&ID graphs into one flat
-    nodes+edges structure so all existing tools work transparently.
-    Returns None if not found.
+def _read_graph(path: Path) -> dict:
+    """Read a pid.graph JSON and run the compiled repair pass over it.
+    Fixes applied (dangling tag-named endpoints, unknown layers, duplicate ids, …)
+    are kept on the graph under `_repairs`.
     """
+    graph, repairs = repair_graph(json.loads(path.read_text()))
+    if repairs:
+        graph["_repairs"] = repairs
+    return graph
+
+
+def _json_path(pid_id: str) -> Path:
+    name = "supergraph.json" if pid_id == "supergraph" else f"{pid_id}.graph.json"
+    return _graphs_dir() / name
+
+
+# ── Binary store ──────────────────────────────────────────────────────────────
+
+def _build_store(pid_id: str) -> GraphStore | None:
+    """Write the store ingestion would have written (next to the JSON, or in the
+    temp dir when data/graphs is read-only) and open it."""
+    path = _json_path(pid_id)
     if pid_id == "supergraph":
-        return _load_merged_supergraph()
-    path = _graphs_dir() / f"{pid_id}.graph.json"
-    if not path.exists():
-        return None
-    return json.loads(path.read_text())
-
-
-def _load_merged_supergraph() -> dict | None:
-    """Flatten all individual P&ID graphs into one nodes+edges structure.
-    The supergraph.json is a summary file — actual nodes/edges live in the
-    individual pid-XXX.graph.json files. We load each of those and merge them.
-    Node/edge IDs are prefixed with pid_id: to avoid collisions.
-    inter_pid_edges use 'pid-007::node_id' format for cross-P&ID connections.
-    """
-    sg_path = _graphs_dir() / "supergraph.json"
-    if not sg_path.exists():
-        return None
-    sg = json.loads(sg_path.read_text())
-    pids_list = list(sg.get("pid_graphs", {}).keys())
-
-    merged_nodes: list[dict] = []
-    merged_edges: list[dict] = []
-    # Maps original node id → prefixed id, per pid
-    id_maps: dict[str, dict[str, str]] = {}
-
-    for pid in pids_list:
-        graph_path = _graphs_dir() / f"{pid}.graph.json"
-        if not graph_path.exists():
-            continue
-        subgraph = json.loads(graph_path.read_text())
-        prefix = pid + ":"
-        id_map: dict[str, str] = {}
-        for n in subgraph.get("nodes", []):
-            new_id = prefix + n["id"]
-            id_map[n["id"]] = new_id
-            merged_nodes.append({**n, "id": new_id, "_pid": pid})
-        id_maps[pid] = id_map
-        for e in subgraph.get("edges", []):
-            merged_edges.append({
-                **e,
-                "from": id_map.get(e.get("from", ""), prefix + e.get("from", "")),
-                "to":   id_map.get(e.get("to",   ""), prefix + e.get("to",   "")),
-                "_pid": pid,
-            })
+        sg = json.loads(path.read_text())
+        sub_paths = [_json_path(pid) for pid in sg.get("pid_graphs", {})]
+        graph = merge_supergraph(
+            sg, lambda pid: _read_graph(_json_path(pid)) if _json_path(pid).exists() else None)
+        sources = [path] + [p for p in sub_paths if p.exists()]
+    else:
+        graph, sources = _read_graph(path), [path]
+    out = store_path(path)
+    try:
+        write_store(graph, out, sources)
+    except OSError:
+        out = Path(tempfile.gettempdir()) / "pid-graph-stores" / out.name
+        out.parent.mkdir(parents=True, exist_ok=True)
+        write_store(graph, out, sources)
+    return open_store(out, _graphs_dir())
+
+
+def _open_store(pid_id: str) -> GraphStore:
+    """The .bin ingestion wrote when it still matches its JSON; otherwise built from the JSON."""
+    path = _json_path(pid_id)
+    for candidate in (store_path(path),
+                      Path(tempfile.gettempdir()) / "pid-graph-stores" / store_path(path).name):
+        store = open_store(candidate, _graphs_dir())
+        if store is not None:
+            return store
+    return _build_store(pid_id)
+
+
+class LoadedGraph:
+    """One version of a P&ID graph: its store and GraphIndex, plus the dict form on demand."""
+
+    def __init__(self, pid_id: str, store: GraphStore):
+        self.pid_id = pid_id
+        self.store = store
+        self.index = GraphIndex(store)
+        self._graph: dict | None = None
+        # Build the neighbour lists the tools walk now, off the request path
+        for steps in _tool_steps(self.index.kinds):
+            self.index.links(steps)
+        for scheme in COST_SCHEMES:
+            edge_costs(self.index, scheme)
+
+    def graph(self) -> dict:
+        if self._graph is None:
+            self._graph = self.store.to_graph()
+        return self._graph
+
+
+def _tool_steps(kinds: list[str]) -> list[tuple[tuple[str, str], ...]]:
+    """Every (kind, direction) step set find_path and impact_region traverse."""
+    impact = [k for k in IMPACT_KINDS if k in kinds]
+    return [_path_steps(kinds), _path_steps(kinds, reverse=True),
+            tuple((k, "out") for k in impact), tuple((k, "in") for k in impact)]
+
+
+def _graph_sources(pid_id: str) -> list[Path]:
+    """Files a graph version is read from (the supergraph merges every P&ID graph)."""
+    if pid_id == "supergraph":
+        return [_json_path(pid_id)] + sorted(_graphs_dir().glob("*.graph.json"))
+    return [_json_path(pid_id)]
+
+
+def _register(pid_id: str) -> str:
+    name = f"graph:{pid_id}"
+    registry.register(
+        name,
+        lambda: LoadedGraph(pid_id, _open_store(pid_id)) if _json_path(pid_id).exists() else None,
+        lambda: _graph_sources(pid_id),
+    )
+    return name
+
 
-    # Add cross-P&ID edges — format: "pid-007::node_id"
-    for ie in sg.get("inter_pid_edges", []):
-        def _resolve(ref: str) -> str | None:
-            if "::" in ref:
-                pid, orig_id = ref.split("::", 1)
-                return id_maps.get(pid, {}).get(orig_id)
+def register_graphs() -> None:
+    """Register every graph in data/graphs, so the registry preloads and watches them."""
+    for path in sorted(_graphs_dir().glob("*.graph.json")):
+        _register(path.name[:-len(".graph.json")])
+    if _json_path("supergraph").exists():
+        _register("supergraph")
+
+
+def _loaded(pid_id: str) -> LoadedGraph | None:
+    """Current version of pid_id's graph ('supergraph' = all P&IDs merged), or None."""
+    name = f"graph:{pid_id}"
+    if name not in registry:
+        if not pid_id or not _json_path(pid_id).exists():
             return None
-        src_id = _resolve(ie.get("from", ""))
-        dst_id = _resolve(ie.get("to",   ""))
-        if src_id and dst_id:
-            merged_edges.append({
-                "from":     src_id,
-                "to":       dst_id,
-                "kind":     ie.get("kind", "process"),
-                "line_tag": ie.get("props", {}).get("line_tag"),
-                "_inter_pid": True,
-            })
+        _register(pid_id)
+    return registry.get(name)
 
-    return {
-        "schema_version": "pid.graph.v0.1.1",
-        "metadata": {
-            "pid_id":      "supergraph",
-            "description": f"Merged supergraph: {', '.join(pids_list)}",
-        },
-        "nodes": merged_nodes,
-        "edges": merged_edges,
-        "_supergraph": True,
-        "_pids": pids_list,
-        "_stats": {"nodes": len(merged_nodes), "edges": len(merged_edges)},
-    }
+
+def _graph(graph: str | LoadedGraph) -> LoadedGraph | None:
+    """graph itself, or the current version of the pid_id it names."""
+    return graph if isinstance(graph, LoadedGraph) else _loaded(graph)
+
+
+def load_store(pid_id: str) -> GraphStore | None:
+    """Memory-mapped binary store for pid_id ('supergraph' = all P&IDs merged).
+    Returns None if there is no graph.
+    """
+    g = _loaded(pid_id)
+    return g.store if g is not None else None
+
+
+def load_graph(pid_id: str) -> dict | None:
+    """The pid.graph.v0.1.1 graph for pid_id as a dict.
+    When pid_id == 'supergraph', all P&ID graphs merged into one flat
+    nodes+edges structure (utils.graph_store.merge_supergraph).
+    The tools below query the store directly; this is for callers that
+    need the whole document. Returns None if not found.
+    """
+    g = _loaded(pid_id)
+    return g.graph() if g is not None else None
 
 
-@lru_cache(maxsize=2)
 def load_supergraph() -> dict | None:
     path = _graphs_dir() / "supergraph.json"
     return json.loads(path.read_text()) if path.exists() else None
 
 
-def graph_summary(pid_id: str) -> str:
+def graph_summary(graph: str | LoadedGraph) -> str:
     """One-line summary for system prompt context."""
-    g = load_graph(pid_id)
+    g = _graph(graph)
     if not g:
-        return f"No graph available for {pid_id}."
-    n = len(g.get("nodes", []))
-    e = len(g.get("edges", []))
+        return f"No graph available for {graph}."
+    pid_id, store = g.pid_id, g.store
+    n, e = store.n_nodes, store.n_edges
     if pid_id == "supergraph":
-        pids = g.get("_pids", [])
+        pids = store.meta.get("_pids", [])
         return f"supergraph ({', '.join(pids)}): {n} nodes, {e} edges across all P&IDs"
-    meta = g.get("metadata", {})
+    meta = store.meta.get("metadata", {})
     area = meta.get("area") or meta.get("unit") or ""
     return f"{pid_id}: {n} nodes, {e} edges{f', {area}' if area else ''}"
 
 
 # ── Node helpers ──────────────────────────────────────────────────────────────
 
-def _normalize_tag(tag: str) -> str:
-    return re.sub(r"[\s\-]", "", tag.upper()) if tag else ""
-
-
-def _node_by_tag(nodes: list[dict], tag: str) -> dict | None:
-    norm = _normalize_tag(tag)
-    for n in nodes:
-        if _normalize_tag(n.get("tag", "")) == norm:
-            return n
-    return None
+MAX_CANDIDATES = 10   # prefix variants listed when a tag is ambiguous
 
 
-def _node_by_id(nodes: list[dict], nid: str) -> dict | None:
-    for n in nodes:
-        if n.get("id") == nid:
-            return n
-    return None
+def _node_by_tag(g: LoadedGraph, tag: str, by_id: bool = False) -> tuple[int | None, list[dict]]:
+    """
+    (index of the node with this tag, []): an exact tag, else (with by_id) a
+    node id, else the only prefix variant (LIT001 ↔ PP01-362-LIT-001). When
+    none matches, (None, the id and tag of each ambiguous variant — empty if none).
+    """
+    i = g.index.find_tag(tag)
+    if i is None and by_id:
+        i = g.index.find_id(tag)
+    if i is not None:
+        return i, []
+    variants = g.index.tag_variants(tag)
+    if len(variants) == 1:
+        return variants[0], []
+    return None, [{"id": g.index.value(v, "id"), "tag": g.index.value(v, "tag")}
+                  for v in variants[:MAX_CANDIDATES]]
+
+
+def _tag_error(message: str, tag: str, candidates: list[dict]) -> dict:
+    """Error for a tag that was not found, listing the candidates when it was ambiguous."""
+    if not candidates:
+        return {"error": message}
+    return {"error": f"Tag '{tag}' matches several components; call again with the exact tag",
+            "candidates": candidates}
 
 
 # ── Tool implementations ──────────────────────────────────────────────────────
 
-def get_node(pid_id: str, tag: str) -> dict:
-    g = load_graph(pid_id)
+def get_node(graph: str | LoadedGraph, tag: str) -> dict:
+    g = _graph(graph)
     if not g:
-        return {"error": f"Graph not found for {pid_id}"}
-    node = _node_by_tag(g["nodes"], tag)
-    if not node:
-        # Try searching by id
-        node = _node_by_id(g["nodes"], tag)
-    if not node:
-        return {"error": f"No node with tag '{tag}' in {pid_id}"}
-    return node
-
-
-def list_nodes(pid_id: str, node_type: str, subtype_filter: str | None = None) -> list[dict]:
-    g = load_graph(pid_id)
+        return {"error": f"Graph not found for {graph}"}
+    i, candidates = _node_by_tag(g, tag, by_id=True)
+    if i is None:
+        return _tag_error(f"No node with tag '{tag}' in {g.pid_id}", tag, candidates)
+    return g.store.node(i)
+
+
+def _paged(results: list, truncated: dict | None) -> list | dict:
+    """A complete list as is; a partial one with its truncation metadata."""
+    return results if truncated is None else {"results": results, "truncated": truncated}
+
+
+def list_nodes(graph: str | LoadedGraph, node_type: str, subtype_filter: str | None = None,
+               cursor: int = 0, budget: ToolBudget | None = None) -> list[dict] | dict:
+    g = _graph(graph)
     if not g:
-        return [{"error": f"Graph not found for {pid_id}"}]
-    results = []
-    for n in g["nodes"]:
-        if n.get("type") != node_type:
-            continue
-        if subtype_filter and not (n.get("subtype", "") or "").startswith(subtype_filter):
-            continue
+        return [{"error": f"Graph not found for {graph}"}]
+    budget = budget or ToolBudget.from_env()
+
+    def summary(i: int) -> dict:
+        n = g.store.node(i)
         # Return a compact summary (not full props) to save tokens
-        results.append({
+        return {
             "id":      n.get("id"),
             "tag":     n.get("tag"),
             "subtype": n.get("subtype"),
             "service": n.get("service"),
             "status":  n.get("status"),
             "props_summary": _props_summary(n.get("props", {})),
-        })
-    return results
+        }
+
+    return _paged(*budget.page(g.index.nodes_of_type(node_type, subtype_filter), cursor,
+                               render=summary))
 
 
 def _props_summary(props: dict) -> dict:
@@ -198,157 +281,165 @@ def _props_summary(props: dict) -> dict:
     return {k: v for k, v in props.items() if v not in (None, "", [], {})}
 
 
-def find_path(pid_id: str, from_tag: str, to_tag: str) -> dict:
-    """Find shortest path between two tags using BFS on process/signal edges."""
-    g = load_graph(pid_id)
-    if not g:
-        return {"error": f"Graph not found for {pid_id}"}
-
-    nodes = g["nodes"]
-    edges = g["edges"]
-
-    from_node = _node_by_tag(nodes, from_tag)
-    to_node   = _node_by_tag(nodes, to_tag)
-
-    if not from_node:
-        return {"error": f"Tag '{from_tag}' not found"}
-    if not to_node:
-        return {"error": f"Tag '{to_tag}' not found"}
-
-    # Build adjacency (bidirectional for process edges)
-    adj: dict[str, list[str]] = {}
-    for e in edges:
-        src, dst = e.get("from", ""), e.get("to", "")
-        adj.setdefault(src, []).append(dst)
-        if e.get("kind") in ("process", "signal"):
-            adj.setdefault(dst, []).append(src)  # bidirectional
-
-    # BFS
-    start = from_node["id"]
-    end   = to_node["id"]
-    visited = {start}
-    queue = [[start]]
-
-    while queue:
-        path = queue.pop(0)
-        last = path[-1]
-        if last == end:
-            # Resolve node ids to tags
-            tag_path = []
-            for nid in path:
-                n = _node_by_id(nodes, nid)
-                tag_path.append(n.get("tag") or nid if n else nid)
-            # Find edges along path
-            edge_details = []
-            for i in range(len(path) - 1):
-                for e in edges:
-                    if (e.get("from") == path[i] and e.get("to") == path[i+1]) or \
-                       (e.get("to") == path[i] and e.get("from") == path[i+1]):
-                        edge_details.append({
-                            "line_tag":   e.get("line_tag"),
-                            "pipe_class": e.get("pipe_class"),
-                            "diameter":   e.get("diameter"),
-                            "kind":       e.get("kind"),
-                        })
-                        break
-            return {"path": tag_path, "hops": len(tag_path) - 1, "edges": edge_details}
-
-        for neighbour in adj.get(last, []):
-            if neighbour not in visited:
-                visited.add(neighbour)
-                queue.append(path + [neighbour])
-
-    return {"error": f"No path found between '{from_tag}' and '{to_tag}'"}
-
-
-def impact_region(pid_id: str, tag: str, direction: str = "both", depth: int = 3) -> dict:
-    """Return all nodes within `depth` hops from `tag` via process/signal edges."""
-    g = load_graph(pid_id)
+SEARCH_PAGE = 20     # search_nodes results per page
+IMPACT_KINDS = ("process", "signal", "impulse")
+
+# find_path follows every edge forwards, process and signal edges also backwards
+_BOTH_WAYS = ("process", "signal")
+MAX_ALTERNATIVES = 3
+
+
+def _path_steps(kinds: list[str], reverse: bool = False) -> tuple[tuple[str, str], ...]:
+    """find_path's (kind, direction) steps; reverse=True gives the same links walked backwards."""
+    fwd, bwd = ("in", "out") if reverse else ("out", "in")
+    steps = []
+    for kind in kinds:
+        steps.append((kind, fwd))
+        if kind in _BOTH_WAYS:
+            steps.append((kind, bwd))
+    return tuple(steps)
+
+
+def _describe_path(g: LoadedGraph, nodes: list[int], edges: list[int]) -> dict:
+    edge_details = []
+    for ei in edges:
+        e = g.store.edge(ei)
+        edge_details.append({
+            "line_tag":   e.get("line_tag"),
+            "pipe_class": e.get("pipe_class"),
+            "diameter":   e.get("diameter"),
+            "kind":       e.get("kind"),
+        })
+    tag_path = [g.index.label(i) for i in nodes]
+    return {"path": tag_path, "hops": len(tag_path) - 1, "edges": edge_details}
+
+
+def find_path(graph: str | LoadedGraph, from_tag: str, to_tag: str, prefer: str = "hops",
+              alternatives: int = 0, budget: ToolBudget | None = None) -> dict:
+    """
+    Path between two tags. prefer='hops' is the fewest-hop path (bidirectional
+    BFS); 'main_line' the cheapest by edge kind and pipe diameter (Dijkstra).
+    alternatives > 0 adds up to that many next-best paths (Yen).
+    """
+    g = _graph(graph)
     if not g:
-        return {"error": f"Graph not found for {pid_id}"}
-
-    nodes = g["nodes"]
-    edges = g["edges"]
-
-    origin = _node_by_tag(nodes, tag)
-    if not origin:
-        return {"error": f"Tag '{tag}' not found"}
-
-    # Build directed adjacency
-    downstream: dict[str, list[str]] = {}
-    upstream:   dict[str, list[str]] = {}
-    for e in edges:
-        if e.get("kind") not in ("process", "signal", "impulse"):
-            continue
-        src, dst = e.get("from", ""), e.get("to", "")
-        downstream.setdefault(src, []).append(dst)
-        upstream.setdefault(dst, []).append(src)
-
-    def bfs(start_id: str, adj: dict, max_depth: int) -> list[dict]:
-        visited = {start_id}
-        queue = [(start_id, 0)]
-        found = []
-        while queue:
-            nid, d = queue.pop(0)
-            if d >= max_depth:
-                continue
-            for nb in adj.get(nid, []):
-                if nb not in visited:
-                    visited.add(nb)
-                    n = _node_by_id(nodes, nb)
-                    if n:
-                        found.append({
-                            "tag":    n.get("tag") or nb,
-                            "type":   n.get("type"),
-                            "subtype":n.get("subtype"),
-                            "service":n.get("service"),
-                            "hops":   d + 1,
-                        })
-                    queue.append((nb, d + 1))
-        return found
-
-    start_id = origin["id"]
-    result = {"origin": tag, "depth": depth}
+        return {"error": f"Graph not found for {graph}"}
+    index = g.index
+
+    start, start_candidates = _node_by_tag(g, from_tag)
+    end,   end_candidates   = _node_by_tag(g, to_tag)
+
+    if start is None:
+        return _tag_error(f"Tag '{from_tag}' not found", from_tag, start_candidates)
+    if end is None:
+        return _tag_error(f"Tag '{to_tag}' not found", to_tag, end_candidates)
+    if prefer not in COST_SCHEMES:
+        return {"error": f"Unknown path preference '{prefer}' (use one of {', '.join(COST_SCHEMES)})"}
+
+    budget = budget or ToolBudget.from_env()
+    links = index.links(_path_steps(index.kinds))
+    reverse = index.links(_path_steps(index.kinds, reverse=True))
+    try:
+        alternatives = max(0, min(int(alternatives or 0), MAX_ALTERNATIVES))
+    except (TypeError, ValueError):
+        alternatives = 0
+    if prefer == "hops" and not alternatives:
+        route = bidirectional_bfs(links, reverse, start, end, budget=budget)
+        routes = [route] if route else []
+    else:
+        routes = k_shortest_paths(links, start, end, 1 + alternatives,
+                                  edge_costs(index, prefer), reverse, budget)
+
+    if not routes:
+        if budget.exhausted:
+            return {"error": f"Path search between '{from_tag}' and '{to_tag}' stopped "
+                             f"before finding a path", "truncated": budget.report()}
+        return {"error": f"No path found between '{from_tag}' and '{to_tag}'"}
+    result = _describe_path(g, routes[0][1], routes[0][2])
+    if alternatives:
+        result["alternatives"] = [_describe_path(g, nodes, edges) for _, nodes, edges in routes[1:]]
+    if budget.exhausted:
+        result["truncated"] = budget.report()
+    return result
 
-    if direction in ("downstream", "both"):
-        result["downstream"] = bfs(start_id, downstream, depth)
-    if direction in ("upstream", "both"):
-        result["upstream"] = bfs(start_id, upstream, depth)
 
+def impact_region(graph: str | LoadedGraph, tag: str, direction: str = "both", depth: int = 3,
+                  cursor: int = 0, budget: ToolBudget | None = None) -> dict:
+    """
+    Return all nodes within `depth` hops from `tag` via process/signal/impulse
+    edges. Depth, nodes visited and the size of each list are bounded by the
+    budget; `truncated` says which limit was hit and `cursor` pages the lists.
+    """
+    g = _graph(graph)
+    if not g:
+        return {"error": f"Graph not found for {graph}"}
+    index = g.index
+    budget = budget or ToolBudget.from_env()
+
+    origin, candidates = _node_by_tag(g, tag)
+    if origin is None:
+        return _tag_error(f"Tag '{tag}' not found", tag, candidates)
+
+    kinds = [k for k in IMPACT_KINDS if k in index.kinds]
+    depth, clamped = budget.clamp_depth(depth)
+    directions = [d for d in ("downstream", "upstream") if direction in (d, "both")]
+    truncated = {"depth": clamped} if clamped else {}
+
+    def describe(i: int, hops: dict) -> dict:
+        return {
+            "tag":    index.label(i),
+            "type":   index.value(i, "type"),
+            "subtype":index.value(i, "subtype"),
+            "service":index.value(i, "service"),
+            "hops":   hops[i],
+        }
+
+    result = {"origin": tag, "depth": depth}
+    for name in directions:
+        tree = bfs(index.links(tuple((k, "out" if name == "downstream" else "in") for k in kinds)),
+                   origin, depth, budget)
+        hops = {i: d for i, (_, _, d) in tree.items()}
+        result[name], page = budget.page(
+            [i for i in tree if i != origin], cursor,
+            render=lambda i: describe(i, hops), max_chars=budget.max_chars // len(directions))
+        if page:
+            truncated[name] = page
+    if budget.exhausted:
+        truncated["search"] = budget.report()
+    if truncated:
+        result["truncated"] = truncated
     return result
 
 
-def search_nodes(pid_id: str, query: str) -> list[dict]:
+def search_nodes(graph: str | LoadedGraph, query: str, cursor: int = 0,
+                 budget: ToolBudget | None = None) -> list[dict] | dict:
     """Fuzzy search nodes by tag prefix or service keyword."""
-    g = load_graph(pid_id)
+    g = _graph(graph)
     if not g:
-        return [{"error": f"Graph not found for {pid_id}"}]
-
-    q_norm = _normalize_tag(query)
-    q_lower = query.lower()
-    results = []
-
-    for n in g["nodes"]:
-        tag_norm    = _normalize_tag(n.get("tag", ""))
-        service     = (n.get("service") or "").lower()
-        subtype     = (n.get("subtype") or "").lower()
-
-        if (q_norm and q_norm in tag_norm) or \
-           (q_lower and q_lower in service) or \
-           (q_lower and q_lower in subtype):
-            results.append({
-                "id":      n.get("id"),
-                "tag":     n.get("tag"),
-                "type":    n.get("type"),
-                "subtype": n.get("subtype"),
-                "service": n.get("service"),
-            })
+        return [{"error": f"Graph not found for {graph}"}]
+    index = g.index
+    budget = budget or ToolBudget.from_env()
+
+    def summary(i: int) -> dict:
+        return {
+            "id":      index.value(i, "id"),
+            "tag":     index.value(i, "tag"),
+            "type":    index.value(i, "type"),
+            "subtype": index.value(i, "subtype"),
+            "service": index.value(i, "service"),
+        }
 
-    return results[:20]  # cap at 20 results
+    # Tag contains the normalised query, or service / subtype contain it (any case)
+    return _paged(*budget.page(index.search(query), cursor, limit=SEARCH_PAGE, render=summary))
 
 
 # ── OpenAI tool_use definitions ───────────────────────────────────────────────
 
+_CURSOR_PARAM = {
+    "type": "integer",
+    "description": "Only to continue a result marked 'truncated': pass its next_cursor",
+}
+
 TOOL_DEFINITIONS = [
     {
         "type": "function",
@@ -393,7 +484,8 @@ TOOL_DEFINITIONS = [
                     "subtype_filter": {
                         "type": "string",
                         "description": "Optional: filter by subtype prefix, e.g. 'valve.gate', 'instrument.pressure', 'valve.spectacle'"
-                    }
+                    },
+                    "cursor": _CURSOR_PARAM,
                 },
                 "required": ["node_type"]
             }
@@ -406,13 +498,27 @@ TOOL_DEFINITIONS = [
             "description": (
                 "Find the process/piping path between two components. "
                 "Returns the sequence of tags and connection details (line tag, pipe class, diameter). "
-                "Use for tracing flow routes between equipment."
+                "Use for tracing flow routes between equipment; ask for alternatives "
+                "when asked about bypasses or other routes."
             ),
             "parameters": {
                 "type": "object",
                 "properties": {
                     "from_tag": {"type": "string", "description": "Starting tag"},
-                    "to_tag":   {"type": "string", "description": "Destination tag"}
+                    "to_tag":   {"type": "string", "description": "Destination tag"},
+                    "prefer": {
+                        "type": "string",
+                        "enum": ["hops", "main_line"],
+                        "description": (
+                            "'hops' (default): fewest connections. 'main_line': prefer process "
+                            "piping over signal links and large-bore lines over small-bore ones."
+                        )
+                    },
+                    "alternatives": {
+                        "type": "integer",
+                        "description": "Also return up to this many alternative routes (0-3). Default: 0",
+                        "default": 0
+                    }
                 },
                 "required": ["from_tag", "to_tag"]
             }
@@ -438,9 +544,10 @@ TOOL_DEFINITIONS = [
                     },
                     "depth": {
                         "type": "integer",
-                        "description": "How many hops to traverse. Default: 3",
+                        "description": "How many hops to traverse. Default: 3. Larger depths are capped",
                         "default": 3
-                    }
+                    },
+                    "cursor": _CURSOR_PARAM,
                 },
                 "required": ["tag"]
             }
@@ -452,7 +559,7 @@ TOOL_DEFINITIONS = [
             "name": "search_nodes",
             "description": (
                 "Search for components by partial tag, service description, or subtype keyword. "
-                "Use when you don't know the exact tag. Returns up to 20 matches."
+                "Use when you don't know the exact tag. Returns up to 20 matches per call."
             ),
             "parameters": {
                 "type": "object",
@@ -460,7 +567,8 @@ TOOL_DEFINITIONS = [
                     "query": {
                         "type": "string",
                         "description": "Partial tag, service keyword, or subtype. E.g. 'HV', 'fuel gas', 'spectacle'"
-                    }
+                    },
+                    "cursor": _CURSOR_PARAM,
                 },
                 "required": ["query"]
             }
@@ -496,26 +604,42 @@ def _sanitise(result: Any) -> Any:
     return result
 
 
-def execute_tool(pid_id: str, tool_name: str, tool_input: dict) -> Any:
-    """Dispatch a tool call and return the result."""
+def execute_tool(graph: str | LoadedGraph, tool_name: str, tool_input: dict,
+                 budget: ToolBudget | None = None) -> Any:
+    """
+    Dispatch a tool call on graph (a LoadedGraph, or a pid_id looked up for
+    this call) under a fresh (or the given) ToolBudget and return the result.
+    """
+    budget = budget or ToolBudget.from_env()
+    cursor = tool_input.get("cursor", 0)
     if tool_name == "get_node":
-        raw = get_node(pid_id, tool_input["tag"])
+        raw = get_node(graph, tool_input["tag"])
     elif tool_name == "list_nodes":
-        raw = list_nodes(pid_id, tool_input["node_type"], tool_input.get("subtype_filter"))
+        raw = list_nodes(graph, tool_input["node_type"], tool_input.get("subtype_filter"),
+                         cursor, budget)
     elif tool_name == "find_path":
-        raw = find_path(pid_id, tool_input["from_tag"], tool_input["to_tag"])
+        raw = find_path(
+            graph,
+            tool_input["from_tag"],
+            tool_input["to_tag"],
+            tool_input.get("prefer", "hops"),
+            tool_input.get("alternatives", 0),
+            budget,
+        )
     elif tool_name == "impact_region":
         raw = impact_region(
-            pid_id,
+            graph,
             tool_input["tag"],
             tool_input.get("direction", "both"),
             tool_input.get("depth", 3),
+            cursor,
+            budget,
         )
     elif tool_name == "search_nodes":
-        raw = search_nodes(pid_id, tool_input["query"])
+        raw = search_nodes(graph, tool_input["query"], cursor, budget)
     else:
         return {"error": f"Unknown tool: {tool_name}"}
-    return _sanitise(raw)
+    return budget.fit(_sanitise(raw))
 
 
 # ── Graph agent loop ──────────────────────────────────────────────────────────
@@ -557,6 +681,7 @@ Do NOT answer the off-topic question or provide suggestions.
 - For tracing flow routes: call find_path().
 - If you don't know a tag: call search_nodes() first.
 - Always cite the exact tag numbers found in the graph.
+- A result with a `truncated` field is partial: it says why (too many results, depth capped, search limit hit). Call again with `cursor` set to its next_cursor when you need the rest, or narrow the query (subtype_filter, smaller depth, more specific search).
 - Present list/tabular answers as markdown tables.
 
 ## READING VALVE POSITIONS
@@ -591,9 +716,11 @@ def run_graph_agent(
     after 5 rounds, we force a final answer.
     """
     rag_section = f"\nEngineering notes available as additional context:\n{rag_context}" if rag_context else ""
+    # One graph version for the whole request, however many tool rounds it takes
+    graph = _loaded(pid_id) or pid_id
 
     system_content = GRAPH_SYSTEM_PROMPT.format(
-        graph_summary=graph_summary(pid_id),
+        graph_summary=graph_summary(graph),
         rag_section=rag_section,
     )
 
@@ -640,8 +767,15 @@ def run_graph_agent(
         ]})
 
         for tc in msg.tool_calls:
-            tool_input = json.loads(tc.function.arguments)
-            result = execute_tool(pid_id, tc.function.name, tool_input)
+            try:
+                tool_input = json.loads(tc.function.arguments or "{}")
+                if not isinstance(tool_input, dict):
+                    raise TypeError("arguments must be a JSON object")
+                result = execute_tool(graph, tc.function.name, tool_input)
+            except (ValueError, KeyError, TypeError) as e:
+                # Malformed or missing arguments: tell the model instead of failing the request
+                tool_input = {}
+                result = {"error": f"Invalid arguments for {tc.function.name}: {e}"}
             tools_called.append({"name": tc.function.name, **tool_input})
             messages.append({
                 "role": "tool",
@@ -0,0 +1,295 @@
+"""
+graph_traversal.py — path and reachability searches over a GraphIndex.
+
+Every search walks `links`, the per-node (neighbours, edges) lists
+GraphIndex.links() builds once per graph version, and keeps a parent pointer
+per visited node instead of a copy of the path that reached it:
+  bfs                 deque BFS from one node, optionally depth-limited
+  bidirectional_bfs   fewest-hop path, searched from both ends at once
+  cheapest_path       Dijkstra / A* over per-edge costs
+  bidirectional_dijkstra  the same, searched from both ends at once
+  k_shortest_paths    up to k loopless alternatives in cost order (Yen)
+
+edge_costs() gives the cost schemes find_path offers: "hops" (every edge 1)
+and "main_line" (process piping before signal/other links, wide pipes before
+narrow ones). The graphs carry no coordinates, so A* only prunes when a
+caller passes a heuristic; without one cheapest_path is plain Dijkstra.
+
+A route is (cost, nodes, edges): node indices from start to end and the
+len(nodes) - 1 edge indices between them.
+
+Each search takes an optional ToolBudget (utils/tool_budget.py) charged one
+unit per node expanded; once it is exhausted the search stops — bfs returns
+the tree so far, path searches return what they have found (None or fewer
+routes) and budget.exhausted says why.
+"""
+
+import heapq
+import json
+import re
+from collections import deque
+from typing import Callable
+
+from utils.graph_index import GraphIndex
+from utils.tool_budget import ToolBudget
+
+Links = tuple[list[list[int]], list[list[int]]]
+Route = tuple[float, list[int], list[int]]
+
+# main_line: cost = KIND_COST[kind] × (1 + MAIN_LINE_DIAMETER / diameter in inches)
+KIND_COST          = {"process": 1.0, "signal": 2.0, "impulse": 2.0}
+OTHER_KIND_COST    = 4.0
+MAIN_LINE_DIAMETER = 2.0
+UNKNOWN_DIAMETER   = 2.0     # inches assumed for an edge without a diameter
+
+COST_SCHEMES = ("hops", "main_line")
+
+
+# ── Costs ─────────────────────────────────────────────────────────────────────
+
+def _inches(diameter) -> float | None:
+    """'16"' → 16, '1/2"' → 0.5, '8"x10"' → 10 (the larger end of a reducer)."""
+    values = []
+    for num in re.findall(r"\d+(?:\.\d+)?(?:/\d+)?", str(diameter or "")):
+        a, _, b = num.partition("/")
+        values.append(float(a) / float(b) if b and float(b) else float(a))
+    return max(values) if values else None
+
+
+def edge_costs(index: GraphIndex, scheme: str) -> list[float] | None:
+    """Cost of every edge under `scheme` (computed once per graph version); None for 'hops'."""
+    if scheme == "hops":
+        return None
+    if scheme != "main_line":
+        raise ValueError(f"unknown cost scheme: {scheme}")
+
+    def build() -> list[float]:
+        records = json.loads(index.store.array("edge.records").tobytes())
+        kinds = index.store.array("edge.kind").tolist()
+        return [
+            KIND_COST.get(index.kinds[k], OTHER_KIND_COST)
+            * (1 + MAIN_LINE_DIAMETER / (_inches(e.get("diameter")) or UNKNOWN_DIAMETER))
+            for e, k in zip(records, kinds)
+        ]
+    return index.derived(("costs", scheme), build)
+
+
+# ── Breadth-first ─────────────────────────────────────────────────────────────
+
+def bfs(links: Links, start: int, max_depth: int | None = None,
+        budget: ToolBudget | None = None) -> dict[int, tuple[int, int, int]]:
+    """
+    Nodes reachable from start within max_depth hops, in visit order, each
+    mapped to (parent, edge from parent, depth); start maps to (-1, -1, 0).
+    """
+    nbrs, edges = links
+    tree = {start: (-1, -1, 0)}
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        depth = tree[i][2]
+        if max_depth is not None and depth >= max_depth:
+            continue
+        if budget is not None and not budget.charge():
+            break
+        for nb, ei in zip(nbrs[i], edges[i]):
+            if nb not in tree:
+                tree[nb] = (i, ei, depth + 1)
+                queue.append(nb)
+    return tree
+
+
+def path_to(tree: dict[int, tuple], node: int) -> tuple[list[int], list[int]]:
+    """(nodes, edges) from the root of a bfs() / search tree to node."""
+    nodes, edges = [node], []
+    while (parent := tree[node])[0] != -1:
+        edges.append(parent[1])
+        node = parent[0]
+        nodes.append(node)
+    return nodes[::-1], edges[::-1]
+
+
+def _expand(links: Links, frontier: list[int], own: dict, other: dict,
+            banned_nodes: set[int], banned_steps: set[tuple[int, int]],
+            backward: bool, budget: ToolBudget | None) -> tuple[list[int], int | None]:
+    """Advance one side by a full level; (next frontier, best meeting node or None)."""
+    nbrs, edges = links
+    nxt, meet, best = [], None, None
+    if budget is not None and not budget.charge(len(frontier)):
+        return [], None
+    for i in frontier:
+        depth = own[i][2] + 1
+        for nb, ei in zip(nbrs[i], edges[i]):
+            if nb in own or nb in banned_nodes:
+                continue
+            if banned_steps and ((nb, i) if backward else (i, nb)) in banned_steps:
+                continue
+            own[nb] = (i, ei, depth)
+            nxt.append(nb)
+            if nb in other and (best is None or depth + other[nb][2] < best):
+                meet, best = nb, depth + other[nb][2]
+    return nxt, meet
+
+
+def bidirectional_bfs(forward: Links, backward: Links, start: int, end: int,
+                      banned_nodes: set[int] = frozenset(),
+                      banned_steps: set[tuple[int, int]] = frozenset(),
+                      budget: ToolBudget | None = None) -> Route | None:
+    """
+    Fewest-hop path start → end. `backward` must be `forward` reversed (for
+    every i → j in forward, j → i in backward, same edge). The smaller
+    frontier is expanded a level at a time until the two searches meet.
+    Bans work as in cheapest_path; steps are given in the forward direction.
+    """
+    if start == end:
+        return 0.0, [start], []
+    fwd = {start: (-1, -1, 0)}
+    bwd = {end: (-1, -1, 0)}
+    f_front, b_front = [start], [end]
+    while f_front and b_front:
+        if len(f_front) <= len(b_front):
+            f_front, meet = _expand(forward, f_front, fwd, bwd,
+                                    banned_nodes, banned_steps, False, budget)
+        else:
+            b_front, meet = _expand(backward, b_front, bwd, fwd,
+                                    banned_nodes, banned_steps, True, budget)
+        if meet is not None:
+            head, head_edges = path_to(fwd, meet)
+            tail, tail_edges = path_to(bwd, meet)
+            nodes = head + tail[::-1][1:]
+            return float(len(nodes) - 1), nodes, head_edges + tail_edges[::-1]
+    return None
+
+
+# ── Weighted ──────────────────────────────────────────────────────────────────
+
+def cheapest_path(links: Links, start: int, end: int, costs: list[float] | None = None,
+                  heuristic: Callable[[int], float] | None = None,
+                  banned_nodes: set[int] = frozenset(),
+                  banned_steps: set[tuple[int, int]] = frozenset(),
+                  budget: ToolBudget | None = None) -> Route | None:
+    """
+    Lowest-cost path start → end (Dijkstra, or A* with an admissible
+    heuristic). costs[edge] defaults to 1 per edge. Nodes in banned_nodes and
+    (node, neighbour) steps in banned_steps are not used.
+    """
+    nbrs, edges = links
+    h = heuristic or (lambda i: 0.0)
+    best = {start: 0.0}
+    tree = {start: (-1, -1, 0)}
+    heap = [(h(start), 0.0, start)]
+    done = set()
+    while heap:
+        _, g, i = heapq.heappop(heap)
+        if i in done:
+            continue
+        if i == end:
+            nodes, path_edges = path_to(tree, end)
+            return g, nodes, path_edges
+        if budget is not None and not budget.charge():
+            return None
+        done.add(i)
+        for nb, ei in zip(nbrs[i], edges[i]):
+            if nb in done or nb in banned_nodes or (i, nb) in banned_steps:
+                continue
+            cost = g + (costs[ei] if costs is not None else 1.0)
+            if cost < best.get(nb, float("inf")):
+                best[nb] = cost
+                tree[nb] = (i, ei, tree[i][2] + 1)
+                heapq.heappush(heap, (cost + h(nb), cost, nb))
+    return None
+
+
+def bidirectional_dijkstra(forward: Links, backward: Links, start: int, end: int,
+                           costs: list[float],
+                           banned_nodes: set[int] = frozenset(),
+                           banned_steps: set[tuple[int, int]] = frozenset(),
+                           budget: ToolBudget | None = None) -> Route | None:
+    """
+    Lowest-cost path start → end, settling nodes from whichever side has the
+    smaller queue until the two queue minimums together reach the best
+    meeting cost. Links and bans as in bidirectional_bfs.
+    """
+    if start == end:
+        return 0.0, [start], []
+    links = (forward, backward)
+    dist = ({start: 0.0}, {end: 0.0})
+    trees = ({start: (-1, -1, 0)}, {end: (-1, -1, 0)})
+    heaps = ([(0.0, start)], [(0.0, end)])
+    done = (set(), set())
+    best, meet = float("inf"), None
+    while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best:
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        g, i = heapq.heappop(heaps[side])
+        if i in done[side]:
+            continue
+        if budget is not None and not budget.charge():
+            return None
+        done[side].add(i)
+        nbrs, edges = links[side]
+        own, other, tree = dist[side], dist[1 - side], trees[side]
+        for nb, ei in zip(nbrs[i], edges[i]):
+            if nb in banned_nodes:
+                continue
+            if banned_steps and ((nb, i) if side else (i, nb)) in banned_steps:
+                continue
+            cost = g + costs[ei]
+            if cost < own.get(nb, float("inf")):
+                own[nb] = cost
+                tree[nb] = (i, ei, tree[i][2] + 1)
+                heapq.heappush(heaps[side], (cost, nb))
+                if nb in other and cost + other[nb] < best:
+                    best, meet = cost + other[nb], nb
+    if meet is None:
+        return None
+    head, head_edges = path_to(trees[0], meet)
+    tail, tail_edges = path_to(trees[1], meet)
+    path_edges = head_edges + tail_edges[::-1]
+    return sum(costs[e] for e in path_edges), head + tail[::-1][1:], path_edges
+
+
+def k_shortest_paths(links: Links, start: int, end: int, k: int,
+                     costs: list[float] | None = None, backward: Links | None = None,
+                     budget: ToolBudget | None = None) -> list[Route]:
+    """
+    Up to k loopless paths start → end in cost order (Yen's algorithm). Paths
+    differ in the nodes they pass through; parallel edges are not alternatives.
+    Given the reversed links, each search runs from both ends.
+    """
+    def search(a: int, **bans) -> Route | None:
+        if backward is None:
+            return cheapest_path(links, a, end, costs, budget=budget, **bans)
+        if costs is None:
+            return bidirectional_bfs(links, backward, a, end, budget=budget, **bans)
+        return bidirectional_dijkstra(links, backward, a, end, costs, budget=budget, **bans)
+
+    first = search(start)
+    if first is None:
+        return []
+    found = [first]
+    candidates: list[tuple[float, int, Route]] = []
+    seen = {tuple(first[1])}
+    while len(found) < k:
+        _, prev_nodes, prev_edges = found[-1]
+        for j in range(len(prev_nodes) - 1):
+            spur = prev_nodes[j]
+            root = prev_nodes[:j + 1]
+            banned_steps = {(spur, p[1][j + 1]) for p in found
+                            if len(p[1]) > j + 1 and p[1][:j + 1] == root}
+            spur_path = search(spur, banned_nodes=set(root[:-1]), banned_steps=banned_steps)
+            if budget is not None and budget.exhausted:
+                return found
+            if spur_path is None:
+                continue
+            nodes = root[:-1] + spur_path[1]
+            if tuple(nodes) in seen:
+                continue
+            seen.add(tuple(nodes))
+            path_edges = prev_edges[:j] + spur_path[2]
+            root_cost = sum(costs[e] for e in prev_edges[:j]) if costs is not None else float(j)
+            path = (root_cost + spur_path[0], nodes, path_edges)
+            heapq.heappush(candidates, (path[0], len(seen), path))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[2])
+    return found
@@ -0,0 +1,144 @@
+"""
+lexical.py — local inverted index over RAG chunk text.
+
+Two kinds of token share one BM25 index:
+  tags   — tag codes (utils/tags.py) with a number, and LINE_RE matches,
+           normalised so the ways a narrative and an operator write them
+           meet: HV-0059, HV 059, HV-59 and hv0059 → #HV0059; PZT-0001B also
+           indexes #PZT0001; a line number
+           indexes its full form (#14PP01362GF0001B01E9) and its line tag
+           (#GF0001). Tag tokens weigh TAG_BOOST times a word.
+  words  — lowercase alphanumeric runs; stop words are dropped from queries.
+
+Postings hold precomputed BM25 weights, so scoring a query is a sum over the
+postings of its few tokens — no pass over every chunk and no embedding call.
+rag_retriever fuses these results with vector results, and answers queries
+dominated by known tags from this index alone.
+"""
+
+import re
+
+import numpy as np
+
+from utils.tags import ALL_TYPES, LINE_RE
+
+BM25_K1   = 1.2
+BM25_B    = 0.75
+TAG_BOOST = 2.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# TAG_RE with 1–6 digits: the narratives write short numbers (HV-27 for HV-0027).
+# Lexical only — the extractor keeps TAG_RE's 3–6 digits.
+_TAG_TOKEN_RE = re.compile(
+    rf"\b({'|'.join(sorted(ALL_TYPES, key=len, reverse=True))})[- ]?"
+    rf"(\d{{1,6}}(?:[/\\]\d{{1,6}})?[A-Z]?)\b",
+    re.IGNORECASE,
+)
+
+STOP_WORDS = frozenset("""
+    a about all an and any are as at be by can do does for from has have how i
+    if in into is it its me my of on or show so tell than that the their them
+    then there these this to up was what when where which while who why will
+    with you your
+""".split())
+
+
+# ── Tokens ────────────────────────────────────────────────────────────────────
+
+def _tag(prefix: str, number: str) -> list[str]:
+    """HV + 059 → ['#HV0059']; PZT + 0001B → ['#PZT0001B', '#PZT0001']."""
+    digits = re.match(r"\d+", number).group(0)
+    suffix = number[len(digits):]
+    base = f"#{prefix.upper()}{int(digits):04d}"
+    return [base + suffix.upper(), base] if suffix else [base]
+
+
+def tag_tokens(text: str, strict: bool = True) -> list[str]:
+    """
+    Normalised tag and line tokens in text. `strict` (chunk text) only takes
+    tag prefixes written in capitals, so prose like "as 361" is not a tag;
+    queries are matched case-insensitively.
+    """
+    tokens = []
+    for m in _TAG_TOKEN_RE.finditer(text):
+        if strict and not m.group(1).isupper():
+            continue
+        for number in re.split(r"[/\\]", m.group(2)):
+            tokens.extend(_tag(m.group(1), number))
+    for m in LINE_RE.finditer(text):
+        tokens.append("#" + re.sub(r"[^A-Z0-9]", "", m.group(0).upper()))
+        tokens.append("#" + m.group(4).upper())
+    return tokens
+
+
+def word_tokens(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def query_tokens(query: str) -> tuple[list[str], list[str]]:
+    """(tag tokens, content words) of a query; stop words and the tags' own text dropped."""
+    tags = list(dict.fromkeys(tag_tokens(query, strict=False)))
+    rest = _TAG_TOKEN_RE.sub(" ", LINE_RE.sub(" ", query))
+    words = [w for w in dict.fromkeys(word_tokens(rest)) if w not in STOP_WORDS]
+    return tags, words
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+class LexicalIndex:
+    """BM25 postings over a list of chunk texts; rows are list positions."""
+
+    def __init__(self, texts: list[str]):
+        self.n = len(texts)
+        counts: list[dict[str, int]] = []
+        lengths = np.zeros(self.n, dtype=np.float32)
+        df: dict[str, int] = {}
+        for i, text in enumerate(texts):
+            tf: dict[str, int] = {}
+            words = word_tokens(text)
+            for token in words + tag_tokens(text):
+                tf[token] = tf.get(token, 0) + 1
+            counts.append(tf)
+            lengths[i] = len(words)
+            for token in tf:
+                df[token] = df.get(token, 0) + 1
+        avg = float(lengths.mean()) if self.n else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (avg or 1.0))
+
+        rows: dict[str, list[int]] = {}
+        weights: dict[str, list[float]] = {}
+        for i, tf in enumerate(counts):
+            for token, f in tf.items():
+                rows.setdefault(token, []).append(i)
+                weights.setdefault(token, []).append(f * (BM25_K1 + 1) / (f + norm[i]))
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for token, r in rows.items():
+            idf = np.log(1 + (self.n - df[token] + 0.5) / (df[token] + 0.5))
+            if token.startswith("#"):
+                idf *= TAG_BOOST
+            self.postings[token] = (np.array(r, dtype=np.int32),
+                                    (np.array(weights[token]) * idf).astype(np.float32))
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.postings
+
+    def search(self, tokens: list[str], k: int,
+               allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, BM25 scores) of the top-k rows matching any token, best first."""
+        hits = [self.postings[t] for t in tokens if t in self.postings]
+        if not hits:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        rows = np.concatenate([r for r, _ in hits])
+        weights = np.concatenate([w for _, w in hits])
+        if allowed is not None:
+            keep = allowed[rows]
+            rows, weights = rows[keep], weights[keep]
+        rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        k = min(k, len(rows))
+        if not k:
+            return rows, scores
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
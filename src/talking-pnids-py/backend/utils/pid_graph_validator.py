@@ -0,0 +1,450 @@
+"""
+pid_graph_validator.py — compiled validator + repair pass for pid.graph.v0.1.1.
+
+GENERATED by src/ingestion/graph_validator.py from SCHEMA_DEF in schema.py —
+do not edit; regenerate with `python src/ingestion/graph_validator.py --emit`.
+
+  validate_graph(doc)    — schema errors (list of strings, empty = valid)
+  reference_errors(doc)  — duplicate ids and dangling edge endpoints
+  repair_graph(doc)      — fix what can be fixed in place → (doc, fixes)
+"""
+
+# ── Repair (graph_repair.py) ─────────────────────────────────────────────────
+
+import re
+
+_K: dict = {}   # schema constants — filled in by graph_validator.generate_source()
+
+LAYER_SYNONYMS = {
+    "piping": "process", "pipe": "process", "main": "process", "flow": "process",
+    "instrumentation": "instrument", "instruments": "instrument", "control": "instrument",
+    "signal": "instrument", "electric": "electrical", "power": "electrical",
+    "utilities": "utility", "text": "annotation", "note": "annotation", "notes": "annotation",
+    "label": "annotation", "mech": "mechanical",
+}
+NODE_TYPE_SYNONYMS = {
+    "off_page": "terminator", "off_page_connector": "terminator", "connector": "terminator",
+    "boundary": "terminator", "tee": "junction", "reducer": "junction", "fitting": "junction",
+    "spec_break": "junction", "vessel": "equipment", "pump": "equipment", "tank": "equipment",
+    "text": "annotation", "note": "annotation", "label": "annotation",
+}
+EDGE_KIND_SYNONYMS = {
+    "pipe": "process", "piping": "process", "line": "process", "flow": "process",
+    "electrical": "signal", "data": "signal", "software": "signal", "pneumatic": "signal",
+    "instrument": "signal", "capillary": "impulse", "mechanical": "association",
+    "contains": "containment", "part_of": "containment",
+}
+FLOW_DIR_SYNONYMS = {
+    "forward": "uni", "one_way": "uni", "unidirectional": "uni", "uni_directional": "uni",
+    "both": "bi", "bidirectional": "bi", "bi_directional": "bi", "two_way": "bi",
+}
+
+
+def _word(value) -> str:
+    return str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def _norm_ref(value) -> str:
+    return re.sub(r"[\s\-_:]", "", str(value or "").upper())
+
+
+def _props(item: dict) -> dict:
+    """item["props"] as a dict (a stray non-dict value is wrapped, not lost)."""
+    props = item.get("props")
+    if not isinstance(props, dict):
+        item["props"] = props = {} if props is None else {"value": props}
+    return props
+
+
+def _fold_extra_keys(item: dict, kind: str, label: str, fixes: list) -> None:
+    """Keys outside the schema go into props; string fields are coerced to str."""
+    props = _props(item)
+    for k in [k for k in item if k not in _K[f"{kind}_keys"]]:
+        props.setdefault(k, item.pop(k))
+        fixes.append(f"{label}: moved '{k}' into props")
+    for k in _K[f"{kind}_string_keys"]:
+        v = item.get(k)
+        if v is None and k in item:
+            del item[k]
+        elif v is not None and not isinstance(v, str):
+            if isinstance(v, (int, float, bool)):
+                item[k] = str(v)
+            else:
+                props.setdefault(k, item.pop(k))
+                fixes.append(f"{label}: moved non-string '{k}' into props")
+    if not props:
+        del item["props"]
+
+
+def reference_errors(graph: dict) -> list[str]:
+    """Checks JSON Schema cannot express: duplicate ids and dangling edge endpoints."""
+    errors = []
+    ids = set()
+    for n in graph.get("nodes", []):
+        nid = n.get("id") if isinstance(n, dict) else None
+        if nid in ids:
+            errors.append(f"$.nodes: duplicate node id {nid!r}")
+        ids.add(nid)
+    edge_ids = set()
+    for e in graph.get("edges", []):
+        if not isinstance(e, dict):
+            continue
+        if e.get("id") in edge_ids:
+            errors.append(f"$.edges: duplicate edge id {e.get('id')!r}")
+        edge_ids.add(e.get("id"))
+        for end in ("from", "to"):
+            if e.get(end) not in ids:
+                errors.append(f"$.edges[{e.get('id')!r}].{end}: dangling endpoint {e.get(end)!r}")
+    return errors
+
+
+def repair_graph(graph: dict) -> tuple[dict, list[str]]:
+    """Repair common schema violations in place. Returns (graph, list of fixes applied)."""
+    fixes: list[str] = []
+    if not isinstance(graph, dict):
+        return graph, fixes
+
+    if graph.get("schema_version") != _K["schema_version"]:
+        fixes.append(f"schema_version {graph.get('schema_version')!r} → {_K['schema_version']!r}")
+        graph["schema_version"] = _K["schema_version"]
+    if not isinstance(graph.get("metadata"), dict):
+        graph["metadata"] = {}
+    for k in [k for k in graph if k not in _K["root_keys"] and not k.startswith("_")]:
+        graph["metadata"].setdefault(k, graph.pop(k))
+        fixes.append(f"moved root key '{k}' into metadata")
+    for k in [k for k, v in graph["metadata"].items() if v is None]:
+        del graph["metadata"][k]
+        fixes.append(f"dropped null metadata.{k}")
+
+    # ── Nodes ────────────────────────────────────────────────────────────────
+    nodes: dict[str, dict] = {}
+    for i, node in enumerate(graph.get("nodes") or []):
+        if not isinstance(node, dict):
+            fixes.append(f"dropped non-object node #{i}")
+            continue
+        if not isinstance(node.get("id"), str) or not node["id"]:
+            base = re.sub(r"\s+", "", str(node.get("tag") or "")) or f"node_{i:03d}"
+            node["id"] = base if base not in nodes else f"{base}_{i}"
+            fixes.append(f"node #{i}: missing id → {node['id']!r}")
+        label = f"node {node['id']!r}"
+
+        ntype = node.get("type")
+        if ntype not in _K["node_types"]:
+            w = _word(ntype)
+            new = NODE_TYPE_SYNONYMS.get(w) or NODE_TYPE_SYNONYMS.get(w.split(".", 1)[0]) \
+                or (w.split(".", 1)[0] if w.split(".", 1)[0] in _K["node_types"] else "annotation")
+            node["type"] = new
+            if new == "annotation" and ntype:
+                _props(node).setdefault("original_type", ntype)
+            fixes.append(f"{label}: type {ntype!r} → {new!r}")
+        layer = node.get("layer")
+        if layer is not None and layer not in _K["node_layers"]:
+            node["layer"] = LAYER_SYNONYMS.get(_word(layer), "other")
+            fixes.append(f"{label}: layer {layer!r} → {node['layer']!r}")
+        status = node.get("status")
+        if status is not None and status not in _K["node_status"]:
+            w = _word(status)
+            if w in _K["node_status"]:
+                node["status"] = w
+            else:
+                _props(node).setdefault("status", node.pop("status"))
+            fixes.append(f"{label}: status {status!r} not in schema enum")
+        _fold_extra_keys(node, "node", label, fixes)
+
+        if node["id"] in nodes:
+            keep = nodes[node["id"]]
+            for k, v in node.items():
+                if k == "props":
+                    for pk, pv in v.items():
+                        _props(keep).setdefault(pk, pv)
+                elif keep.get(k) in (None, ""):
+                    keep[k] = v
+            fixes.append(f"{label}: duplicate id merged")
+        else:
+            nodes[node["id"]] = node
+    graph["nodes"] = list(nodes.values())
+
+    # ── Edges ────────────────────────────────────────────────────────────────
+    by_ref: dict[str, str] = {}
+    for nid, node in nodes.items():
+        by_ref.setdefault(_norm_ref(nid), nid)
+    for nid, node in nodes.items():
+        if node.get("tag"):
+            by_ref.setdefault(_norm_ref(node["tag"]), nid)
+
+    edges: list[dict] = []
+    edge_ids: set = set()
+    for i, edge in enumerate(graph.get("edges") or []):
+        if not isinstance(edge, dict):
+            fixes.append(f"dropped non-object edge #{i}")
+            continue
+        label = f"edge {edge.get('id', i)!r}"
+        dangling = False
+        for end in ("from", "to"):
+            ref = edge.get(end)
+            if ref in nodes:
+                continue
+            target = by_ref.get(_norm_ref(ref))
+            if target:
+                edge[end] = target
+                fixes.append(f"{label}: {end} {ref!r} → node {target!r}")
+            else:
+                dangling = True
+        if dangling:
+            fixes.append(f"{label}: dropped, endpoint not found ({edge.get('from')!r} → {edge.get('to')!r})")
+            continue
+
+        kind = edge.get("kind")
+        if kind not in _K["edge_kinds"]:
+            edge["kind"] = EDGE_KIND_SYNONYMS.get(_word(kind), "process")
+            fixes.append(f"{label}: kind {kind!r} → {edge['kind']!r}")
+        flow = edge.get("flow_dir")
+        if flow is not None and flow not in _K["flow_dirs"]:
+            new = FLOW_DIR_SYNONYMS.get(_word(flow))
+            if new:
+                edge["flow_dir"] = new
+            else:
+                _props(edge).setdefault("flow_dir", edge.pop("flow_dir"))
+            fixes.append(f"{label}: flow_dir {flow!r} not in schema enum")
+        _fold_extra_keys(edge, "edge", label, fixes)
+
+        eid = edge.get("id")
+        if not isinstance(eid, str) or not eid or eid in edge_ids:
+            base = eid if isinstance(eid, str) and eid else f"e_{edge['from']}_{edge['to']}"
+            new_id, n = base, 2
+            while new_id in edge_ids:
+                new_id, n = f"{base}_{n}", n + 1
+            edge["id"] = new_id
+            fixes.append(f"edge #{i}: id {eid!r} → {new_id!r}")
+        edge_ids.add(edge["id"])
+        edges.append(edge)
+    graph["edges"] = edges
+    return graph, fixes
+
+
+# ── Schema constants ─────────────────────────────────────────────────────────
+
+SCHEMA_HASH = '0891139935a895e9'
+_MISSING = object()
+_K.update({
+    'schema_version': 'pid.graph.v0.1.1',
+    'root_keys': frozenset(['edges', 'metadata', 'nodes', 'schema_version']),
+    'node_keys': frozenset(['id', 'layer', 'loop_id', 'off_page_doc_id', 'off_page_ref', 'ports', 'props', 'service', 'signal_type', 'status', 'subtype', 'tag', 'type']),
+    'edge_keys': frozenset(['diameter', 'flow_dir', 'fluid_code', 'from', 'id', 'kind', 'layer', 'line_tag', 'pipe_class', 'props', 'status', 'to']),
+    'node_types': frozenset(['annotation', 'equipment', 'instrument', 'junction', 'nozzle', 'terminator', 'valve']),
+    'node_layers': frozenset(['annotation', 'electrical', 'instrument', 'mechanical', 'other', 'process', 'utility']),
+    'node_status': frozenset(['existing', 'future', 'new', 'removed', 'temporary']),
+    'edge_kinds': frozenset(['association', 'containment', 'impulse', 'process', 'signal']),
+    'flow_dirs': frozenset(['bi', 'uni']),
+    'node_string_keys': ('id', 'loop_id', 'off_page_doc_id', 'off_page_ref', 'service', 'signal_type', 'subtype', 'tag'),
+    'edge_string_keys': ('diameter', 'fluid_code', 'from', 'id', 'layer', 'line_tag', 'pipe_class', 'status', 'to'),
+})
+_ROOT_KEYS = frozenset(['edges', 'metadata', 'nodes', 'schema_version'])
+_NODES_KEYS = frozenset(['id', 'layer', 'loop_id', 'off_page_doc_id', 'off_page_ref', 'ports', 'props', 'service', 'signal_type', 'status', 'subtype', 'tag', 'type'])
+_NODES_TYPE_ENUM = frozenset(['annotation', 'equipment', 'instrument', 'junction', 'nozzle', 'terminator', 'valve'])
+_NODES_LAYER_ENUM = frozenset(['annotation', 'electrical', 'instrument', 'mechanical', 'other', 'process', 'utility'])
+_NODES_STATUS_ENUM = frozenset(['existing', 'future', 'new', 'removed', 'temporary'])
+_EDGES_KEYS = frozenset(['diameter', 'flow_dir', 'fluid_code', 'from', 'id', 'kind', 'layer', 'line_tag', 'pipe_class', 'props', 'status', 'to'])
+_EDGES_KIND_ENUM = frozenset(['association', 'containment', 'impulse', 'process', 'signal'])
+_EDGES_FLOW_DIR_ENUM = frozenset(['bi', 'uni'])
+
+
+# ── Validator ────────────────────────────────────────────────────────────────
+
+def validate_graph(doc) -> list[str]:
+    """Schema errors for one pid.graph document (empty list = valid)."""
+    errors: list[str] = []
+    if not isinstance(doc, dict):
+        errors.append(f"$: expected object, got {type(doc).__name__}")
+    else:
+        if 'schema_version' not in doc:
+            errors.append("$: missing required 'schema_version'")
+        if 'nodes' not in doc:
+            errors.append("$: missing required 'nodes'")
+        if 'edges' not in doc:
+            errors.append("$: missing required 'edges'")
+        if not doc.keys() <= _ROOT_KEYS:
+            for k in sorted(doc.keys() - _ROOT_KEYS):
+                errors.append(f"$: unexpected key {k!r}")
+        v1 = doc.get('schema_version', _MISSING)
+        if v1 is not _MISSING:
+            if not isinstance(v1, str):
+                errors.append(f"$.schema_version: expected string, got {type(v1).__name__}")
+            elif v1 != 'pid.graph.v0.1.1':
+                errors.append(f"$.schema_version: {v1!r} != 'pid.graph.v0.1.1'")
+        v2 = doc.get('metadata', _MISSING)
+        if v2 is not _MISSING:
+            if not isinstance(v2, dict):
+                errors.append(f"$.metadata: expected object, got {type(v2).__name__}")
+            else:
+                v3 = v2.get('doc_id', _MISSING)
+                if v3 is not _MISSING:
+                    if not isinstance(v3, str):
+                        errors.append(f"$.metadata.doc_id: expected string, got {type(v3).__name__}")
+                v4 = v2.get('rev', _MISSING)
+                if v4 is not _MISSING:
+                    if not isinstance(v4, str):
+                        errors.append(f"$.metadata.rev: expected string, got {type(v4).__name__}")
+                v5 = v2.get('plant', _MISSING)
+                if v5 is not _MISSING:
+                    if not isinstance(v5, str):
+                        errors.append(f"$.metadata.plant: expected string, got {type(v5).__name__}")
+                v6 = v2.get('unit', _MISSING)
+                if v6 is not _MISSING:
+                    if not isinstance(v6, str):
+                        errors.append(f"$.metadata.unit: expected string, got {type(v6).__name__}")
+                v7 = v2.get('area', _MISSING)
+                if v7 is not _MISSING:
+                    if not isinstance(v7, str):
+                        errors.append(f"$.metadata.area: expected string, got {type(v7).__name__}")
+                v8 = v2.get('units', _MISSING)
+                if v8 is not _MISSING:
+                    if not isinstance(v8, dict):
+                        errors.append(f"$.metadata.units: expected object, got {type(v8).__name__}")
+        v9 = doc.get('nodes', _MISSING)
+        if v9 is not _MISSING:
+            if not isinstance(v9, list):
+                errors.append(f"$.nodes: expected array, got {type(v9).__name__}")
+            else:
+                for i10, v11 in enumerate(v9):
+                    if not isinstance(v11, dict):
+                        errors.append(f"$.nodes[{i10}]: expected object, got {type(v11).__name__}")
+                    else:
+                        if 'id' not in v11:
+                            errors.append(f"$.nodes[{i10}]: missing required 'id'")
+                        if 'type' not in v11:
+                            errors.append(f"$.nodes[{i10}]: missing required 'type'")
+                        if not v11.keys() <= _NODES_KEYS:
+                            for k in sorted(v11.keys() - _NODES_KEYS):
+                                errors.append(f"$.nodes[{i10}]: unexpected key {k!r}")
+                        v12 = v11.get('id', _MISSING)
+                        if v12 is not _MISSING:
+                            if not isinstance(v12, str):
+                                errors.append(f"$.nodes[{i10}].id: expected string, got {type(v12).__name__}")
+                        v13 = v11.get('type', _MISSING)
+                        if v13 is not _MISSING:
+                            if not isinstance(v13, str):
+                                errors.append(f"$.nodes[{i10}].type: expected string, got {type(v13).__name__}")
+                            elif v13 not in _NODES_TYPE_ENUM:
+                                errors.append(f"$.nodes[{i10}].type: {v13!r} not in enum")
+                        v14 = v11.get('subtype', _MISSING)
+                        if v14 is not _MISSING:
+                            if not isinstance(v14, str):
+                                errors.append(f"$.nodes[{i10}].subtype: expected string, got {type(v14).__name__}")
+                        v15 = v11.get('tag', _MISSING)
+                        if v15 is not _MISSING:
+                            if not isinstance(v15, str):
+                                errors.append(f"$.nodes[{i10}].tag: expected string, got {type(v15).__name__}")
+                        v16 = v11.get('layer', _MISSING)
+                        if v16 is not _MISSING:
+                            if not isinstance(v16, str):
+                                errors.append(f"$.nodes[{i10}].layer: expected string, got {type(v16).__name__}")
+                            elif v16 not in _NODES_LAYER_ENUM:
+                                errors.append(f"$.nodes[{i10}].layer: {v16!r} not in enum")
+                        v17 = v11.get('status', _MISSING)
+                        if v17 is not _MISSING:
+                            if not isinstance(v17, str):
+                                errors.append(f"$.nodes[{i10}].status: expected string, got {type(v17).__name__}")
+                            elif v17 not in _NODES_STATUS_ENUM:
+                                errors.append(f"$.nodes[{i10}].status: {v17!r} not in enum")
+                        v18 = v11.get('service', _MISSING)
+                        if v18 is not _MISSING:
+                            if not isinstance(v18, str):
+                                errors.append(f"$.nodes[{i10}].service: expected string, got {type(v18).__name__}")
+                        v19 = v11.get('loop_id', _MISSING)
+                        if v19 is not _MISSING:
+                            if not isinstance(v19, str):
+                                errors.append(f"$.nodes[{i10}].loop_id: expected string, got {type(v19).__name__}")
+                        v20 = v11.get('signal_type', _MISSING)
+                        if v20 is not _MISSING:
+                            if not isinstance(v20, str):
+                                errors.append(f"$.nodes[{i10}].signal_type: expected string, got {type(v20).__name__}")
+                        v21 = v11.get('off_page_ref', _MISSING)
+                        if v21 is not _MISSING:
+                            if not isinstance(v21, str):
+                                errors.append(f"$.nodes[{i10}].off_page_ref: expected string, got {type(v21).__name__}")
+                        v22 = v11.get('off_page_doc_id', _MISSING)
+                        if v22 is not _MISSING:
+                            if not isinstance(v22, str):
+                                errors.append(f"$.nodes[{i10}].off_page_doc_id: expected string, got {type(v22).__name__}")
+                        v23 = v11.get('ports', _MISSING)
+                        if v23 is not _MISSING:
+                            if not isinstance(v23, list):
+                                errors.append(f"$.nodes[{i10}].ports: expected array, got {type(v23).__name__}")
+                        v24 = v11.get('props', _MISSING)
+                        if v24 is not _MISSING:
+                            if not isinstance(v24, dict):
+                                errors.append(f"$.nodes[{i10}].props: expected object, got {type(v24).__name__}")
+        v25 = doc.get('edges', _MISSING)
+        if v25 is not _MISSING:
+            if not isinstance(v25, list):
+                errors.append(f"$.edges: expected array, got {type(v25).__name__}")
+            else:
+                for i26, v27 in enumerate(v25):
+                    if not isinstance(v27, dict):
+                        errors.append(f"$.edges[{i26}]: expected object, got {type(v27).__name__}")
+                    else:
+                        if 'id' not in v27:
+                            errors.append(f"$.edges[{i26}]: missing required 'id'")
+                        if 'from' not in v27:
+                            errors.append(f"$.edges[{i26}]: missing required 'from'")
+                        if 'to' not in v27:
+                            errors.append(f"$.edges[{i26}]: missing required 'to'")
+                        if 'kind' not in v27:
+                            errors.append(f"$.edges[{i26}]: missing required 'kind'")
+                        if not v27.keys() <= _EDGES_KEYS:
+                            for k in sorted(v27.keys() - _EDGES_KEYS):
+                                errors.append(f"$.edges[{i26}]: unexpected key {k!r}")
+                        v28 = v27.get('id', _MISSING)
+                        if v28 is not _MISSING:
+                            if not isinstance(v28, str):
+                                errors.append(f"$.edges[{i26}].id: expected string, got {type(v28).__name__}")
+                        v29 = v27.get('from', _MISSING)
+                        if v29 is not _MISSING:
+                            if not isinstance(v29, str):
+                                errors.append(f"$.edges[{i26}].from: expected string, got {type(v29).__name__}")
+                        v30 = v27.get('to', _MISSING)
+                        if v30 is not _MISSING:
+                            if not isinstance(v30, str):
+                                errors.append(f"$.edges[{i26}].to: expected string, got {type(v30).__name__}")
+                        v31 = v27.get('kind', _MISSING)
+                        if v31 is not _MISSING:
+                            if not isinstance(v31, str):
+                                errors.append(f"$.edges[{i26}].kind: expected string, got {type(v31).__name__}")
+                            elif v31 not in _EDGES_KIND_ENUM:
+                                errors.append(f"$.edges[{i26}].kind: {v31!r} not in enum")
+                        v32 = v27.get('line_tag', _MISSING)
+                        if v32 is not _MISSING:
+                            if not isinstance(v32, str):
+                                errors.append(f"$.edges[{i26}].line_tag: expected string, got {type(v32).__name__}")
+                        v33 = v27.get('pipe_class', _MISSING)
+                        if v33 is not _MISSING:
+                            if not isinstance(v33, str):
+                                errors.append(f"$.edges[{i26}].pipe_class: expected string, got {type(v33).__name__}")
+                        v34 = v27.get('diameter', _MISSING)
+                        if v34 is not _MISSING:
+                            if not isinstance(v34, str):
+                                errors.append(f"$.edges[{i26}].diameter: expected string, got {type(v34).__name__}")
+                        v35 = v27.get('fluid_code', _MISSING)
+                        if v35 is not _MISSING:
+                            if not isinstance(v35, str):
+                                errors.append(f"$.edges[{i26}].fluid_code: expected string, got {type(v35).__name__}")
+                        v36 = v27.get('flow_dir', _MISSING)
+                        if v36 is not _MISSING:
+                            if not isinstance(v36, str):
+                                errors.append(f"$.edges[{i26}].flow_dir: expected string, got {type(v36).__name__}")
+                            elif v36 not in _EDGES_FLOW_DIR_ENUM:
+                                errors.append(f"$.edges[{i26}].flow_dir: {v36!r} not in enum")
+                        v37 = v27.get('layer', _MISSING)
+                        if v37 is not _MISSING:
+                            if not isinstance(v37, str):
+                                errors.append(f"$.edges[{i26}].layer: expected string, got {type(v37).__name__}")
+                        v38 = v27.get('status', _MISSING)
+                        if v38 is not _MISSING:
+                            if not isinstance(v38, str):
+                                errors.append(f"$.edges[{i26}].status: expected string, got {type(v38).__name__}")
+                        v39 = v27.get('props', _MISSING)
+                        if v39 is not _MISSING:
+                            if not isinstance(v39, dict):
+                                errors.append(f"$.edges[{i26}].props: expected object, got {type(v39).__name__}")
+    return errors
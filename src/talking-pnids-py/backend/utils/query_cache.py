@@ -0,0 +1,142 @@
+"""
+query_cache.py — LRU + TTL cache of query embeddings.
+
+Keyed by (provider, model, normalised query text): case and whitespace are
+folded, so "What is HV-0059?" and "what is  hv-0059?" share an entry. Entries
+expire after `ttl` seconds and the least recently used one is evicted past
+`max_size`. With a `path`, the cache is loaded from and saved to an .npz file
+(atomic replace) so repeated questions survive a restart; it is saved every
+SAVE_EVERY new entries and on shutdown.
+
+Settings come from the environment:
+  RAG_QUERY_CACHE_SIZE  entries kept (default 1024; 0 disables the cache)
+  RAG_QUERY_CACHE_TTL   seconds an entry stays valid (default 86400)
+  RAG_QUERY_CACHE_FILE  .npz path to persist to (default: memory only)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+SAVE_EVERY = 50
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 86400.0, path: Path | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = self.misses = self.expired = self.evicted = 0
+        if path is not None and path.exists():
+            self.load()
+
+    @classmethod
+    def from_env(cls) -> "QueryEmbeddingCache":
+        path = os.getenv("RAG_QUERY_CACHE_FILE")
+        return cls(
+            max_size=int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("RAG_QUERY_CACHE_TTL", "86400")),
+            path=Path(path) if path else None,
+        )
+
+    @staticmethod
+    def key(info: dict, query: str) -> str:
+        return f"{info.get('provider')}\t{info.get('model')}\t{normalize_query(query)}"
+
+    def get(self, key: str) -> np.ndarray | None:
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), np.asarray(vector, dtype=np.float32))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+            self._unsaved += 1
+            due = self.path is not None and self._unsaved >= SAVE_EVERY
+        if due:
+            self.save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "persisted": str(self.path) if self.path else None,
+        }
+
+    # ── Persistence ───────────────────────────────────────────────────────────
+
+    def load(self) -> None:
+        """Read unexpired entries from `path`; a missing or unreadable file is ignored."""
+        try:
+            with np.load(self.path) as data:
+                keys, created, vectors = data["keys"], data["created"], data["vectors"]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Warning: could not read query cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, ts, vec in zip(keys.tolist(), created.tolist(), vectors):
+                if now - ts <= self.ttl:
+                    self._entries[key] = (ts, vec)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """Write every entry to `path` (temp file + rename)."""
+        if self.path is None:
+            return
+        with self._lock:
+            items = list(self._entries.items())
+            self._unsaved = 0
+        if not items:
+            return
+        dims = {len(vec) for _, (_, vec) in items}
+        if len(dims) > 1:
+            # Index rebuilt with another embedder: keep the newest dimension only
+            newest = len(items[-1][1][1])
+            items = [item for item in items if len(item[1][1]) == newest]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f,
+                     keys=np.array([k for k, _ in items]),
+                     created=np.array([ts for _, (ts, _) in items], dtype=np.float64),
+                     vectors=np.stack([vec for _, (_, vec) in items]))
+        os.replace(tmp, self.path)
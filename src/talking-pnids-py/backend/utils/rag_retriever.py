@@ -4,17 +4,66 @@ rag_retriever.py — Query-time RAG retrieval.
 Loads the pre-built chunk+embedding index and retrieves top-k chunks
 matching a query, filtered to a specific P&ID.
 
-The index is loaded once at startup and cached in memory.
+The index is loaded into an immutable RagIndex served by the artifact
+registry (utils/artifacts.py): it is preloaded at startup and, when
+ingestion rewrites data/rag, the new version is loaded in the background and
+swapped in while requests in flight finish on the old one. manifest.json is
+written last and records the sha256 of every other index file, so the
+registry watches only the manifest, and a version whose files do not match
+it (a build still in progress) is rejected rather than published. Queries are
+embedded with the provider recorded in the index manifest (utils/embedding.py):
+OpenAI needs an API key and a network call, the local hashed TF-IDF model
+runs in-process.
+
+The embedding matrix is memory-mapped as stored (float16, or int8 with
+per-row scales) and its rows are already unit length, so a query is scored
+with one dot product per row into a preallocated buffer, and top-k comes
+from argpartition. Chunks are stored grouped by pid tag set and the manifest
+records each tag's row ranges ("partitions"); a filtered query scores only
+the ranges of its P&ID and "global", looked up once per P&ID.
+
+Large indexes also carry an IVF-flat ANN index (utils/ann.py, ann.npz). When
+a P&ID has at least ANN_MIN_ROWS rows, only the ANN_NPROBE closest lists are
+scored, restricted to the P&ID's rows; smaller partitions, or a probe that
+finds fewer than k rows, use the exact scan.
+Indexes written before rows were normalised are normalised once on load.
+
+A BM25 index over tags, line numbers and words (utils/lexical.py) is built
+from chunks.json on load. Its results are fused with the vector results by
+reciprocal rank (RRF_K); a query that names known tags with at most
+LEXICAL_ONLY_MAX_WORDS other words is answered from it alone, without
+embedding the query. So is any query when the embedder is unavailable.
+
+OpenAI query embeddings go through an LRU + TTL cache (utils/query_cache.py)
+keyed by normalised query text and model, and each OpenAI embedder is created
+once and kept, so calls reuse one connection pool. aretrieve() awaits the
+OpenAI embedding on the async client instead of blocking the event loop.
+metrics() reports cache hit rates and how queries were answered.
 """
 
+import asyncio
+import hashlib
 import json
-import os
+import threading
 from pathlib import Path
-from functools import lru_cache
-from typing import Optional
 
 import numpy as np
 
+from utils.ann import ANN_FILE, IVFIndex
+from utils.artifacts import registry
+from utils.embedding import (
+    LOCAL_FILE, legacy_info, load_embedder, normalize_rows, partition_rows,
+)
+from utils.lexical import LexicalIndex, query_tokens
+from utils.query_cache import QueryEmbeddingCache
+
+SCORE_BLOCK   = 4096    # rows converted to float32 at a time when scoring float16/int8
+ANN_MIN_ROWS  = 20_000  # partitions smaller than this are scanned exactly
+ANN_NPROBE    = 16      # IVF lists scored per query
+FUSION_DEPTH  = 20      # lexical / vector hits per list entering the rank fusion
+RRF_K         = 60      # reciprocal rank fusion: score = Σ 1 / (RRF_K + rank)
+LEXICAL_ONLY_MAX_WORDS = 4  # tag queries with at most this many other words skip embedding
+
 # ── Paths ─────────────────────────────────────────────────────────────────────
 
 def _rag_dir() -> Path:
@@ -22,27 +71,175 @@ def _rag_dir() -> Path:
     return Path(__file__).resolve().parents[2] / "data" / "rag"
 
 
-# ── Index loading ─────────────────────────────────────────────────────────────
+INDEX_FILES = ("manifest.json", "chunks.json", "embeddings.npy", "embedding_scales.npy",
+               ANN_FILE, LOCAL_FILE)
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+_buffers = threading.local()
 
-_chunks: list[dict] | None = None
-_embeddings: np.ndarray | None = None
 
+def _thread_buffers(n: int, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """(scores[n], float32 scratch block) reused by every query on this thread."""
+    scores = getattr(_buffers, "scores", None)
+    if scores is None or len(scores) != n or _buffers.scratch.shape[1] != dim:
+        _buffers.scores = np.empty(n, dtype=np.float32)
+        _buffers.scratch = np.empty((min(SCORE_BLOCK, n), dim), dtype=np.float32)
+    return _buffers.scores, _buffers.scratch
 
-def _load_index() -> tuple[list[dict], np.ndarray] | tuple[None, None]:
-    global _chunks, _embeddings
-    if _chunks is not None and _embeddings is not None:
-        return _chunks, _embeddings
 
+class RagIndex:
+    """
+    One version of the index in data/rag: chunks, the memory-mapped matrix,
+    partitions, ANN and lexical indexes, and the local embedder if it was
+    built with one. Per-P&ID row ranges and masks are cached on the instance.
+    """
+
+    def __init__(self, directory: Path):
+        manifest_path = directory / "manifest.json"
+        manifest_text = manifest_path.read_text() if manifest_path.exists() else "{}"
+        self.manifest = json.loads(manifest_text)
+        self.info = self.manifest.get("embedder") or legacy_info()
+        storage = self.manifest.get("storage", {})
+
+        self.chunks = json.loads((directory / "chunks.json").read_text())
+        embeddings = np.load(str(directory / "embeddings.npy"), mmap_mode="r")
+        if len(embeddings) != len(self.chunks):
+            raise ValueError(f"{len(self.chunks)} chunks but {len(embeddings)} vectors")
+        self.embeddings = embeddings if storage.get("normalized") else normalize_rows(embeddings)
+        self.scales = np.load(str(directory / "embedding_scales.npy")) \
+            if storage.get("dtype") == "int8" else None
+
+        consistent = self.manifest.get("chunk_count") == len(self.chunks)
+        self.partitions = self.manifest.get("partitions") if consistent else None
+        if self.partitions is None:
+            self.partitions = partition_rows(self.chunks)
+        self.ann = IVFIndex.load(directory) \
+            if consistent and self.manifest.get("ann") and (directory / ANN_FILE).exists() else None
+        self.lexical = LexicalIndex([c["text"] for c in self.chunks])
+        self.local_embedder = load_embedder(self.info, directory) \
+            if self.info["provider"] == "local" else None
+        self._pid_ranges: dict[str, tuple[list[tuple[int, int]], np.ndarray]] = {}
+        self._pid_masks: dict[str, np.ndarray] = {}
+        _check_files(directory, manifest_text, self.manifest)
+
+    def ranges_for(self, pid_id: str) -> tuple[list[tuple[int, int]], np.ndarray]:
+        """(merged row ranges, row number of each scored position) for pid_id + global."""
+        hit = self._pid_ranges.get(pid_id)
+        if hit is None:
+            merged: list[tuple[int, int]] = []
+            for start, stop in sorted(self.partitions.get(pid_id, []) + self.partitions.get("global", [])):
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+                else:
+                    merged.append((start, stop))
+            rows = np.concatenate([np.arange(a, b) for a, b in merged]) if merged \
+                else np.zeros(0, dtype=np.int64)
+            hit = self._pid_ranges[pid_id] = (merged, rows)
+        return hit
+
+    def mask_for(self, pid_id: str) -> np.ndarray:
+        """Boolean row mask of pid_id + global, for filtering ANN and lexical candidates."""
+        mask = self._pid_masks.get(pid_id)
+        if mask is None:
+            mask = np.zeros(len(self.chunks), dtype=bool)
+            for start, stop in self.ranges_for(pid_id)[0]:
+                mask[start:stop] = True
+            self._pid_masks[pid_id] = mask
+        return mask
+
+    def score(self, query_vec: np.ndarray, ranges: list[tuple[int, int]]) -> np.ndarray:
+        """
+        Cosine score (rows are unit length) of the rows in `ranges`, packed in
+        order into the thread's buffer; returns the filled part of it.
+        """
+        embeddings = self.embeddings
+        q = np.asarray(query_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-10)
+        scores, scratch = _thread_buffers(len(embeddings), embeddings.shape[1])
+        filled = 0
+        for start, stop in ranges:
+            out = scores[filled:filled + stop - start]
+            if embeddings.dtype == np.float32:
+                np.dot(embeddings[start:stop], q, out=out)
+            else:
+                for lo in range(start, stop, SCORE_BLOCK):
+                    hi = min(lo + SCORE_BLOCK, stop)
+                    block = scratch[:hi - lo]
+                    np.copyto(block, embeddings[lo:hi], casting="unsafe")
+                    np.dot(block, q, out=out[lo - start:hi - start])
+                if self.scales is not None:
+                    out *= self.scales[start:stop]
+            filled += stop - start
+        return scores[:filled]
+
+    def search_ann(self, query_vec: np.ndarray, pid_id: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the approximate top-k within pid_id + global, best first."""
+        q = np.asarray(query_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) + 1e-10)
+        return self.ann.search(self.embeddings, q, k, ANN_NPROBE, self.mask_for(pid_id), self.scales)
+
+    def search_vector(self, query_vec: np.ndarray, pid_id: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine scores) of the top-k within pid_id + global: ANN if worthwhile, else exact."""
+        ranges, rows = self.ranges_for(pid_id)
+        k = min(k, len(rows))
+        if self.ann is not None and len(rows) >= ANN_MIN_ROWS:
+            hits = self.search_ann(query_vec, pid_id, k)
+            if len(hits[0]) == k:
+                return hits
+        scores = self.score(query_vec, ranges)
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+
+def _check_files(directory: Path, manifest_text: str, manifest: dict) -> None:
+    """
+    Raise unless, after loading, every file still matches the sha256 the
+    manifest recorded for it and the manifest itself is unchanged — i.e. the
+    loaded files all come from the build that wrote this manifest.
+    """
+    for name, digest in manifest.get("files", {}).items():
+        path = directory / name
+        if not path.exists() or hashlib.sha256(path.read_bytes()).hexdigest()[:16] != digest:
+            raise ValueError(f"{name} does not match manifest.json (index still being written?)")
+    path = directory / "manifest.json"
+    if (path.read_text() if path.exists() else "{}") != manifest_text:
+        raise ValueError("manifest.json changed while the index was loading")
+
+
+def _rag_sources() -> list[Path]:
+    """The manifest (written last) once it records the index files; every file for older indexes."""
+    manifest_path = _rag_dir() / "manifest.json"
+    try:
+        if "files" in json.loads(manifest_path.read_text()):
+            return [manifest_path]
+    except (OSError, ValueError):
+        pass
+    return [_rag_dir() / name for name in INDEX_FILES]
+
+
+def _load_rag() -> RagIndex | None:
     rag_dir = _rag_dir()
-    chunks_path = rag_dir / "chunks.json"
-    embed_path  = rag_dir / "embeddings.npy"
+    if not (rag_dir / "chunks.json").exists() or not (rag_dir / "embeddings.npy").exists():
+        return None
+    return RagIndex(rag_dir)
+
+
+registry.register("rag", _load_rag, _rag_sources)
 
-    if not chunks_path.exists() or not embed_path.exists():
-        return None, None
 
-    _chunks     = json.loads(chunks_path.read_text())
-    _embeddings = np.load(str(embed_path))
-    return _chunks, _embeddings
+def _index() -> RagIndex | None:
+    """The current index version; hold on to it for the whole request."""
+    return registry.get("rag")
+
+
+def can_embed(api_key: str | None, index: RagIndex | None = None) -> bool:
+    """True if queries can be embedded: OpenAI-built indexes need an API key."""
+    index = index or _index()
+    info = index.info if index else legacy_info()
+    return info["provider"] != "openai" or bool(api_key)
 
 
 def is_available() -> bool:
@@ -53,19 +250,88 @@ def is_available() -> bool:
 
 # ── Embedding ─────────────────────────────────────────────────────────────────
 
-def _embed_query(query: str, api_key: str) -> np.ndarray:
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
-    response = client.embeddings.create(model="text-embedding-3-small", input=[query])
-    return np.array(response.data[0].embedding, dtype=np.float32)
+_openai_embedders: dict[tuple, object] = {}   # (model, api key) → OpenAIEmbedder
+_query_cache = QueryEmbeddingCache.from_env()
+_answered = {"lexical": 0, "hybrid": 0, "lexical_fallback": 0}
+
+
+def _openai_embedder(info: dict, api_key: str):
+    """OpenAI embedder, created once per model/key and reused for its connection pools."""
+    key = (info.get("model"), api_key)
+    emb = _openai_embedders.get(key)
+    if emb is None:
+        emb = _openai_embedders[key] = load_embedder(info, _rag_dir(), api_key)
+    return emb
+
+
+def _embed_query(index: RagIndex, query: str, api_key: str) -> np.ndarray:
+    if index.local_embedder is not None:
+        return index.local_embedder.embed([query])[0]
+    key = QueryEmbeddingCache.key(index.info, query)
+    vec = _query_cache.get(key)
+    if vec is None:
+        vec = _openai_embedder(index.info, api_key).embed([query])[0]
+        _query_cache.put(key, vec)
+    return vec
+
+
+async def _aembed_query(index: RagIndex, query: str, api_key: str) -> np.ndarray:
+    if index.local_embedder is not None:
+        return index.local_embedder.embed([query])[0]
+    key = QueryEmbeddingCache.key(index.info, query)
+    vec = _query_cache.get(key)
+    if vec is None:
+        vec = (await _openai_embedder(index.info, api_key).aembed([query]))[0]
+        _query_cache.put(key, vec)
+    return vec
+
+
+# ── Retrieval ─────────────────────────────────────────────────────────────────
+
+def _fuse(*ranked: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Reciprocal rank fusion of ranked row lists: (rows, fused scores), best first."""
+    fused: dict[int, float] = {}
+    for rows in ranked:
+        for rank, row in enumerate(rows.tolist(), 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank)
+    order = sorted(fused, key=lambda r: (-fused[r], r))
+    return np.array(order, dtype=np.int64), np.array([fused[r] for r in order])
+
+
+def _lexical_stage(index: RagIndex, query: str, pid_id: str, api_key: str, k: int):
+    """
+    (lexical hits, answered): answered when the lexical hits are the result —
+    a tag query with matches, or no way to embed the query.
+    """
+    tags, words = query_tokens(query)
+    hits = index.lexical.search(tags + words, max(k, FUSION_DEPTH), index.mask_for(pid_id))
+    tag_query = bool(tags) and all(t in index.lexical for t in tags) and len(words) <= LEXICAL_ONLY_MAX_WORDS
+    if tag_query and len(hits[0]):
+        _answered["lexical"] += 1
+        return hits, True
+    if not can_embed(api_key, index):
+        _answered["lexical_fallback"] += 1
+        return hits, True
+    return hits, False
+
 
+def _hybrid(index: RagIndex, lexical, query_vec: np.ndarray, pid_id: str, k: int):
+    _answered["hybrid"] += 1
+    vector = index.search_vector(query_vec, pid_id, max(k, FUSION_DEPTH))
+    return _fuse(lexical[0], vector[0])
 
-def _cosine_similarity(query_vec: np.ndarray, matrix: np.ndarray) -> np.ndarray:
-    """Compute cosine similarity between query_vec and each row of matrix."""
-    q_norm = query_vec / (np.linalg.norm(query_vec) + 1e-10)
-    norms  = np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10
-    normed = matrix / norms
-    return normed @ q_norm
+
+def _results(index: RagIndex, hits, k: int) -> list[dict]:
+    results = []
+    for i, score in zip(hits[0][:k], hits[1][:k]):
+        chunk = index.chunks[i]
+        results.append({
+            "text":     chunk["text"],
+            "source":   chunk["source"],
+            "pid_tags": chunk["pid_tags"],
+            "score":    float(score),
+        })
+    return results
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
@@ -78,45 +344,53 @@ def retrieve(
 ) -> list[dict]:
     """
     Retrieve top-k chunks relevant to `query` for the given `pid_id`.
-    Returns list of {text, source, pid_tags, score}.
+    Returns list of {text, source, pid_tags, score}: a fused rank score for
+    hybrid results, BM25 for lexical-only ones.
     Returns [] if index not available.
     """
-    chunks, embeddings = _load_index()
-    if chunks is None:
+    index = _index()
+    if index is None or not len(index.ranges_for(pid_id)[1]):
         return []
+    hits, answered = _lexical_stage(index, query, pid_id, api_key, k)
+    if not answered:
+        hits = _hybrid(index, hits, _embed_query(index, query, api_key), pid_id, k)
+    return _results(index, hits, k)
 
-    # Filter to chunks tagged for this P&ID or global
-    indices = [
-        i for i, c in enumerate(chunks)
-        if pid_id in c.get("pid_tags", []) or "global" in c.get("pid_tags", [])
-    ]
 
-    if not indices:
+async def aretrieve(
+    query: str,
+    pid_id: str,
+    api_key: str,
+    k: int = 5,
+) -> list[dict]:
+    """
+    retrieve() for async callers: the query embedding is awaited, not blocking,
+    and an index not loaded yet is loaded in a worker thread.
+    """
+    index = await asyncio.to_thread(_index)
+    if index is None or not len(index.ranges_for(pid_id)[1]):
         return []
-
-    # Embed query
-    query_vec = _embed_query(query, api_key)
-
-    # Cosine similarity over filtered subset
-    subset_embeddings = embeddings[indices]
-    scores = _cosine_similarity(query_vec, subset_embeddings)
-
-    # Top-k
-    top_k_local = min(k, len(indices))
-    top_indices_local = np.argsort(scores)[::-1][:top_k_local]
-
-    results = []
-    for local_i in top_indices_local:
-        global_i = indices[local_i]
-        chunk = chunks[global_i]
-        results.append({
-            "text":     chunk["text"],
-            "source":   chunk["source"],
-            "pid_tags": chunk["pid_tags"],
-            "score":    float(scores[local_i]),
-        })
-
-    return results
+    hits, answered = _lexical_stage(index, query, pid_id, api_key, k)
+    if not answered:
+        query_vec = await _aembed_query(index, query, api_key)
+        hits = _hybrid(index, hits, query_vec, pid_id, k)
+    return _results(index, hits, k)
+
+
+def metrics() -> dict:
+    """Index version, query-embedding cache statistics and how retrievals were answered."""
+    index = _index()
+    return {
+        "index_version": registry.version("rag"),
+        "chunks": len(index.chunks) if index else 0,
+        "answered": dict(_answered),
+        "query_cache": _query_cache.stats(),
+    }
+
+
+def save_query_cache() -> None:
+    """Persist the query-embedding cache (no-op unless RAG_QUERY_CACHE_FILE is set)."""
+    _query_cache.save()
 
 
 def format_for_prompt(chunks: list[dict], max_chars: int = 3000) -> str:
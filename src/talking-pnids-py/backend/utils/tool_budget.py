@@ -0,0 +1,135 @@
+"""
+tool_budget.py — per-call cost limits for the graph agent's tools.
+
+Tool arguments come from the model, so a single call can ask for a depth-50
+impact region or every valve in the supergraph. execute_tool() gives each
+call a fresh ToolBudget:
+  max_visited   nodes a traversal may visit before it stops
+  max_seconds   wall time a traversal may take before it stops
+  max_depth     largest impact_region depth accepted (larger is clamped)
+  max_results   items returned per page of a list result
+  max_chars     JSON size of a page, and of any whole tool result
+
+A result cut short says so: list results become {"results": [...],
+"truncated": {...}} with the reason, the total and a next_cursor to pass
+back as `cursor` for the following page; a stopped traversal reports how far
+it got. A page is filled to WRAPPER_CHARS short of its limit, so the result
+wrapped around it still passes fit() at the end of execute_tool. The model
+sees why a result is partial and can narrow the query or page through it
+instead of filling its context.
+
+Settings come from the environment:
+  TOOL_MAX_VISITED  (default 20000)    TOOL_MAX_SECONDS  (default 1.0)
+  TOOL_MAX_DEPTH    (default 10)       TOOL_MAX_RESULTS  (default 200)
+  TOOL_MAX_CHARS    (default 32000)
+"""
+
+import json
+import os
+import time
+
+CHECK_EVERY   = 256    # visits between wall-clock checks
+WRAPPER_CHARS = 1024   # of max_chars kept free on a page for the result around it (truncation etc.)
+
+
+class ToolBudget:
+    def __init__(self, max_visited: int = 20_000, max_seconds: float = 1.0, max_depth: int = 10,
+                 max_results: int = 200, max_chars: int = 32_000):
+        self.max_visited = max_visited
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self.max_results = max_results
+        self.max_chars = max_chars
+        self.visited = 0
+        self.exhausted: str | None = None     # "max_visited" / "max_seconds" once hit
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> "ToolBudget":
+        return cls(
+            max_visited=int(os.getenv("TOOL_MAX_VISITED", "20000")),
+            max_seconds=float(os.getenv("TOOL_MAX_SECONDS", "1.0")),
+            max_depth=int(os.getenv("TOOL_MAX_DEPTH", "10")),
+            max_results=int(os.getenv("TOOL_MAX_RESULTS", "200")),
+            max_chars=int(os.getenv("TOOL_MAX_CHARS", "32000")),
+        )
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    # ── Traversal ─────────────────────────────────────────────────────────────
+
+    def charge(self, n: int = 1) -> bool:
+        """Count n visited nodes; False once the node or time limit is reached."""
+        if self.exhausted:
+            return False
+        before = self.visited
+        self.visited += n
+        if self.visited > self.max_visited:
+            self.exhausted = "max_visited"
+        elif self.visited // CHECK_EVERY != before // CHECK_EVERY and self.elapsed() > self.max_seconds:
+            self.exhausted = "max_seconds"
+        return self.exhausted is None
+
+    def report(self) -> dict:
+        """Why and where a traversal stopped, for a truncated result."""
+        return {
+            "reason": self.exhausted,
+            "visited": self.visited,
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+        }
+
+    # ── Results ───────────────────────────────────────────────────────────────
+
+    def clamp_depth(self, depth) -> tuple[int, dict | None]:
+        """(depth to use, truncation note or None) for a model-supplied depth."""
+        try:
+            depth = max(0, int(depth))
+        except (TypeError, ValueError):
+            return 3, {"reason": "invalid_depth", "requested": depth, "used": 3}
+        if depth > self.max_depth:
+            return self.max_depth, {"reason": "max_depth", "requested": depth, "used": self.max_depth}
+        return depth, None
+
+    def page(self, items: list, cursor=0, limit: int | None = None,
+             render=None, max_chars: int | None = None) -> tuple[list, dict | None]:
+        """
+        Items from `cursor` up to `limit` (default max_results) and max_chars
+        (default the budget's) less WRAPPER_CHARS of JSON; (page, None) when
+        that reaches the end, else (page, truncation). With `render`, items
+        are keys and only the page's are rendered.
+        """
+        max_chars = max(1, (max_chars or self.max_chars) - WRAPPER_CHARS)
+        try:
+            cursor = max(0, int(cursor or 0))
+        except (TypeError, ValueError):
+            cursor = 0
+        limit = min(limit or self.max_results, self.max_results)
+        out, size, reason = [], 0, None
+        for item in items[cursor:cursor + limit]:
+            if render is not None:
+                item = render(item)
+            size += len(json.dumps(item)) + 2
+            if size > max_chars and out:
+                reason = "max_chars"
+                break
+            out.append(item)
+        end = cursor + len(out)
+        if end >= len(items):
+            return out, None
+        return out, {
+            "reason": reason or "max_results",
+            "total": len(items),
+            "returned": len(out),
+            "next_cursor": end,
+        }
+
+    def fit(self, result) -> object:
+        """result, or an error in its place when its JSON exceeds max_chars."""
+        size = len(json.dumps(result))
+        if size <= self.max_chars:
+            return result
+        return {
+            "error": "Result too large to return; narrow the request.",
+            "truncated": {"reason": "max_chars", "chars": size, "max_chars": self.max_chars},
+        }
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+bench_graph_index.py — graph tool lookups through GraphIndex vs the bare store.
+
+Writes a synthetic P&ID-shaped graph (valves, instruments, equipment on
+process lines, signal edges from instruments, some long cross-connections)
+as a binary store, then times the lookups the graph tools make, once by
+reading the memory-mapped store directly (string decode per compared value,
+as graph_tools did before GraphIndex) and once through GraphIndex. The
+traversals run the same BFS as find_path / impact_region over both.
+
+Usage:
+  python bench_graph_index.py                  # 100k nodes
+  python bench_graph_index.py --nodes 20000 --queries 500
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.graph_index import GraphIndex  # noqa: E402
+from utils.graph_store import GraphStore, norm_tag, write_store  # noqa: E402
+
+TYPES = [("valve", 0.40, ["HV", "XV", "PSV", "EZV"], ["valve.gate", "valve.ball", "valve.globe"]),
+         ("instrument", 0.30, ["PT", "TT", "LIT", "FT"], ["instrument.pressure", "instrument.level"]),
+         ("junction", 0.20, ["J"], ["fitting.reducer", "fitting.tee"]),
+         ("equipment", 0.05, ["V", "P", "E"], ["equipment.vessel", "equipment.pump"]),
+         ("terminator", 0.05, ["T"], ["offpage"])]
+SERVICES = ["fuel gas", "crude oil", "flare", "instrument air", "drain", "nitrogen",
+            "produced water", "condensate", "vent", "sales gas"]
+
+
+# ── Synthetic graph ───────────────────────────────────────────────────────────
+
+def make_graph(n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(n):
+        r, acc = rng.random(), 0.0
+        for node_type, share, prefixes, subtypes in TYPES:
+            acc += share
+            if r < acc:
+                break
+        unit = 300 + i % 97
+        nodes.append({
+            "id": f"n{i}",
+            "tag": f"PP01-{unit}-{rng.choice(prefixes)}-{i:06d}",
+            "type": node_type,
+            "subtype": rng.choice(subtypes),
+            "service": rng.choice(SERVICES),
+            "props": {"design_pressure": rng.randint(5, 150)},
+        })
+    edges = []
+    for i in range(1, n):
+        # Mostly local piping, some long cross-connections (headers, tie-ins)
+        j = rng.randrange(max(0, i - 40), i) if rng.random() < 0.8 else rng.randrange(i)
+        edges.append({"id": f"e{len(edges)}", "from": f"n{j}", "to": f"n{i}", "kind": "process",
+                      "line_tag": f"GF{i % 5000:04d}", "diameter": rng.choice(['2"', '6"', '12"'])})
+    for i in range(0, n, 4):
+        j = rng.randrange(n)
+        edges.append({"id": f"e{len(edges)}", "from": f"n{i}", "to": f"n{j}", "kind": "signal"})
+    return {"schema_version": "pid.graph.v0.1.1", "nodes": nodes, "edges": edges}
+
+
+# ── Lookups on the bare store (graph_tools before GraphIndex) ─────────────────
+
+def store_type_rows(store: GraphStore, node_type: str) -> list[int]:
+    col = store.array("node.type")
+    for sid in np.unique(col).tolist():
+        if sid >= 0 and store.string(sid) == node_type:
+            return [int(i) for i in (col == sid).nonzero()[0]]
+    return []
+
+
+def store_search(store: GraphStore, query: str, limit: int = 20) -> list[int]:
+    q_norm, q_lower, out = norm_tag(query), query.lower(), []
+    for i in range(store.n_nodes):
+        if (q_norm and q_norm in (store.node_value(i, "tag_norm") or "")) or \
+           (q_lower in (store.node_value(i, "service") or "").lower()) or \
+           (q_lower in (store.node_value(i, "subtype") or "").lower()):
+            out.append(i)
+            if len(out) == limit:
+                break
+    return out
+
+
+def bfs(neighbors, label, kinds: list[str], start: int, depth: int) -> list[str]:
+    """impact_region's downstream BFS over a neighbors(i, kind, direction) function."""
+    visited, frontier, found = {start}, [start], []
+    for _ in range(depth):
+        nxt = []
+        for i in frontier:
+            for kind in kinds:
+                for nb in neighbors(i, kind, "out")[0]:
+                    nb = int(nb)
+                    if nb not in visited:
+                        visited.add(nb)
+                        found.append(label(nb))
+                        nxt.append(nb)
+        frontier = nxt
+    return found
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+
+def timed(fn, args_list: list) -> tuple[float, list]:
+    """Median milliseconds per call, and the results."""
+    times, results = [], []
+    for args in args_list:
+        t0 = time.perf_counter()
+        results.append(fn(*args))
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraphIndex vs bare-store lookup benchmark")
+    parser.add_argument("--nodes",   type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed",    type=int, default=0)
+    args = parser.parse_args()
+
+    graph = make_graph(args.nodes, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.graph.bin"
+        t0 = time.time()
+        write_store(graph, path)
+        store = GraphStore(path)
+        print(f"\n  Synthetic graph: {store.n_nodes:,} nodes, {store.n_edges:,} edges "
+              f"(store written in {time.time() - t0:.1f}s)")
+        t0 = time.time()
+        index = GraphIndex(store)
+        print(f"  GraphIndex built in {time.time() - t0:.2f}s\n")
+
+        rng = random.Random(args.seed + 1)
+        picks = [rng.randrange(args.nodes) for _ in range(args.queries)]
+        tags = [(graph["nodes"][i]["tag"].replace("-", " ", 1),) for i in picks]
+        ids = [(graph["nodes"][i]["id"],) for i in picks]
+        few = max(1, args.queries // 20)
+        label_store = lambda i: store.node_value(i, "tag") or store.node_value(i, "id")  # noqa: E731
+
+        cases = [
+            ("tag lookup",            lambda t: store.find_tag(t), index.find_tag, tags),
+            ("id lookup",             lambda t: store.find_id(t), index.find_id, ids),
+            ("list_nodes valve",      lambda t: store_type_rows(store, t), index.nodes_of_type,
+             [("valve",)] * few),
+            ("search_nodes 'flare'",  lambda q: store_search(store, q),
+             lambda q: index.search(q, 20), [("flare",)] * few),
+            ("search_nodes miss",     lambda q: store_search(store, q),
+             lambda q: index.search(q, 20), [("zzz",)] * few),
+            ("impact_region depth 3",
+             lambda i: bfs(store.neighbors, label_store, ["process", "signal"], i, 3),
+             lambda i: bfs(index.neighbors, index.label, ["process", "signal"], i, 3),
+             [(i,) for i in picks]),
+        ]
+        print(f"  {'operation':<24} {'store':>12} {'GraphIndex':>12} {'speed-up':>9}")
+        for name, old, new, calls in cases:
+            t_old, r_old = timed(old, calls)
+            t_new, r_new = timed(new, calls)
+            normalise = lambda r: None if r in (-1, None) else r  # noqa: E731
+            assert [normalise(r) for r in r_old] == [normalise(r) for r in r_new], name
+            print(f"  {name:<24} {t_old:9.4f} ms {t_new:9.4f} ms {t_old / max(t_new, 1e-9):8.1f}×")
+        print()
+
+
+if __name__ == "__main__":
+    main()
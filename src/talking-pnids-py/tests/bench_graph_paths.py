@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+bench_graph_paths.py — find_path / impact_region traversal latency.
+
+Times, on the real supergraph (data/graphs) and on a synthetic graph from
+bench_graph_index.py, the path searches in graph_traversal.py against the
+BFS find_path used before them (list queue with pop(0), one path copy per
+queued node). Pairs are drawn from connected node pairs only.
+
+Usage:
+  python bench_graph_paths.py                       # supergraph + 100k synthetic
+  python bench_graph_paths.py --nodes 20000 --pairs 100
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+TESTS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(TESTS_DIR.parent / "backend"))
+sys.path.insert(0, str(TESTS_DIR))
+
+from bench_graph_index import make_graph  # noqa: E402
+from utils import graph_tools  # noqa: E402
+from utils.graph_index import GraphIndex  # noqa: E402
+from utils.graph_store import GraphStore, write_store  # noqa: E402
+from utils.graph_traversal import (bfs, bidirectional_bfs, bidirectional_dijkstra,  # noqa: E402
+                                   cheapest_path, edge_costs, k_shortest_paths)
+
+
+def copying_bfs(links, start: int, end: int) -> list[int] | None:
+    """find_path's search before graph_traversal: FIFO list of whole paths."""
+    nbrs, _ = links
+    visited, queue = {start}, [[start]]
+    while queue:
+        path = queue.pop(0)
+        if path[-1] == end:
+            return path
+        for nb in nbrs[path[-1]]:
+            if nb not in visited:
+                visited.add(nb)
+                queue.append(path + [nb])
+    return None
+
+
+def median_ms(fn, calls: list) -> float:
+    times = []
+    for args in calls:
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000
+
+
+def run(name: str, index: GraphIndex, n_pairs: int, seed: int) -> None:
+    fwd = index.links(graph_tools._path_steps(index.kinds))
+    bwd = index.links(graph_tools._path_steps(index.kinds, reverse=True))
+    costs = edge_costs(index, "main_line")
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < n_pairs:
+        start = rng.randrange(index.n_nodes)
+        reach = list(bfs(fwd, start, max_depth=12))
+        if len(reach) > 1:
+            pairs.append((start, reach[rng.randrange(1, len(reach))]))
+    hops = [len(copying_bfs(fwd, a, b)) - 1 for a, b in pairs]
+    print(f"\n  {name}: {index.n_nodes:,} nodes, {len(pairs)} connected pairs, "
+          f"median {int(np.median(hops))} hops")
+
+    impact = tuple((k, "out") for k in ("process", "signal", "impulse"))
+    rows = [
+        ("BFS, path copies (old)",  lambda a, b: copying_bfs(fwd, a, b)),
+        ("bidirectional BFS",       lambda a, b: bidirectional_bfs(fwd, bwd, a, b)),
+        ("Dijkstra main_line",      lambda a, b: cheapest_path(fwd, a, b, costs)),
+        ("bidirectional Dijkstra",  lambda a, b: bidirectional_dijkstra(fwd, bwd, a, b, costs)),
+        ("Yen k=4, hops",           lambda a, b: k_shortest_paths(fwd, a, b, 4, None, bwd)),
+        ("Yen k=4, main_line",      lambda a, b: k_shortest_paths(fwd, a, b, 4, costs, bwd)),
+        ("impact BFS depth 3",      lambda a, b: bfs(index.links(impact), a, 3)),
+    ]
+    for label, fn in rows:
+        print(f"  {label:<26} {median_ms(fn, pairs):9.4f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph traversal latency benchmark")
+    parser.add_argument("--nodes", type=int, default=100_000, help="synthetic graph size (0 to skip)")
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--seed",  type=int, default=0)
+    args = parser.parse_args()
+
+    loaded = graph_tools._loaded("supergraph")
+    if loaded is not None:
+        run("supergraph", loaded.index, args.pairs, args.seed)
+    if args.nodes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "synthetic.graph.bin"
+            write_store(make_graph(args.nodes, args.seed), path)
+            run("synthetic", GraphIndex(GraphStore(path)), max(10, args.pairs // 4), args.seed)
+    print()
+
+
+if __name__ == "__main__":
+    main()
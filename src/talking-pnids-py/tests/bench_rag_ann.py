@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+bench_rag_ann.py — recall / latency of the RAG ANN index against exact search.
+
+Builds a synthetic index (clustered unit vectors, chunks spread over a few
+P&IDs plus "global"), trains the IVF-flat index the way ingestion/rag.py does,
+and runs the same queries through rag_retriever's exact and ANN paths on one
+thread. Recall@k is the share of the exact top-k the ANN path returns.
+
+Usage:
+  python bench_rag_ann.py                                   # 100k × 384, float16
+  python bench_rag_ann.py --n 1000000 --dim 384 --storage int8
+  python bench_rag_ann.py --nprobe 8 16 32 --queries 500
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from utils import rag_retriever  # noqa: E402
+from utils.ann import ANN_FILE, IVFIndex, default_nlist  # noqa: E402
+from utils.embedding import partition_rows, quantize  # noqa: E402
+
+
+# ── Synthetic index ───────────────────────────────────────────────────────────
+
+def make_index(out: Path, n: int, dim: int, pids: int, storage: str, seed: int) -> np.ndarray:
+    """Write chunks.json / embeddings.npy / manifest.json / ann.npz; return the topic centres."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(16, n // 250), dim)).astype(np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+
+    # Rows grouped by tag like rag.py writes them: global first, then each P&ID
+    tags = ["global"] + [f"pid-{i:03d}" for i in range(1, pids + 1)]
+    sizes = np.full(len(tags), n // len(tags))
+    sizes[0] += n - sizes.sum()
+    chunks = [{"text": "", "source": "synthetic", "pid_tags": [tag]}
+              for tag, size in zip(tags, sizes) for _ in range(size)]
+
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 65536):
+        stop = min(start + 65536, n)
+        block = topics[rng.integers(len(topics), size=stop - start)]
+        block += rng.standard_normal(block.shape).astype(np.float32) * (1.2 / np.sqrt(dim))
+        matrix[start:stop] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    stored, scales = quantize(matrix, storage)
+    del matrix
+
+    np.save(out / "embeddings.npy", stored)
+    if scales is not None:
+        np.save(out / "embedding_scales.npy", scales)
+    (out / "chunks.json").write_text(json.dumps(chunks))
+
+    t0 = time.time()
+    nlist = default_nlist(n)
+    ann = IVFIndex.train(stored, nlist, scales)
+    ann.save(out / ANN_FILE)
+    print(f"  IVF train: {nlist} lists in {time.time() - t0:.1f}s")
+
+    (out / "manifest.json").write_text(json.dumps({
+        "embedder": {"provider": "openai", "model": "synthetic", "dim": dim},  # never called
+        "storage": {"dtype": storage, "normalized": True},
+        "chunk_count": n,
+        "partitions": partition_rows(chunks),
+        "ann": {"kind": "ivf-flat", "nlist": nlist},
+    }))
+    return topics
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+
+def exact_top(index: rag_retriever.RagIndex, q: np.ndarray, pid: str, k: int) -> np.ndarray:
+    ranges, rows = index.ranges_for(pid)
+    scores = index.score(q, ranges)
+    top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+    return rows[top]
+
+
+def percentiles(times: list[float]) -> str:
+    ms = np.array(times) * 1000
+    return f"p50 {np.percentile(ms, 50):6.2f} ms   p95 {np.percentile(ms, 95):6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG ANN recall / latency benchmark")
+    parser.add_argument("--n",       type=int, default=100_000, help="chunks in the synthetic index")
+    parser.add_argument("--dim",     type=int, default=384)
+    parser.add_argument("--pids",    type=int, default=4, help="P&IDs the chunks are spread over")
+    parser.add_argument("--storage", default="float16", choices=["float16", "int8", "float32"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k",       type=int, default=10)
+    parser.add_argument("--nprobe",  type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--seed",    type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"\n  Synthetic index: {args.n:,} × {args.dim} {args.storage}, "
+          f"{args.pids} P&IDs + global")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp)
+        topics = make_index(out, args.n, args.dim, args.pids, args.storage, args.seed)
+
+        index = rag_retriever.RagIndex(out)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = topics[rng.integers(len(topics), size=args.queries)]
+        queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (1 / np.sqrt(args.dim))
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        pids = [f"pid-{i:03d}" for i in rng.integers(1, args.pids + 1, size=args.queries)]
+
+        # Warm the per-P&ID ranges, masks and page cache
+        for q, pid in zip(queries[:10], pids[:10]):
+            exact_top(index, q, pid, args.k)
+            index.search_ann(q, pid, args.k)
+
+        times, truth = [], []
+        for q, pid in zip(queries, pids):
+            t0 = time.perf_counter()
+            truth.append(set(exact_top(index, q, pid, args.k).tolist()))
+            times.append(time.perf_counter() - t0)
+        print(f"\n  exact            {percentiles(times)}")
+
+        for nprobe in args.nprobe:
+            rag_retriever.ANN_NPROBE = nprobe
+            times, hits = [], 0
+            for q, pid, want in zip(queries, pids, truth):
+                t0 = time.perf_counter()
+                rows, _ = index.search_ann(q, pid, args.k)
+                times.append(time.perf_counter() - t0)
+                hits += len(want & set(rows.tolist()))
+            recall = hits / (args.k * len(queries))
+            print(f"  ann nprobe={nprobe:<4d} {percentiles(times)}   recall@{args.k} {recall:.3f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()